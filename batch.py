@@ -0,0 +1,148 @@
+#Batch experiment runner
+#Fans headless runs out across a process pool and collects the end of game stats into one table
+#e.g. python batch.py --seeds 100 --set wallPercentage=0,10,20 --set catVis=5,7.5 --csv results.csv
+import argparse
+import csv
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import final
+
+#Columns of the aggregated table, in print order
+SUMMARY_COLUMNS = ["runs", "survival", "lifetime", "energy", "points", "explored"]
+
+def runOne(job):
+    #Run a single game and return one row per agent, tagged with the run's parameters and seed
+    properties, seed, maxTicks, sweepKeys = job
+    simulation = final.Simulation(properties, seed)
+    simulation.run(maxTicks)
+
+    rows = []
+    for stats in simulation.getStats():
+        row = {key: properties[key] for key in sweepKeys}
+        row["seed"] = seed
+        row["ticks"] = simulation.tick
+        row.update(stats)
+        rows.append(row)
+    return rows
+
+def buildJobs(baseProperties, sweep, seeds, maxTicks):
+    #One job per combination of swept values per seed
+    sweepKeys = list(sweep)
+    jobs = []
+    for values in itertools.product(*[sweep[key] for key in sweepKeys]):
+        properties = dict(baseProperties)
+        properties.update(zip(sweepKeys, values))
+        for seed in seeds:
+            jobs.append((properties, seed, maxTicks, sweepKeys))
+    return jobs
+
+def runBatch(baseProperties, sweep=None, seeds=range(10), maxTicks=None, workers=None, chunkSize=None):
+    #Runs every job across a process pool and returns all the agent rows
+    #Jobs are handed to workers in chunks, so each worker pays the task overhead once per chunk rather than per run
+    jobs = buildJobs(baseProperties, sweep or {}, seeds, maxTicks)
+    workers = workers or os.cpu_count() or 1
+    if chunkSize is None:
+        chunkSize = max(1, len(jobs) // (workers * 4))
+
+    rows = []
+    if workers == 1:
+        for job in jobs:
+            rows.extend(runOne(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for jobRows in executor.map(runOne, jobs, chunksize=chunkSize):
+                rows.extend(jobRows)
+    return rows
+
+def summarise(rows, sweepKeys):
+    #Aggregate rows by swept parameters and agent type - means across every agent of that type
+    groups = {}
+    for row in rows:
+        key = tuple(row[k] for k in sweepKeys) + (row["type"],)
+        groups.setdefault(key, []).append(row)
+
+    summary = []
+    for key, group in groups.items():
+        entry = dict(zip(sweepKeys + ["type"], key))
+        entry["runs"] = len(set(row["seed"] for row in group))
+        entry["survival"] = 100 * sum(1 for row in group if row["alive"]) / len(group)
+        for column in ("lifetime", "energy", "points", "explored"):
+            entry[column] = sum(row[column] for row in group) / len(group)
+
+        #Count how each agent of this type died
+        killers = {}
+        for row in group:
+            if row["killer"] is not None:
+                #Numbered names ("Cat 2") are grouped by type
+                killer = row["killer"].split(" ")[0]
+                killers[killer] = killers.get(killer, 0) + 1
+        entry["killers"] = ", ".join("%s: %i" % (name, count) for name, count in sorted(killers.items()))
+        summary.append(entry)
+    return summary
+
+def printTable(summary, sweepKeys):
+    columns = sweepKeys + ["type"] + SUMMARY_COLUMNS + ["killers"]
+    cells = [[formatCell(entry[column]) for column in columns] for entry in summary]
+    widths = [max([len(column)] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+
+    print("  ".join(column.ljust(widths[i]) for i, column in enumerate(columns)))
+    for row in cells:
+        print("  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)))
+
+def formatCell(value):
+    if isinstance(value, float):
+        return "%.1f" % value
+    return str(value)
+
+def writeCsv(rows, path):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def parseValue(value):
+    #Sweep values come from the command line as strings - keep numbers as numbers, and True/False as bools
+    if value in ("True", "False"):
+        return value == "True"
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many headless games in parallel and aggregate the results")
+    parser.add_argument("--seeds", type=int, default=10, help="number of seeds per parameter combination")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--ticks", type=int, default=None, help="tick limit per run")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk", type=int, default=None, help="runs handed to a worker at a time")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=V1,V2",
+                        help="property to sweep, or fix if given one value")
+    parser.add_argument("--csv", default=None, help="also write every agent row to this file")
+    args = parser.parse_args()
+
+    sweep = {}
+    for setting in args.set:
+        key, values = setting.split("=", 1)
+        if key not in final.DEFAULT_PROPERTIES:
+            parser.error("unknown property %s" % key)
+        sweep[key] = [parseValue(value) for value in values.split(",")]
+
+    seeds = range(args.first_seed, args.first_seed + args.seeds)
+    rows = runBatch(final.DEFAULT_PROPERTIES, sweep, seeds, args.ticks, args.workers, args.chunk)
+    if len(rows) == 0:
+        print("No runs")
+        return 1
+
+    printTable(summarise(rows, list(sweep)), list(sweep))
+    if args.csv is not None:
+        writeCsv(rows, args.csv)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+#Benchmark suite for the hot paths - pathfinding, vision, threat evaluation, exploration and full ticks
+#Every case is seeded, so runs on the same machine can be compared against a saved baseline
+#e.g. python benchmark.py --save base.json, then after a change: python benchmark.py --baseline base.json
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import final
+
+SIZES = [20, 100, 250, 1000]
+WALL_PERCENTAGES = [0, 10, 30]
+SEED = 1234
+
+#Positions handed to the cases are cycled through, so each call does a different query
+POSITION_COUNT = 64
+
+def openTiles(grid, count, rng):
+    #Random open tiles, for placing agents and picking targets
+    tiles = np.argwhere(~grid.walls)
+    picks = rng.sample(range(len(tiles)), min(count, len(tiles)))
+    return [(int(tiles[i][1]), int(tiles[i][0])) for i in picks]
+
+def makeWorld(size, walls, rng):
+    grid = final.Grid(size, size, walls)
+    grid.generate()
+    mouse = final.Mouse(10 ** 9, 7.5, 20)
+    x, y = openTiles(grid, 1, rng)[0]
+    mouse.placeMe(grid, x, y)
+    return grid, mouse
+
+def moveTo(agent, tile):
+    #Only the agent's own position is read by the cases, so the grid doesn't need to know
+    agent.position = {"x": tile[0], "y": tile[1]}
+
+def casePlanPath(size, walls, rng):
+    #Out of sight chases plan again from every step - after the first plan for a goal, each call repairs the search rather than redoing it
+    #Pockets are walled in, so every goal can be reached
+    grid = final.Grid(size, size, walls)
+    grid.generate()
+    grid.fillPockets()
+    tiles = openTiles(grid, POSITION_COUNT + 1, rng)
+    mouse = final.Mouse(10 ** 9, 7.5, 20)
+    mouse.placeMe(grid, tiles[0][0], tiles[0][1])
+    mouse.instantLearnGrid(grid)
+    goals = tiles[1:]
+    calls = [0]
+
+    def op():
+        #Take the first step of the plan, moving on to the next goal once this one's reached
+        path = mouse.planPath(goals[calls[0] % len(goals)])
+        if len(path) <= 1:
+            calls[0] += 1
+        if len(path) > 0:
+            x = mouse.position["x"] + path[0][0]
+            y = mouse.position["y"] + path[0][1]
+            grid.removeOccupant(mouse.position["x"], mouse.position["y"], mouse)
+            moveTo(mouse, (x, y))
+            grid.addOccupant(x, y, mouse)
+    return op
+
+def caseFlowField(size, walls, rng):
+    #A cat chasing targets it can see - each target tile gets a field, read once for the cat's next step
+    #There are more targets than fields are kept for, so every call builds one
+    grid = final.Grid(size, size, walls)
+    grid.generate()
+    cat = final.Cat(10 ** 9, 7.5)
+    x, y = openTiles(grid, 1, rng)[0]
+    cat.placeMe(grid, x, y)
+    cat.checkVision(grid)
+    memGrid = cat.memGrid
+    known = [(int(tile[1]), int(tile[0])) for tile in np.argwhere(~memGrid.unknown & ~memGrid.walls)]
+    known = [tile for tile in known if tile != (x, y) and abs(tile[0] - x) + abs(tile[1] - y) <= cat.visionRange]
+    targets = [known[i] for i in rng.sample(range(len(known)), min(POSITION_COUNT, len(known)))]
+    reach = int(np.ceil(cat.visionRange * final.FLOW_FIELD_REACH))
+    calls = [0]
+
+    def op():
+        target = targets[calls[0] % len(targets)]
+        calls[0] += 1
+        memGrid.getFlowField(target[0], target[1], reach).getDirection(cat)
+    return op
+
+def caseVision(size, walls, rng):
+    grid, mouse = makeWorld(size, walls, rng)
+    positions = openTiles(grid, POSITION_COUNT, rng)
+    calls = [0]
+
+    def op():
+        moveTo(mouse, positions[calls[0] % len(positions)])
+        calls[0] += 1
+        mouse.getVisibleTiles(grid)
+    return op
+
+def caseCheckVision(size, walls, rng):
+    #Includes revealing tiles in memory the first time each area is seen
+    grid, mouse = makeWorld(size, walls, rng)
+    for pickup in range(size):
+        final.Pickup(20).placeMe(grid)
+    positions = openTiles(grid, POSITION_COUNT, rng)
+    calls = [0]
+
+    def op():
+        moveTo(mouse, positions[calls[0] % len(positions)])
+        calls[0] += 1
+        mouse.checkVision(grid)
+    return op
+
+def caseRunAway(size, walls, rng):
+    grid, mouse = makeWorld(size, walls, rng)
+    mouse.instantLearnGrid(grid)
+    cat = final.Cat(10 ** 9, 7.5)
+    x, y = openTiles(grid, 1, rng)[0]
+    cat.placeMe(grid, x, y)
+    positions = openTiles(grid, POSITION_COUNT, rng)
+    calls = [0]
+
+    def op():
+        moveTo(mouse, positions[calls[0] % len(positions)])
+        calls[0] += 1
+        mouse.runAway(cat)
+    return op
+
+def caseExplore(size, walls, rng):
+    #Memory is part explored by looking around from a few spots, then searched from known tiles that can still reach the frontier
+    #Spots scale with the grid's area, so small grids aren't seen in full and every search has a target to find
+    grid, mouse = makeWorld(size, walls, rng)
+    for position in openTiles(grid, max(1, size * size // 1600), rng):
+        moveTo(mouse, position)
+        mouse.checkVision(grid)
+    memGrid = mouse.memGrid
+    known = np.argwhere(~memGrid.unknown & ~memGrid.walls)
+    picks = rng.sample(range(len(known)), min(POSITION_COUNT, len(known)))
+    positions = [(int(known[i][1]), int(known[i][0])) for i in picks]
+    positions = [position for position in positions if memGrid.nearestFrontier(position[0], position[1]) is not None]
+    calls = [0]
+
+    def op():
+        moveTo(mouse, positions[calls[0] % len(positions)])
+        calls[0] += 1
+        task = final.Explore(mouse)
+        task.prepTask()
+        assert not task.fullyExplored
+    return op
+
+def caseTick(size, walls, rng):
+    #Many agents on one grid - agents don't starve, and a new game is started whenever one ends
+    properties = dict(final.DEFAULT_PROPERTIES)
+    properties.update({
+        "gridX": size, "gridY": size, "wallPercentage": walls,
+        "noCats": size // 100 + 1, "noMice": size // 25 + 4, "noPickups": size // 10 + 3,
+        "catEnergy": 10 ** 9, "mouseEnergy": 10 ** 9
+        })
+    seeds = [rng.randint(0, 2 ** 31)]
+    simulation = [final.Simulation(properties, seeds[0])]
+
+    def op():
+        if not simulation[0].running:
+            seeds[0] += 1
+            simulation[0] = final.Simulation(properties, seeds[0])
+            return False
+        simulation[0].step()
+    return op
+
+CASES = {
+    "planPath": casePlanPath,
+    "getFlowField": caseFlowField,
+    "getVisibleTiles": caseVision,
+    "checkVision": caseCheckVision,
+    "runAway": caseRunAway,
+    "Explore.prepTask": caseExplore,
+    "tick": caseTick
+    }
+
+def percentile(sortedTimes, fraction):
+    return sortedTimes[int(round(fraction * (len(sortedTimes) - 1)))]
+
+def runCase(name, size, walls, budget, minCalls, maxCalls):
+    #Calls the case's op until the time budget is spent, then once more under tracemalloc for the peak memory
+    #Ops return False for calls that shouldn't count, e.g. while setting up a new game
+    seed = SEED + size * 100 + walls
+    random.seed(seed)
+    op = CASES[name](size, walls, random.Random(seed))
+
+    times = []
+    started = time.perf_counter()
+    while len(times) < maxCalls and (len(times) < minCalls or time.perf_counter() - started < budget):
+        before = time.perf_counter()
+        counted = op()
+        after = time.perf_counter()
+        if counted is not False:
+            times.append(after - before)
+
+    tracemalloc.start()
+    op()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        "case": name,
+        "size": size,
+        "walls": walls,
+        "calls": len(times),
+        "opsPerSec": len(times) / sum(times) if sum(times) > 0 else float("inf"),
+        "p50Ms": percentile(times, 0.5) * 1000,
+        "p99Ms": percentile(times, 0.99) * 1000,
+        "peakKb": peak / 1024
+        }
+
+def resultKey(result):
+    return (result["case"], result["size"], result["walls"])
+
+def printResults(results, baseline=None):
+    #One line per case - with a baseline, the p50 change is shown as a ratio (under 1 is faster)
+    previous = {}
+    if baseline is not None:
+        previous = {resultKey(result): result for result in baseline["results"]}
+
+    header = "%-17s %5s %5s %7s %12s %10s %10s %10s" % ("case", "size", "walls", "calls", "ops/sec", "p50 ms", "p99 ms", "peak KB")
+    if baseline is not None:
+        header += " %9s" % "p50 vs base"
+    print(header)
+    for result in results:
+        line = "%-17s %5i %5i %7i %12.1f %10.3f %10.3f %10.1f" % (result["case"], result["size"], result["walls"], result["calls"],
+                                                             result["opsPerSec"], result["p50Ms"], result["p99Ms"], result["peakKb"])
+        old = previous.get(resultKey(result))
+        if old is not None and old["p50Ms"] > 0:
+            line += " %9.2fx" % (result["p50Ms"] / old["p50Ms"])
+        elif baseline is not None:
+            line += " %10s" % "-"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the simulation's hot paths on seeded grids")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="case to run (default: all)")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="comma separated grid sizes")
+    parser.add_argument("--walls", default=",".join(str(walls) for walls in WALL_PERCENTAGES), help="comma separated wall percentages")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds to spend timing each case")
+    parser.add_argument("--min-calls", type=int, default=3)
+    parser.add_argument("--max-calls", type=int, default=100000)
+    parser.add_argument("--save", default=None, help="write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="compare against results saved with --save")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = []
+    for name in args.case or list(CASES):
+        for size in [int(size) for size in args.sizes.split(",")]:
+            for walls in [int(walls) for walls in args.walls.split(",")]:
+                results.append(runCase(name, size, walls, args.time, args.min_calls, args.max_calls))
+
+    printResults(results, baseline)
+
+    if args.save is not None:
+        with open(args.save, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.platform(),
+                "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "results": results
+                }, file, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+#Reset/step environment for training policies to control a Mouse or a Cat
+#One agent is driven by the actions passed to step, everything else in the game follows its usual agenda
+#e.g. env = AgentEnv(agentType=final.Mouse, seed=0); observation = env.reset(); observation, reward, done, info = env.step(0)
+#
+#Observations are an egocentric crop of the agent's memory, as uint8 arrays of shape (channels, 2 * viewRadius + 1, 2 * viewRadius + 1)
+#Rows are y and columns are x, like grid.walls, with the agent in the centre - see CHANNELS for what each layer holds
+import itertools
+import math
+import multiprocessing
+
+import numpy as np
+
+import final
+
+#Actions in the same order as AgentBase.considerOptions - N, E, S, W
+ACTIONS = [[0, 1], [1, 0], [0, -1], [-1, 0]]
+
+#Observation layers - anything outside the grid is known and counts as a wall, as it does for isBlocked
+CHANNELS = ["known", "wall", "visible", "mouse", "cat", "pickup"]
+ENTITY_CHANNELS = {final.Mouse: CHANNELS.index("mouse"), final.Cat: CHANNELS.index("cat"), final.Pickup: CHANNELS.index("pickup")}
+
+#Reward is the points scored that step, less this if the agent died
+DEATH_PENALTY = 1
+
+class AgentEnv:
+    def __init__(self, properties=None, agentType=final.Mouse, viewRadius=None, maxTicks=None, seed=None, seedStep=1, observation=None):
+        self.properties = dict(final.DEFAULT_PROPERTIES)
+        self.properties.update(properties or {})
+        self.agentType = agentType
+        self.maxTicks = maxTicks
+
+        #Default view covers everything the agent can see
+        if viewRadius is None:
+            viewRadius = math.floor(self.properties["mouseVis"] if agentType is final.Mouse else self.properties["catVis"])
+        self.viewRadius = viewRadius
+        self.observationShape = (len(CHANNELS), 2 * viewRadius + 1, 2 * viewRadius + 1)
+        self.actionCount = len(ACTIONS)
+
+        #Observations are written into the same array every step - pass one in to have them land in a shared buffer
+        if observation is None:
+            observation = np.zeros(self.observationShape, dtype=np.uint8)
+        self.observation = observation
+
+        #Each reset moves on to the next seed, so episodes differ but can be repeated
+        self.seed = seed
+        self.seedStep = seedStep
+        self.episodes = 0
+
+        self.simulation = None
+        self.agent = None
+        self.action = None
+
+    def reset(self, seed=None):
+        #Start a new game and return the controlled agent's first observation
+        if seed is None and self.seed is not None:
+            seed = self.seed + self.episodes * self.seedStep
+        self.episodes += 1
+
+        self.simulation = final.Simulation(self.properties, seed)
+        self.agent = None
+        for agent in self.simulation.activeAgents:
+            if type(agent) is self.agentType:
+                self.agent = agent
+                break
+        if self.agent is None:
+            raise ValueError("no %s in the game to control" % self.agentType.__name__)
+        #Policies aren't saved in checkpoints - a game loaded from one needs its agent's policy setting again
+        self.agent.policy = self.getMove
+        return self.observe()
+
+    def step(self, action):
+        #Advance the game a tick with the controlled agent taking the given action
+        #Returns (observation, reward, done, info) - done once the agent dies, the game ends or maxTicks is reached
+        self.action = action
+        points = self.agent.points
+        self.simulation.step()
+
+        dead = self.agent.killer is not None
+        reward = self.agent.points - points
+        if dead:
+            reward -= DEATH_PENALTY
+        done = dead or not self.simulation.running
+        if self.maxTicks is not None and self.simulation.tick >= self.maxTicks:
+            done = True
+
+        info = {"tick": self.simulation.tick, "energy": self.agent.energy}
+        if done:
+            info["stats"] = self.agent.getStats(self.simulation.grid)
+        return self.observe(), reward, done, info
+
+    def getMove(self, agent, grid):
+        #Policy handed to the agent - invalid moves leave it where it is
+        move = ACTIONS[self.action]
+        if not agent.checkMove(grid, agent.position["x"], agent.position["y"], move[0], move[1]):
+            return [0, 0]
+        return move
+
+    def observe(self):
+        #Look around, then encode memory and sight around the agent into the observation array
+        agent = self.agent
+        grid = self.simulation.grid
+        memGrid = agent.memGrid
+        if agent.killer is None:
+            agent.entVisionCurrent = agent.checkVision(grid)
+
+        radius = self.viewRadius
+        x = agent.position["x"]
+        y = agent.position["y"]
+        observation = self.observation
+
+        #Start with everything out of bounds, then copy in the part of memory that overlaps the view
+        observation.fill(0)
+        observation[CHANNELS.index("known")] = 1
+        observation[CHANNELS.index("wall")] = 1
+        left = max(x - radius, 0)
+        right = min(x + radius + 1, grid.size["x"])
+        top = max(y - radius, 0)
+        bottom = min(y + radius + 1, grid.size["y"])
+        view = (slice(top - y + radius, bottom - y + radius), slice(left - x + radius, right - x + radius))
+        unknown, walls = memGrid.getMemoryWindow(left, top, right, bottom)
+        np.logical_not(unknown, out=observation[CHANNELS.index("known")][view])
+        observation[CHANNELS.index("wall")][view] = walls
+
+        #Visible tiles and entities are placed relative to the agent, skipping anything outside a narrowed view
+        tiles = np.fromiter(itertools.chain.from_iterable(agent.visibleTiles), dtype=np.intp, count=2 * len(agent.visibleTiles)).reshape(-1, 2)
+        columns = tiles[:, 0] - x + radius
+        rows = tiles[:, 1] - y + radius
+        inView = (columns >= 0) & (columns <= 2 * radius) & (rows >= 0) & (rows <= 2 * radius)
+        observation[CHANNELS.index("visible"), rows[inView], columns[inView]] = 1
+
+        for entity in agent.entVisionCurrent:
+            column = entity.position["x"] - x + radius
+            row = entity.position["y"] - y + radius
+            if 0 <= column <= 2 * radius and 0 <= row <= 2 * radius:
+                observation[ENTITY_CHANNELS[type(entity)], row, column] = 1
+        return observation
+
+def stepEnvs(envs, actions):
+    #Step each env, starting a new episode as soon as one finishes
+    #The finished episode's last observation is kept in its info, since the returned one is the new episode's first
+    rewards = np.zeros(len(envs))
+    dones = np.zeros(len(envs), dtype=bool)
+    infos = []
+    for i, env in enumerate(envs):
+        observation, rewards[i], dones[i], info = env.step(actions[i])
+        if dones[i]:
+            info["terminalObservation"] = observation.copy()
+            env.reset()
+        infos.append(info)
+    return rewards, dones, infos
+
+def runWorker(connection, buffer, shape, indices, settings):
+    #Worker process for VectorEnv - observations are written straight into the shared buffer, so only actions and rewards are sent
+    observations = np.frombuffer(buffer, dtype=np.uint8).reshape(shape)
+    envs = [AgentEnv(observation=observations[i], **settings(i)) for i in indices]
+    while True:
+        command, data = connection.recv()
+        if command == "reset":
+            for env in envs:
+                env.reset()
+            connection.send(None)
+        elif command == "step":
+            connection.send(stepEnvs(envs, data))
+        elif command == "close":
+            connection.close()
+            return
+
+class EnvSettings:
+    #Constructor arguments for env i of a VectorEnv - a class rather than a closure so worker processes can be sent it
+    def __init__(self, envCount, seed, **settings):
+        self.envCount = envCount
+        self.seed = seed
+        self.settings = settings
+
+    def __call__(self, i):
+        settings = dict(self.settings)
+        if self.seed is not None:
+            settings["seed"] = self.seed + i
+            settings["seedStep"] = self.envCount
+        return settings
+
+class VectorEnv:
+    #Steps several AgentEnvs together, with their observations stacked into one preallocated array
+    #With workers > 1 the envs are split across processes, each writing observations into shared memory
+    #Each game has its own generator, so an episode only depends on its seed, whatever the env count or worker count
+    def __init__(self, envCount, properties=None, agentType=final.Mouse, viewRadius=None, maxTicks=None, seed=0, workers=1):
+        self.envCount = envCount
+        settings = EnvSettings(envCount, seed, properties=properties, agentType=agentType, viewRadius=viewRadius, maxTicks=maxTicks)
+        self.observationShape = AgentEnv(**settings(0)).observationShape
+        self.actionCount = len(ACTIONS)
+        shape = (envCount,) + self.observationShape
+
+        self.workers = []
+        if workers <= 1:
+            self.observations = np.zeros(shape, dtype=np.uint8)
+            self.envs = [AgentEnv(observation=self.observations[i], **settings(i)) for i in range(envCount)]
+        else:
+            buffer = multiprocessing.RawArray("B", int(np.prod(shape)))
+            self.observations = np.frombuffer(buffer, dtype=np.uint8).reshape(shape)
+            self.envs = []
+            for indices in np.array_split(np.arange(envCount), min(workers, envCount)):
+                connection, workerConnection = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=runWorker, args=(workerConnection, buffer, shape, [int(i) for i in indices], settings), daemon=True)
+                process.start()
+                self.workers.append((connection, process, indices))
+
+    def reset(self):
+        #Start every env on a new episode and return the stacked observations
+        if len(self.workers) == 0:
+            for env in self.envs:
+                env.reset()
+        else:
+            for connection, process, indices in self.workers:
+                connection.send(("reset", None))
+            for connection, process, indices in self.workers:
+                connection.recv()
+        return self.observations
+
+    def step(self, actions):
+        #One action per env - returns (observations, rewards, dones, infos), with finished envs already reset
+        if len(self.workers) == 0:
+            rewards, dones, infos = stepEnvs(self.envs, actions)
+            return self.observations, rewards, dones, infos
+
+        for connection, process, indices in self.workers:
+            connection.send(("step", [actions[i] for i in indices]))
+        rewards = np.zeros(self.envCount)
+        dones = np.zeros(self.envCount, dtype=bool)
+        infos = []
+        for connection, process, indices in self.workers:
+            rewards[indices], dones[indices], workerInfos = connection.recv()
+            infos.extend(workerInfos)
+        return self.observations, rewards, dones, infos
+
+    def close(self):
+        for connection, process, indices in self.workers:
+            connection.send(("close", None))
+            process.join()
+        self.workers = []
@@ -1,84 +1,505 @@
 #Import libraries
-import pygame
 import random       
 import sys
+import os
+import csv
 import math
-from skimage.draw import line
+import heapq
+import json
+import time
+import io
+import pickle
+import multiprocessing
+import traceback
+import struct
+import tempfile
+import threading
+from collections import deque
+import numpy as np
 
 class GridNode:
-    def __init__(self, x, y, isWall):
-        self.coords = {"x": x, "y": y}
-        self.isWall = isWall
-        
-        self.occupant = []
-        self.unknownMarker = False
+    #View onto a single tile - the tile data itself lives in the owning grid's arrays
+    #Kept so grid.grid[y][x] still works, without storing an object per tile
+    __slots__ = ("owner", "x", "y")
+
+    def __init__(self, owner, x, y):
+        self.owner = owner
+        self.x = x
+        self.y = y
+
+    @property
+    def coords(self):
+        return {"x": self.x, "y": self.y}
+
+    @property
+    def isWall(self):
+        return self.owner.isWall(self.x, self.y)
+
+    @isWall.setter
+    def isWall(self, isWall):
+        self.owner.setWall(self.x, self.y, isWall)
+
+    @property
+    def unknownMarker(self):
+        return self.owner.isUnknown(self.x, self.y)
+
+    @unknownMarker.setter
+    def unknownMarker(self, unknownMarker):
+        self.owner.setUnknown(self.x, self.y, unknownMarker)
+
+    @property
+    def occupant(self):
+        #Read only - a copy of the tile's occupants, so changes have to go through addOccupant/removeOccupant
+        return tuple(self.owner.getOccupants(self.x, self.y))
 
     def addOccupant(self, occupant):
-        self.occupant.append(occupant)
+        self.owner.addOccupant(self.x, self.y, occupant)
 
     def removeOccupant(self, occupant):
-        self.occupant.remove(occupant) 
+        self.owner.removeOccupant(self.x, self.y, occupant)
+
+class GridRow:
+    #Single row of the grid.grid[y][x] compatibility view
+    __slots__ = ("owner", "y")
+
+    def __init__(self, owner, y):
+        self.owner = owner
+        self.y = y
+
+    def __len__(self):
+        return self.owner.size["x"]
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.owner.size["x"]
+        if x < 0 or x >= self.owner.size["x"]:
+            raise IndexError("grid column out of range")
+        return GridNode(self.owner, x, self.y)
+
+class GridRows:
+    #grid.grid[y][x] compatibility view - rows and tiles are created on access
+    __slots__ = ("owner",)
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def __len__(self):
+        return self.owner.size["y"]
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.owner.size["y"]
+        if y < 0 or y >= self.owner.size["y"]:
+            raise IndexError("grid row out of range")
+        return GridRow(self.owner, y)
 
 class Grid:
     def __init__(self, lenX, lenY, wallPercentage):
         self.size = {"x": lenX, "y": lenY }
         self.tileProperties = { "size" : 20, "margin" : 1 }
         self.wallPercentage = wallPercentage
-        self.grid = []
         self.debugGrid = False
 
+        #Tiles are stored as arrays rather than an object each - one byte per tile for walls
+        #Occupants are only stored for tiles that have any, keyed by (x, y)
+        self.clearWalls()
+        self.occupants = {}
+        self.grid = GridRows(self)
+
+        #Spatial index of occupants for range queries - by type, then by chunk of tiles
+        #Each chunk is a dict rather than a set, so queries come back in a repeatable order
+        self.entities = {}
+        self.entityChunkSize = 8
+
+        #Known open tiles that border an unknown tile - always empty on a fully known grid
+        self.frontier = set()
+
+        #Random numbers for generating walls and picking free tiles - the random module unless a Simulation hands the grid its own
+        self.random = random
+
+        #Shared distance fields, keyed by target tile and the wall version they were built for - most recently used last
+        self.flowFields = {}
+        self.maxFlowFields = 16
+        #Fields built on agents' memories of this grid, keyed by target tile, reach and the walls known within it
+        self.memoryFlowFields = {}
+
     def generate(self):
+        #For now, randomly assign IDs to the rows - either walls or empty tiles
+        #If there's time later, give option to place walls manually
+        #Rows are filled straight into the wall array, so no list of lists is built on the way
+        walls = np.empty((self.size["y"], self.size["x"]), dtype=bool)
         for y in range(self.size["y"]):
-            row = []
-            for x in range (self.size["x"]):
-                #For now, randomly assign IDs to the rows - either walls or empty tiles
-                #If there's time later, give option to place walls manually
-                if(random.randint(1, 100) > self.wallPercentage):
-                    row.append(GridNode(x, y, False))
-                else:
-                    row.append(GridNode(x, y, True))
-            self.grid.append(row)
+            walls[y] = np.fromiter((self.random.randint(1, 100) <= self.wallPercentage for x in range(self.size["x"])),
+                                   dtype=bool, count=self.size["x"])
+        self.setWalls(walls)
+
+    def clearWalls(self):
+        self.setWalls(np.zeros((self.size["y"], self.size["x"]), dtype=bool))
+
+    def setWalls(self, walls):
+        #Keep a flat byte view of the wall mask - indexing it is much cheaper than indexing the array one tile at a time
+        self.walls = walls
+        self.wallBytes = memoryview(walls).cast("B")
+        #Bumped whenever walls change, so cached drawings of them know to redraw
+        self.wallVersion = getattr(self, "wallVersion", 0) + 1
+        #Connected regions of open tiles are labelled the first time they're needed
+        self.componentLabels = None
+        #So is the index of free tiles, which memory grids never need
+        self.freeTiles = None
+        self.freeTileArray = None
+
+    def __getstate__(self):
+        #Flat views can't be saved, so are left out and made again from the arrays when loaded
+        #The free index is kept rather than built again, since random picks from it depend on its order
+        return {key: value for key, value in self.__dict__.items() if not isinstance(value, memoryview)}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.makeViews()
+
+    def makeViews(self):
+        self.wallBytes = memoryview(self.walls).cast("B")
+        self.freeTiles = None
+        if self.freeTileArray is not None:
+            self.freeTiles = memoryview(self.freeTileArray).cast("B").cast("i")
+            self.freeSlots = memoryview(self.freeSlotArray).cast("B").cast("i")
+
+    def inBounds(self, x, y):
+        return 0 <= x < self.size["x"] and 0 <= y < self.size["y"]
+
+    def getWallWindow(self, left, top, right, bottom):
+        #Walls in the rectangle, as a [y, x] array
+        return self.walls[top:bottom, left:right]
+
+    def createMemory(self):
+        #Blank memory of this grid for an agent, with occupants read live from it
+        memGrid = MemGrid(self.size["x"], self.size["y"], 0)
+        memGrid.generate(self)
+        return memGrid
+
+    def isWall(self, x, y):
+        return self.wallBytes[y * self.size["x"] + x] == 1
+
+    def isBlocked(self, x, y):
+        #Tiles outside the grid count as walls
+        if x < 0 or y < 0 or x >= self.size["x"] or y >= self.size["y"]:
+            return True
+        return self.wallBytes[y * self.size["x"] + x] == 1
+
+    def setWall(self, x, y, isWall):
+        self.walls[y, x] = isWall
+        self.wallVersion += 1
+        self.updateComponents(x, y, isWall)
+        if self.freeTiles is not None:
+            if isWall:
+                self.removeFreeTile(y * self.size["x"] + x)
+            elif (x, y) not in self.occupants:
+                self.addFreeTile(y * self.size["x"] + x)
+        if isWall:
+            self.markWall(x, y)
+
+    def updateComponents(self, x, y, isWall):
+        #Walls on the real grid hardly ever change, so just label again when next asked
+        self.componentLabels = None
+
+    def labelComponents(self):
+        #Label every 4-connected region of open tiles, with walls as -1
+        #Each row is split into runs of open tiles, which are then merged into regions
+        openTiles = ~self.walls
+        height, width = openTiles.shape
+        runStarts = openTiles.copy()
+        runStarts[:, 1:] &= ~openTiles[:, :-1]
+        runCount = int(np.count_nonzero(runStarts))
+        if runCount == 0:
+            self.setComponentLabels(np.full((height, width), -1, dtype=np.int32), 0)
+            return
+        runIds = np.cumsum(runStarts.ravel()).reshape(height, width) - 1
+
+        #Runs touching the row below are joined by hooking the larger root onto the smaller, then jumping pointers, until every pair agrees
+        touching = openTiles[:-1] & openTiles[1:]
+        above = runIds[:-1][touching]
+        below = runIds[1:][touching]
+        roots = np.arange(runCount)
+        while True:
+            rootsAbove = roots[above]
+            rootsBelow = roots[below]
+            if (rootsAbove == rootsBelow).all():
+                break
+            np.minimum.at(roots, np.maximum(rootsAbove, rootsBelow), np.minimum(rootsAbove, rootsBelow))
+            while True:
+                jumped = roots[roots]
+                if (jumped == roots).all():
+                    break
+                roots = jumped
+
+        uniqueRoots, runLabels = np.unique(roots, return_inverse=True)
+        self.setComponentLabels(np.where(openTiles, runLabels[runIds], -1).astype(np.int32), len(uniqueRoots))
+
+    def setComponentLabels(self, labels, count):
+        self.componentLabels = labels
+        self.componentCount = count
+
+    def getComponents(self):
+        if self.componentLabels is None:
+            self.labelComponents()
+        return self.componentLabels
+
+    def getStartComponents(self, x, y):
+        #Regions an agent on this tile can move into - its own, or any next to it if it's been placed on a wall
+        labels = self.getComponents()
+        if not self.isBlocked(x, y):
+            return (labels[y, x],)
+        return tuple(labels[y + dy, x + dx] for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)) if not self.isBlocked(x + dx, y + dy))
+
+    def isReachable(self, start, target):
+        #Whether there's any route at all from start to target - cheap enough to check before every search
+        if self.isBlocked(target[0], target[1]):
+            return False
+        return self.getComponents()[target[1], target[0]] in self.getStartComponents(start[0], start[1])
+
+    def hasReachableFrontier(self, x, y):
+        #The real grid is fully known, so has no frontier
+        return len(self.frontier) > 0
+
+    def fillPockets(self):
+        #Wall in every region but the largest, so every open tile can be reached from every other
+        labels = self.getComponents()
+        if self.componentCount < 2:
+            return
+        largest = np.bincount(labels[labels >= 0]).argmax()
+        self.setWalls(self.walls | (labels != largest))
+
+    def buildFreeIndex(self):
+        #Every open tile with nothing on it, as flat indices in the first freeCount entries, and where each one is in that list (-1 if it isn't)
+        #Tiles are swapped to the end of the list to remove them, so adding, removing and picking one at random are all O(1)
+        #Both are arrays with room for every tile, so checkpoints can map them rather than save a list of ints
+        free = ~self.walls.ravel()
+        for x, y in self.occupants:
+            free[y * self.size["x"] + x] = False
+        freeIndices = np.flatnonzero(free)
+        self.freeCount = len(freeIndices)
+        self.freeTileArray = np.zeros(len(free), dtype=np.int32)
+        self.freeTileArray[:self.freeCount] = freeIndices
+        self.freeSlotArray = np.full(len(free), -1, dtype=np.int32)
+        self.freeSlotArray[freeIndices] = np.arange(self.freeCount, dtype=np.int32)
+        self.makeViews()
+
+    def addFreeTile(self, index):
+        if self.freeSlots[index] < 0:
+            self.freeSlots[index] = self.freeCount
+            self.freeTiles[self.freeCount] = index
+            self.freeCount += 1
+
+    def removeFreeTile(self, index):
+        slot = self.freeSlots[index]
+        if slot >= 0:
+            self.freeCount -= 1
+            last = self.freeTiles[self.freeCount]
+            if last != index:
+                self.freeTiles[slot] = last
+                self.freeSlots[last] = slot
+            self.freeSlots[index] = -1
+
+    def getRandomFreeTile(self):
+        #Random open tile with nothing on it, or None if there aren't any - takes the same time however full the grid is
+        if self.freeTiles is None:
+            self.buildFreeIndex()
+        if self.freeCount == 0:
+            return None
+        index = self.freeTiles[self.random.randrange(self.freeCount)]
+        return index % self.size["x"], index // self.size["x"]
+
+    def isUnknown(self, x, y):
+        #The real grid is always fully known
+        return False
+
+    def setUnknown(self, x, y, unknownMarker):
+        pass
+
+    def getMemoryWindow(self, left, top, right, bottom):
+        #Same as MemGrid's, for agents given the whole grid by instantLearnGrid - nothing in it is unknown
+        return np.zeros((bottom - top, right - left), dtype=bool), self.getWallWindow(left, top, right, bottom)
+
+    def countUnknown(self):
+        return 0
+
+    def nearestFrontier(self, x, y):
+        #Breadth first search through known open tiles for the closest frontier tile
+        #Returns the tile and the moves to get there, or None if no frontier tile can be reached
+        if not self.hasReachableFrontier(x, y):
+            return None
+        start = (x, y)
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            tile = queue.popleft()
+            if tile in self.frontier and tile != start:
+                target = tile
+                path = []
+                while parents[tile] is not None:
+                    previous = parents[tile]
+                    path.append([tile[0] - previous[0], tile[1] - previous[1]])
+                    tile = previous
+                path.reverse()
+                return target, path
+            for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                nx = tile[0] + dx
+                ny = tile[1] + dy
+                if (nx, ny) in parents or self.isBlocked(nx, ny) or self.isUnknown(nx, ny):
+                    continue
+                parents[(nx, ny)] = tile
+                queue.append((nx, ny))
+        return None
+
+    def getOccupants(self, x, y):
+        return self.occupants.get((x, y), [])
+
+    def addOccupant(self, x, y, occupant):
+        tile = self.occupants.get((x, y))
+        if tile is None:
+            self.occupants[(x, y)] = [occupant]
+            if self.freeTiles is not None:
+                self.removeFreeTile(y * self.size["x"] + x)
+        else:
+            tile.append(occupant)
+
+        #Counted per chunk, since a pickup is added to its new tile before it leaves the old one
+        chunk = self.entities.setdefault(type(occupant), {}).setdefault((x // self.entityChunkSize, y // self.entityChunkSize), {})
+        chunk[occupant] = chunk.get(occupant, 0) + 1
+
+    def removeOccupant(self, x, y, occupant):
+        tile = self.occupants[(x, y)]
+        tile.remove(occupant)
+        if len(tile) == 0:
+            del self.occupants[(x, y)]
+            if self.freeTiles is not None and not self.isWall(x, y):
+                self.addFreeTile(y * self.size["x"] + x)
+
+        chunks = self.entities[type(occupant)]
+        chunkKey = (x // self.entityChunkSize, y // self.entityChunkSize)
+        chunk = chunks[chunkKey]
+        if chunk[occupant] > 1:
+            chunk[occupant] -= 1
+        else:
+            del chunk[occupant]
+            if len(chunk) == 0:
+                del chunks[chunkKey]
+
+    def getEntityChunks(self, entityType):
+        #Chunk dicts for a type and any of its subclasses - every type if none is given
+        return [chunks for kind, chunks in self.entities.items() if entityType is None or issubclass(kind, entityType)]
+
+    def getEntitiesInRadius(self, x, y, radius, entityType=None):
+        #Everything within radius of (x, y), in no particular order
+        size = self.entityChunkSize
+        radiusSquared = radius * radius
+        reach = int(math.floor(radius))
+        found = []
+        for chunks in self.getEntityChunks(entityType):
+            for chunkY in range((y - reach) // size, (y + reach) // size + 1):
+                for chunkX in range((x - reach) // size, (x + reach) // size + 1):
+                    for entity in chunks.get((chunkX, chunkY), ()):
+                        position = entity.position
+                        if (position["x"] - x) ** 2 + (position["y"] - y) ** 2 <= radiusSquared:
+                            found.append(entity)
+        return found
+
+    def getNearestEntities(self, x, y, entityType=None, count=1, maxRadius=None):
+        #The closest count entities to (x, y), nearest first - or with count None, every one within maxRadius
+        #Chunks are searched in rings outwards, stopping once nothing further out could be closer
+        size = self.entityChunkSize
+        centreX = x // size
+        centreY = y // size
+        maxRing = max(centreX, centreY, (self.size["x"] - 1) // size - centreX, (self.size["y"] - 1) // size - centreY)
+        allChunks = self.getEntityChunks(entityType)
+
+        if count is not None and count <= 0:
+            return []
+
+        candidates = []
+        for ring in range(maxRing + 1):
+            for chunkY in range(centreY - ring, centreY + ring + 1):
+                #Only the edge of the square - the middle has already been searched
+                step = 1 if ring == 0 or chunkY in (centreY - ring, centreY + ring) else 2 * ring
+                for chunkX in range(centreX - ring, centreX + ring + 1, step):
+                    for chunks in allChunks:
+                        for entity in chunks.get((chunkX, chunkY), ()):
+                            position = entity.position
+                            candidates.append(((position["x"] - x) ** 2 + (position["y"] - y) ** 2, len(candidates), entity))
+
+            #Anything in the next ring out is at least this far away
+            nextRingDist = ring * size + 1
+            if maxRadius is not None and nextRingDist > maxRadius:
+                break
+            if count is not None and len(candidates) >= count and sorted(candidates)[count - 1][0] <= nextRingDist * nextRingDist:
+                break
+
+        candidates.sort()
+        if maxRadius is not None:
+            candidates = [candidate for candidate in candidates if candidate[0] <= maxRadius * maxRadius]
+        return [candidate[2] for candidate in candidates[:count]]
         
-    def draw(self, screen):
-        #Draw squares in rows and columns
-        for y in range(len(self.grid)):
-            for x in range(len(self.grid[0])):
-                #Draw tiles and margins according to properties
-                tile = [
-                    (self.tileProperties["margin"] + self.tileProperties["size"]) * x + self.tileProperties["margin"],
-                    (self.tileProperties["margin"] + self.tileProperties["size"]) * y + self.tileProperties["margin"],
-                    self.tileProperties["size"], self.tileProperties["size"]
-                    ]
-                #Pick colour based on tile contents
-                if self.grid[y][x].isWall == False:
-                    tileColour = WHITE
-                else:
-                    tileColour = BLACK
-
-                if len (self.grid[y][x].occupant) > 0:
-                    if isinstance(self.grid[y][x].occupant[0], Pickup):
-                            tileColour = GREEN
-                    elif isinstance(self.grid[y][x].occupant[0], Mouse):
-                            tileColour = BLUE
-                    elif isinstance(self.grid[y][x].occupant[0], Cat):
-                            tileColour = RED
-                
-                #Draw the tile
-                pygame.draw.rect(screen, tileColour, pygame.Rect(tile))
+    def getTileRect(self, x, y):
+        #Draw tiles and margins according to properties
+        import pygame
+        return pygame.Rect(
+            (self.tileProperties["margin"] + self.tileProperties["size"]) * x + self.tileProperties["margin"],
+            (self.tileProperties["margin"] + self.tileProperties["size"]) * y + self.tileProperties["margin"],
+            self.tileProperties["size"], self.tileProperties["size"]
+            )
+
+    def getOccupantColours(self):
+        return getOccupantColours(self.occupants)
+
+    def getFlowField(self, x, y, reach=None):
+        #Fields are built on the grid they're asked of - an agent's memory, with unknown tiles counted as open like every other planner
+        #A field that stops reach tiles from its target only depends on the walls known within reach, so memories of the same grid
+        #share one whenever they know the same walls there - otherwise every agent heading for the tile with the same memory shares one
+        #Chased agents usually move every tick, so most lookups still build a field - sharing only pays off when pursuers close on one tile
+        source = getattr(self, "source", None)
+        walls = None
+        if reach is None or source is None:
+            fields = self.flowFields
+            key = (x, y, self.wallVersion)
+        else:
+            fields = source.memoryFlowFields
+            left = max(x - reach, 0)
+            top = max(y - reach, 0)
+            walls = self.getMemoryWindow(left, top, min(x + reach + 1, self.size["x"]), min(y + reach + 1, self.size["y"]))[1]
+            walls = (left, top, walls.shape[1], walls.tobytes())
+            key = (x, y, reach, walls)
+        field = fields.pop(key, None)
+        if field is None:
+            countEvent("flowField.built")
+            field = FlowField(self, (x, y), reach, walls)
+        fields[key] = field
+
+        #Forget the least recently used field if there are too many
+        if len(fields) > self.maxFlowFields:
+            del fields[next(iter(fields))]
+
+        return field
+
+    def markWall(self, x, y):
+        #Fields built before the wall can't be asked for again
+        for key in list(self.flowFields):
+            if key[2] != self.wallVersion:
+                del self.flowFields[key]
 
     def printText(self, hero):
         #Prints the map as ascii in the console
-        for y in range(len(self.grid)):
-            for x in range(len(self.grid[0])):
-                if len(self.grid[y][x].occupant) > 0:
+        for y in range(self.size["y"]):
+            for x in range(self.size["x"]):
+                occupants = self.getOccupants(x, y)
+                if len(occupants) > 0:
                     #Tile containing the current agent
-                    if(self.grid[y][x].occupant[0] == hero):
+                    if(occupants[0] == hero):
                         print("A", end=" ")
                     #Tile containing another agent
                     else:
                         print("X", end=" ")
                 #Tile containing a wall
-                elif (self.grid[y][x].isWall):
+                elif (self.isWall(x, y)):
                     print("■", end=" ")
                 #Empty tile
                 else:
@@ -87,34 +508,231 @@ class Grid:
         print("\n")
 
 class MemGrid(Grid):
+    #Set to a list by a DecisionPool worker while its agent decides, to collect the tiles revealed for the game's own copy of the memory
+    revealed = None
+
     def __init__(self, lenX, lenY, wallPercentage):
         super().__init__(lenX, lenY, wallPercentage)
+        self.setUnknownMask(np.ones((lenY, lenX), dtype=bool))
+        self.source = None
 
-    def generate(self):
+    def generate(self, source=None):
         #Generate a grid filled with unknown values to fill in later
         #Assumed not to have walls until seen
-        for y in range(self.size["y"]):
-            row = []
-            for x in range (self.size["x"]):
-                row.append(GridNode(x, y, False))
-                row[x].unknownMarker = True
-            self.grid.append(row)
-            
+        self.setWalls(np.zeros((self.size["y"], self.size["x"]), dtype=bool))
+        self.setUnknownMask(np.ones((self.size["y"], self.size["x"]), dtype=bool))
+        self.frontier = set()
+        #With no walls known, memory starts as one region
+        self.setComponentLabels(np.zeros((self.size["y"], self.size["x"]), dtype=np.int32), 1)
+
+        #Occupants of tiles that have been seen are read live from the real grid
+        self.source = source
+        if source is not None:
+            self.occupants = source.occupants
+            self.entities = source.entities
+
+    def makeViews(self):
+        super().makeViews()
+        self.unknownBytes = memoryview(self.unknown).cast("B")
+        if self.componentLabels is not None:
+            self.componentView = memoryview(self.componentLabels).cast("B").cast("i")
+
+    def setUnknownMask(self, unknown):
+        self.unknown = unknown
+        self.unknownBytes = memoryview(unknown).cast("B")
+        #Kept up to date as tiles are revealed, so the explored percentage is cheap enough to read every tick
+        self.unknownCount = int(np.count_nonzero(unknown))
+
+    def isUnknown(self, x, y):
+        return self.unknownBytes[y * self.size["x"] + x] == 1
+
+    def setUnknown(self, x, y, unknownMarker):
+        self.unknownCount += int(unknownMarker) - self.unknownBytes[y * self.size["x"] + x]
+        self.unknown[y, x] = unknownMarker
+
+    def countUnknown(self):
+        return self.unknownCount
+
+    def getMemoryWindow(self, left, top, right, bottom):
+        #Unknown and wall masks in the rectangle, as [y, x] arrays
+        return self.unknown[top:bottom, left:right], self.walls[top:bottom, left:right]
+
+    def getOccupants(self, x, y):
+        #Nothing is known to be in a tile that hasn't been seen
+        if self.unknownBytes[y * self.size["x"] + x]:
+            return []
+        return self.occupants.get((x, y), [])
+
+    def reveal(self, x, y, isWall):
+        #Tile has been seen - copy it into memory
+        #Unknown tiles are already open in memory, so only finding a wall changes it - fields built on it are kept otherwise
+        self.setUnknown(x, y, False)
+        if isWall:
+            self.setWall(x, y, True)
+        if self.revealed is not None:
+            self.revealed.append((x, y, isWall))
+
+        #Only this tile and its neighbours can change frontier status
+        self.updateFrontier(x, y)
+        for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+            if self.inBounds(x + dx, y + dy):
+                self.updateFrontier(x + dx, y + dy)
+
+    def updateFrontier(self, x, y):
+        width = self.size["x"]
+        index = y * width + x
+        if not self.unknownBytes[index] and not self.wallBytes[index]:
+            for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                nx = x + dx
+                ny = y + dy
+                if self.inBounds(nx, ny) and self.unknownBytes[ny * width + nx]:
+                    if (x, y) not in self.frontier:
+                        self.frontier.add((x, y))
+                        self.countFrontier(x, y, 1)
+                    return
+        if (x, y) in self.frontier:
+            self.frontier.discard((x, y))
+            self.countFrontier(x, y, -1)
+
+    def countFrontier(self, x, y, change):
+        #Frontier tiles are counted per region, so whether any can be reached is known without searching
+        #Walls belong to no region - a frontier tile that's walled in is taken off its region's count by updateComponents
+        if self.componentLabels is not None:
+            label = int(self.componentLabels[y, x])
+            if label >= 0:
+                self.componentFrontier[label] = self.componentFrontier.get(label, 0) + change
+
+    def hasReachableFrontier(self, x, y):
+        if not self.frontier:
+            return False
+        self.getComponents()
+        return any(self.componentFrontier.get(int(label), 0) > 0 for label in self.getStartComponents(x, y))
+
+    def setComponentLabels(self, labels, count):
+        super().setComponentLabels(labels, count)
+        #Flat view for the incremental updates - indexing it is much cheaper than indexing the array
+        self.componentView = memoryview(labels).cast("B").cast("i")
+        self.componentFrontier = {}
+        for x, y in self.frontier:
+            self.countFrontier(x, y, 1)
+
+    def updateComponents(self, x, y, isWall):
+        #Walls only ever appear in memory, so regions can split but never join
+        #Most new walls can't split anything, and the pieces are only searched for when one might
+        if self.componentLabels is None:
+            return
+        width = self.size["x"]
+        index = y * width + x
+        label = self.componentView[index]
+        if (label < 0) == isWall:
+            return
+        if not isWall:
+            #Only happens if memory is edited by hand - joining regions isn't tracked, so label again when next asked
+            self.componentLabels = None
+            return
+
+        self.componentView[index] = -1
+        if (x, y) in self.frontier:
+            self.componentFrontier[label] -= 1
+        if not self.isLocallyConnected(x, y):
+            self.splitComponent(label, [neighbour for neighbour in self.getFlatNeighbours(index) if not self.wallBytes[neighbour]])
+
+    def getFlatNeighbours(self, index):
+        #Flat indices of the tiles next to this one that are inside the grid
+        width = self.size["x"]
+        x = index % width
+        neighbours = []
+        if index >= width:
+            neighbours.append(index - width)
+        if index + width < len(self.wallBytes):
+            neighbours.append(index + width)
+        if x > 0:
+            neighbours.append(index - 1)
+        if x < width - 1:
+            neighbours.append(index + 1)
+        return neighbours
+
+    def isLocallyConnected(self, x, y):
+        #Whether the open tiles next to this one are joined by the ring of eight around it
+        #If so, walling it in can't cut anything off
+        ring = [not self.isBlocked(x + dx, y + dy) for dx, dy in ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))]
+        arcs = 0
+        for side in (0, 2, 4, 6):
+            #An open side starts a new arc unless it's joined to the previous side through the corner between them
+            if ring[side] and not (ring[side - 1] and ring[side - 2]):
+                arcs += 1
+        return arcs <= 1
+
+    def splitComponent(self, label, starts):
+        #Search outwards from each tile next to the new wall in turn, joining searches when they meet
+        #A group of searches that runs out of tiles first has been cut off, so gets a label of its own
+        #Only the smaller pieces are searched in full - the search stops as soon as one group is left
+        view = self.componentView
+        width = self.size["x"]
+        owners = {start: i for i, start in enumerate(starts)}
+        queues = [deque([start]) for start in starts]
+        groups = list(range(len(starts)))
+        members = {i: [i] for i in range(len(starts))}
+
+        def find(search):
+            while groups[search] != search:
+                search = groups[search]
+            return search
+
+        while len(members) > 1:
+            for group in list(members):
+                if group not in members:
+                    continue
+                search = None
+                for i in members[group]:
+                    if queues[i]:
+                        search = i
+                        break
+                if search is None:
+                    #Cut off - move the piece and its frontier tiles to a new label
+                    newLabel = self.componentCount
+                    self.componentCount += 1
+                    for index, owner in owners.items():
+                        if find(owner) == group:
+                            view[index] = newLabel
+                            tile = (index % width, index // width)
+                            if tile in self.frontier:
+                                self.componentFrontier[label] -= 1
+                                self.componentFrontier[newLabel] = self.componentFrontier.get(newLabel, 0) + 1
+                    del members[group]
+                    if len(members) == 1:
+                        break
+                    continue
+
+                for neighbour in self.getFlatNeighbours(queues[search].popleft()):
+                    if view[neighbour] != label:
+                        continue
+                    owner = owners.get(neighbour)
+                    if owner is None:
+                        owners[neighbour] = search
+                        queues[search].append(neighbour)
+                    elif find(owner) != group:
+                        #Met another group - they're still connected
+                        other = find(owner)
+                        groups[other] = group
+                        members[group].extend(members.pop(other))
+
     def printText(self, hero):
         #Prints the map as ascii in the console
-        for y in range(len(self.grid)):
-            for x in range(len(self.grid[0])):
-                if self.grid[y][x].unknownMarker:
+        for y in range(self.size["y"]):
+            for x in range(self.size["x"]):
+                occupants = self.getOccupants(x, y)
+                if self.isUnknown(x, y):
                     #Unknown Tile
                     print("?", end=" ")
-                elif len(self.grid[y][x].occupant) > 0:
-                    if(self.grid[y][x].occupant[0] == hero):
+                elif len(occupants) > 0:
+                    if(occupants[0] == hero):
                         #Tile containing the current agent
                         print("A", end=" ")
                     else:
                         #Tile containing another agent
                         print("X", end=" ")
-                elif (self.grid[y][x].isWall):
+                elif (self.isWall(x, y)):
                     #Tile containing a wall
                     print("■", end=" ")
                 else:
@@ -122,7 +740,537 @@ class MemGrid(Grid):
                     print("□", end=" ")
             print("")
         print("\n")
-    
+
+
+
+#Random tiles tried when placing something on a ChunkedGrid before giving up
+FREE_TILE_TRIES = 1000
+
+class ChunkedGrid(Grid):
+    #Grid whose walls are generated a chunk at a time, the first time anything reads them
+    #Each chunk comes from the seed and the chunk's position alone, so the world is the same in whatever order it's explored
+    #Nothing the size of the whole grid is ever allocated, so it can be far bigger than would fit in memory
+    def __init__(self, lenX, lenY, wallPercentage, seed=0, chunkSize=64):
+        self.seed = seed
+        self.chunkSize = chunkSize
+        super().__init__(lenX, lenY, wallPercentage)
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        #Only the arrays in each chunk are saved - every other entry is a view of the one before it
+        state["chunks"] = {key: chunk[::2] for key, chunk in self.chunks.items()}
+        return state
+
+    def makeViews(self):
+        self.chunks = {key: self.makeChunk(*arrays) for key, arrays in self.chunks.items()}
+
+    def makeChunk(self, *arrays):
+        #Each array is followed by a flat byte view of it
+        chunk = ()
+        for array in arrays:
+            chunk += (array, memoryview(array).cast("B"))
+        return chunk
+
+    def clearWalls(self):
+        #Chunks are (walls, flat byte view of walls), keyed by (chunkX, chunkY)
+        self.chunks = {}
+        self.wallVersion = getattr(self, "wallVersion", 0) + 1
+        self.componentLabels = None
+        self.freeTiles = None
+        self.freeTileArray = None
+
+    def generate(self):
+        #Chunks are generated as they're read, so just forget any already made
+        self.clearWalls()
+
+    def createChunk(self, chunkX, chunkY):
+        #Same odds per tile as Grid.generate
+        rng = np.random.default_rng([self.seed, chunkX, chunkY])
+        walls = rng.integers(1, 101, (self.chunkSize, self.chunkSize)) <= self.wallPercentage
+        return self.makeChunk(walls)
+
+    def getChunk(self, chunkX, chunkY):
+        chunk = self.chunks.get((chunkX, chunkY))
+        if chunk is None:
+            chunk = self.createChunk(chunkX, chunkY)
+            self.chunks[(chunkX, chunkY)] = chunk
+        return chunk
+
+    def getWindow(self, layer, left, top, right, bottom, fill=None):
+        #One layer of the chunks overlapping the rectangle, copied into a [y, x] array
+        #Missing chunks are generated, or left as fill if one is given
+        size = self.chunkSize
+        window = np.empty((max(bottom - top, 0), max(right - left, 0)), dtype=bool)
+        for chunkY in range(top // size, (bottom - 1) // size + 1):
+            for chunkX in range(left // size, (right - 1) // size + 1):
+                x0 = max(left, chunkX * size)
+                x1 = min(right, (chunkX + 1) * size)
+                y0 = max(top, chunkY * size)
+                y1 = min(bottom, (chunkY + 1) * size)
+                target = window[y0 - top:y1 - top, x0 - left:x1 - left]
+                chunk = self.chunks.get((chunkX, chunkY)) if fill is not None else self.getChunk(chunkX, chunkY)
+                if chunk is None:
+                    target.fill(fill)
+                else:
+                    target[:] = chunk[layer][y0 - chunkY * size:y1 - chunkY * size, x0 - chunkX * size:x1 - chunkX * size]
+        return window
+
+    def getWallWindow(self, left, top, right, bottom):
+        return self.getWindow(0, left, top, right, bottom)
+
+    def isWall(self, x, y):
+        size = self.chunkSize
+        return self.getChunk(x // size, y // size)[1][(y % size) * size + x % size] == 1
+
+    def isBlocked(self, x, y):
+        #Tiles outside the grid count as walls
+        if x < 0 or y < 0 or x >= self.size["x"] or y >= self.size["y"]:
+            return True
+        return self.isWall(x, y)
+
+    def setWall(self, x, y, isWall):
+        size = self.chunkSize
+        self.getChunk(x // size, y // size)[0][y % size, x % size] = isWall
+        self.wallVersion += 1
+        if isWall:
+            self.markWall(x, y)
+
+    def labelComponents(self):
+        raise ValueError("regions of a chunked grid can't be labelled without generating every chunk")
+
+    def isReachable(self, start, target):
+        #Regions aren't labelled, so only targets in walls are ruled out
+        return not self.isBlocked(target[0], target[1])
+
+    def getRandomFreeTile(self):
+        #An index of free tiles would cover the whole grid, so try random tiles instead - None if none of them are free
+        for attempt in range(FREE_TILE_TRIES):
+            x = self.random.randrange(self.size["x"])
+            y = self.random.randrange(self.size["y"])
+            if not self.isWall(x, y) and (x, y) not in self.occupants:
+                return x, y
+        return None
+
+    def createMemory(self):
+        memGrid = ChunkedMemGrid(self.size["x"], self.size["y"], self.chunkSize)
+        memGrid.generate(self)
+        return memGrid
+
+class ChunkedMemGrid(ChunkedGrid):
+    #Memory of a ChunkedGrid that only stores chunks the agent has seen some of - everywhere else is unknown
+    #As with MemGrid, unknown tiles are assumed open, so memory grows with the area explored rather than the size of the grid
+    revealed = None
+
+    def __init__(self, lenX, lenY, chunkSize=64):
+        super().__init__(lenX, lenY, 0, chunkSize=chunkSize)
+        self.unknownCount = lenX * lenY
+        self.source = None
+
+    def generate(self, source=None):
+        self.clearWalls()
+        self.unknownCount = self.size["x"] * self.size["y"]
+        self.frontier = set()
+
+        #Occupants of tiles that have been seen are read live from the real grid
+        self.source = source
+        if source is not None:
+            self.occupants = source.occupants
+            self.entities = source.entities
+
+    def createChunk(self, chunkX, chunkY):
+        #Chunks are (walls, flat byte view of walls, unknown, flat byte view of unknown)
+        walls = np.zeros((self.chunkSize, self.chunkSize), dtype=bool)
+        unknown = np.ones((self.chunkSize, self.chunkSize), dtype=bool)
+        return self.makeChunk(walls, unknown)
+
+    def getMemoryWindow(self, left, top, right, bottom):
+        #Reading memory never adds chunks to it
+        return self.getWindow(2, left, top, right, bottom, True), self.getWindow(0, left, top, right, bottom, False)
+
+    def isWall(self, x, y):
+        size = self.chunkSize
+        chunk = self.chunks.get((x // size, y // size))
+        return chunk is not None and chunk[1][(y % size) * size + x % size] == 1
+
+    def isUnknown(self, x, y):
+        size = self.chunkSize
+        chunk = self.chunks.get((x // size, y // size))
+        return chunk is None or chunk[3][(y % size) * size + x % size] == 1
+
+    def setUnknown(self, x, y, unknownMarker):
+        size = self.chunkSize
+        unknown = self.getChunk(x // size, y // size)[3]
+        index = (y % size) * size + x % size
+        self.unknownCount += int(unknownMarker) - unknown[index]
+        unknown[index] = int(unknownMarker)
+
+    def countUnknown(self):
+        return self.unknownCount
+
+    def getOccupants(self, x, y):
+        #Nothing is known to be in a tile that hasn't been seen
+        if self.isUnknown(x, y):
+            return []
+        return self.occupants.get((x, y), [])
+
+    #Same as MemGrid, through this class's tile accessors
+    reveal = MemGrid.reveal
+    printText = MemGrid.printText
+
+    def updateFrontier(self, x, y):
+        if not self.isUnknown(x, y) and not self.isWall(x, y):
+            for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                if self.inBounds(x + dx, y + dy) and self.isUnknown(x + dx, y + dy):
+                    self.frontier.add((x, y))
+                    return
+        self.frontier.discard((x, y))
+
+    def hasReachableFrontier(self, x, y):
+        #Regions aren't labelled - nearestFrontier only searches known tiles, so still gives up quickly if none can be reached
+        return len(self.frontier) > 0
+
+    def isReachable(self, start, target):
+        #With unknown tiles assumed open, a target is only cut off if it's in a pocket closed off by known walls
+        #Search out from the target until the start or an unknown tile turns up - a pocket runs out of tiles first
+        if self.isBlocked(target[0], target[1]):
+            return False
+        start = (start[0], start[1])
+        target = (target[0], target[1])
+        seen = {target}
+        queue = deque([target])
+        while queue:
+            tile = queue.popleft()
+            if tile == start or self.isUnknown(tile[0], tile[1]):
+                return True
+            for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                neighbour = (tile[0] + dx, tile[1] + dy)
+                #Agents can be placed on walls, so the start counts as open
+                if neighbour not in seen and (neighbour == start or not self.isBlocked(neighbour[0], neighbour[1])):
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return False
+
+
+#Fields only reach this many times a pursuer's vision range from the target - targets are only chased with a field while in sight,
+#so anything further is a long way round, or the pursuer is shut off from a target it can see and the search would fill everything else
+FLOW_FIELD_REACH = 3
+
+class FlowField:
+    #Distance field grown outwards from a target tile with a reverse BFS
+    #Each tile stores its distance and the direction of the next step towards the target
+    #The search is resumed lazily, only as far as the tiles agents have asked about
+    def __init__(self, grid, target, reach=None, walls=None):
+        #With a reach, the search stops that far from the target, and reads walls from a copy of them within reach -
+        #(left, top, width, wall bytes) - so it comes out the same whichever memory it was built from, whatever that memory learns later
+        self.grid = grid if walls is None else None
+        self.target = target
+        self.reach = math.inf if reach is None else reach
+        self.walls = walls
+        self.distances = {}
+        self.directions = {}
+        self.queue = deque()
+
+        if self.isPassable(target):
+            self.distances[target] = 0
+            self.directions[target] = [0, 0]
+            self.queue.append(target)
+
+    def isPassable(self, tile):
+        if self.walls is None:
+            return not self.grid.isBlocked(tile[0], tile[1])
+        #Tiles outside the copy are out of reach or off the grid
+        left, top, width, wallBytes = self.walls
+        x = tile[0] - left
+        index = (tile[1] - top) * width + x
+        return 0 <= x < width and 0 <= index < len(wallBytes) and wallBytes[index] == 0
+
+    def expandTo(self, tile, maxDistance=math.inf):
+        #Continue the BFS until the tile has a distance, there's nothing left to search, or every tile within maxDistance has been found
+        #The queue is in order of distance, so once its first tile is maxDistance away nothing closer is left to find
+        maxDistance = min(maxDistance, self.reach)
+        while tile not in self.distances and len(self.queue) > 0 and self.distances[self.queue[0]] < maxDistance:
+            currentTile = self.queue.popleft()
+            distance = self.distances[currentTile] + 1
+            for move in ([0, 1], [1, 0], [0, -1], [-1, 0]):
+                neighbour = (currentTile[0] + move[0], currentTile[1] + move[1])
+                if neighbour not in self.distances and self.isPassable(neighbour):
+                    self.distances[neighbour] = distance
+                    #Step from the neighbour back towards the tile it was reached from
+                    self.directions[neighbour] = [-move[0], -move[1]]
+                    self.queue.append(neighbour)
+
+    def getDistance(self, x, y, maxDistance=math.inf):
+        #None if the tile can't be reached within maxDistance
+        self.expandTo((x, y), maxDistance)
+        return self.distances.get((x, y))
+
+    def getDirection(self, agent):
+        #Returns the next move towards the target for this agent, or None if there isn't one within the agent's reach
+        position = (agent.position["x"], agent.position["y"])
+        maxDistance = math.ceil(agent.visionRange * FLOW_FIELD_REACH)
+        distance = self.getDistance(position[0], position[1], maxDistance)
+        if distance == 0:
+            return None
+
+        if distance is not None:
+            bestMove = self.directions[position]
+            if agent.checkMove(agent.memGrid, position[0], position[1], bestMove[0], bestMove[1]):
+                return bestMove
+        else:
+            #Tile isn't in the field - the agent may have been placed on a wall, so see if it can step off
+            distance = math.inf
+            for move in ([0, 1], [1, 0], [0, -1], [-1, 0]):
+                self.expandTo((position[0] + move[0], position[1] + move[1]), maxDistance)
+
+        #Preferred step is blocked by another agent - take the best other step that doesn't lose ground
+        bestMove = None
+        for move in agent.considerOptions(position[0], position[1], agent.memGrid):
+            neighbourDistance = self.distances.get((position[0] + move[0], position[1] + move[1]))
+            if neighbourDistance is not None and neighbourDistance < distance:
+                distance = neighbourDistance
+                bestMove = move
+        return bestMove
+
+
+class ThreatMap:
+    #Scores hiding spots for an agent running from a threat, by walking distance rather than straight lines
+    #Both searches are bounded, so the cost depends on vision ranges rather than the size of the grid
+    def __init__(self, grid, agent, threat):
+        self.grid = grid
+        self.agent = agent
+        self.threat = threat
+        self.bound = int(math.ceil(threat.visionRange * 3))
+
+    def search(self, start, bound, knownOnly, avoid=None):
+        #BFS outwards from start up to bound steps - returns each reached tile's distance
+        #The start is always allowed, in case the agent is standing somewhere it thinks is a wall
+        grid = self.grid
+        distances = {start: 0}
+        queue = deque([start])
+        while len(queue) > 0:
+            tile = queue.popleft()
+            distance = distances[tile] + 1
+            if distance > bound:
+                continue
+            for move in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                neighbour = (tile[0] + move[0], tile[1] + move[1])
+                if neighbour in distances or neighbour == avoid or grid.isBlocked(neighbour[0], neighbour[1]):
+                    continue
+                if knownOnly and grid.isUnknown(neighbour[0], neighbour[1]):
+                    continue
+                distances[neighbour] = distance
+                queue.append(neighbour)
+        return distances
+
+    def findHidingTile(self):
+        #Best tile is one the threat can't see, as close to the agent and as far from the threat as possible
+        #Ties go to whatever's closest to the centre, so the agent doesn't get backed into a corner
+        me = (self.agent.position["x"], self.agent.position["y"])
+        them = (self.threat.position["x"], self.threat.position["y"])
+        dangerZone = self.threat.getVisibleTiles(self.grid)
+
+        #The agent only plans through tiles it knows are open, and not through the threat itself
+        #The threat might cut through tiles the agent hasn't seen, so they count as open for it
+        #Anywhere further than twice the bound from the threat is treated as equally far
+        mine = self.search(me, self.bound, True, them)
+        theirBound = 2 * self.bound
+        theirs = self.search(them, theirBound, False)
+
+        centre = (self.grid.size["x"] // 2, self.grid.size["y"] // 2)
+        bestScore = None
+        bestTile = None
+        for tile, myDist in mine.items():
+            if tile == me:
+                continue
+            score = (tile in dangerZone, myDist - theirs.get(tile, theirBound + 1),
+                     abs(tile[0] - centre[0]) + abs(tile[1] - centre[1]), tile[1], tile[0])
+            if bestScore is None or score < bestScore:
+                bestScore = score
+                bestTile = tile
+
+        if bestTile is None:
+            return None
+        return [bestTile[0], bestTile[1]]
+
+
+class DStarLite:
+    #Incremental planner based on Koenig & Likhachev's D* Lite
+    #Searches backwards from the goal, so the agent moving doesn't invalidate the search
+    #When walls are discovered, only the vertices around them are repaired instead of replanning from scratch
+    def __init__(self, grid, goal):
+        self.grid = grid
+        self.goal = goal
+        self.gCosts = {}
+        self.rhsCosts = {goal: 0}
+        self.openHeap = []
+        self.openKeys = {}
+        self.keyModifier = 0
+        self.lastStart = None
+        self.changedTiles = []
+
+    def getDistanceBetween(self, tileA, tileB):
+        return abs(tileA[0] - tileB[0]) + abs(tileA[1] - tileB[1])
+
+    def isPassable(self, tile):
+        #Edges are only blocked by walls and grid boundaries
+        #Other agents move every tick, so they're handled when the first step is chosen instead
+        return not self.grid.isBlocked(tile[0], tile[1])
+
+    def getNeighbours(self, tile):
+        return [(tile[0], tile[1] + 1), (tile[0] + 1, tile[1]), (tile[0], tile[1] - 1), (tile[0] - 1, tile[1])]
+
+    def calculateKey(self, tile, start):
+        #Keys are (f, g), compared in order
+        best = min(self.gCosts.get(tile, math.inf), self.rhsCosts.get(tile, math.inf))
+        return (best + abs(start[0] - tile[0]) + abs(start[1] - tile[1]) + self.keyModifier, best)
+
+    def pushTile(self, tile, key):
+        self.openKeys[tile] = key
+        heapq.heappush(self.openHeap, (key, tile))
+
+    def removeTile(self, tile):
+        #Heap entry is left behind and skipped once it reaches the top
+        self.openKeys.pop(tile, None)
+
+    def topKey(self):
+        #Drop heap entries that were superseded or removed since they were pushed
+        while len(self.openHeap) > 0:
+            key, tile = self.openHeap[0]
+            if self.openKeys.get(tile) == key:
+                return key
+            heapq.heappop(self.openHeap)
+        return (math.inf, math.inf)
+
+    def updateVertex(self, tile, start):
+        #Called a lot, so lookups are bound locally
+        gCosts = self.gCosts
+        isBlocked = self.grid.isBlocked
+        inf = math.inf
+
+        if tile != self.goal:
+            bestCost = inf
+            x, y = tile
+            #Agents can be placed on walls, so the start is always allowed to step off its tile
+            if tile == start or not isBlocked(x, y):
+                for neighbour in ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)):
+                    #Only look up walls for neighbours that could actually improve the cost
+                    cost = gCosts.get(neighbour, inf) + 1
+                    if cost < bestCost and not isBlocked(neighbour[0], neighbour[1]):
+                        bestCost = cost
+            self.rhsCosts[tile] = bestCost
+        else:
+            bestCost = 0
+
+        self.removeTile(tile)
+        gCost = gCosts.get(tile, inf)
+        if gCost != bestCost:
+            best = min(gCost, bestCost)
+            self.pushTile(tile, (best + abs(start[0] - tile[0]) + abs(start[1] - tile[1]) + self.keyModifier, best))
+
+    def computeShortestPath(self, start):
+        gCosts = self.gCosts
+        rhsCosts = self.rhsCosts
+        openHeap = self.openHeap
+        inf = math.inf
+
+        #Stops once nothing left in the queue can change the start's cost, and the start itself is consistent
+        while True:
+            topKey = self.topKey()
+            if topKey[0] == inf:
+                break
+            if topKey >= self.calculateKey(start, start) and rhsCosts.get(start, inf) == gCosts.get(start, inf):
+                break
+
+            oldKey, tile = heapq.heappop(openHeap)
+            self.removeTile(tile)
+            newKey = self.calculateKey(tile, start)
+            x, y = tile
+
+            if oldKey < newKey:
+                #Key is out of date after the agent moved - requeue it
+                self.pushTile(tile, newKey)
+            elif gCosts.get(tile, inf) > rhsCosts.get(tile, inf):
+                #Overconsistent - lower g and propagate to neighbours
+                gCosts[tile] = rhsCosts[tile]
+                for neighbour in ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)):
+                    self.updateVertex(neighbour, start)
+            else:
+                #Underconsistent - a wall has made this route more expensive
+                gCosts[tile] = inf
+                self.updateVertex(tile, start)
+                for neighbour in ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)):
+                    self.updateVertex(neighbour, start)
+
+    def markWalls(self, tiles):
+        #Called when walls are discovered - repairs are deferred until the next plan
+        self.changedTiles.extend(tiles)
+
+    def plan(self, agent):
+        #Returns a list of directions from the agent's position to the goal, or None if it can't be reached
+        start = (agent.position["x"], agent.position["y"])
+        if not self.isPassable(self.goal):
+            return None
+        if start == self.goal:
+            return []
+
+        if self.lastStart is None:
+            self.lastStart = start
+            self.pushTile(self.goal, self.calculateKey(self.goal, start))
+        else:
+            self.moveStart(start)
+
+        if len(self.changedTiles) > 0:
+            #Edge costs changed - repair only the affected vertices
+            for tile in self.changedTiles:
+                self.updateVertex(tile, start)
+                for neighbour in self.getNeighbours(tile):
+                    self.updateVertex(neighbour, start)
+            self.changedTiles = []
+
+        self.computeShortestPath(start)
+        if self.gCosts.get(start, math.inf) == math.inf:
+            return None
+
+        #First step has to respect other agents, same as considerOptions - take the cheapest one whose route doesn't lead back through the start
+        #Moves cost 1 unless they go into a wall - leaving a wall is fine, agents can be placed on them
+        firstSteps = [neighbour for neighbour in self.getNeighbours(start)
+                      if self.isPassable(neighbour) and agent.checkMove(self.grid, start[0], start[1], neighbour[0] - start[0], neighbour[1] - start[1])]
+        firstSteps.sort(key=lambda tile: self.gCosts.get(tile, math.inf))
+        for firstTile in firstSteps:
+            if self.gCosts.get(firstTile, math.inf) + 1 != self.gCosts[start]:
+                #A detour - only tiles on the best routes are worked out, so search again as if the agent had already stepped there
+                self.moveStart(firstTile)
+                self.computeShortestPath(firstTile)
+            directions = self.followCosts(firstTile, start)
+            if directions is not None:
+                return [[firstTile[0] - start[0], firstTile[1] - start[1]]] + directions
+
+        #Other agents are in the way of every route for now - wait for them to move rather than give up on the goal
+        return [[0, 0]]
+
+    def moveStart(self, start):
+        #Bump the key modifier by how far the start has moved, so the keys already queued are still lower bounds from the new start
+        self.keyModifier += self.getDistanceBetween(self.lastStart, start)
+        self.lastStart = start
+
+    def followCosts(self, tile, start):
+        #Directions from tile to the goal, stepping to the cheapest neighbour each time - None if that leads back through start or loops
+        directions = []
+        visited = {start, tile}
+        while tile != self.goal:
+            bestTile = None
+            bestCost = math.inf
+            for neighbour in self.getNeighbours(tile):
+                cost = self.gCosts.get(neighbour, math.inf) + 1
+                if cost < bestCost and neighbour != start and self.isPassable(neighbour):
+                    bestCost = cost
+                    bestTile = neighbour
+            if bestTile is None or bestTile in visited:
+                return None
+            visited.add(bestTile)
+            directions.append([bestTile[0] - tile[0], bestTile[1] - tile[1]])
+            tile = bestTile
+        return directions
 
 
 class Option:
@@ -137,80 +1285,79 @@ class MoveToPos(Option):
     #Move towards a defined set of coordinates
     def __init__(self, agent, x, y, targetAgent):
         super().__init__(agent, x, y)
-        self.plannedPath = []
         self.targetAgent = targetAgent
         self.label = ("Move Towards %s seen at [%i, %i]" % (self.targetAgent.niceName, x, y))
 
     def startTask(self):
-        #Create a path towards a specified point
-        self.plannedPath = self.agent.aStar([self.target["x"], self.target["y"]])
-        if (self.plannedPath == None):
-            self.complete = True
-            return [0,0]
         self.inProgress = True
         return self.nextStep()
         
     def nextStep(self):
-        #Follow preplanned path
-        if len(self.plannedPath) > 0:
-            nextMove = self.plannedPath[0]
-            self.plannedPath.pop(0)
+        #Follow the target while it's still in sight - the field is keyed by its tile, so moving just picks another field
+        inSight = self.targetAgent in self.agent.entVisionCurrent
+        if inSight:
+            self.target = {"x": self.targetAgent.position["x"], "y": self.targetAgent.position["y"]}
+
+        #Give up straight away if the target's been walled off, rather than growing a field through everywhere else
+        position = (self.agent.position["x"], self.agent.position["y"])
+        if not self.agent.memGrid.isReachable(position, (self.target["x"], self.target["y"])):
+            self.complete = True
+            return [0, 0]
+
+        if inSight:
+            #Read the next step from the distance field for the target tile - there's none if the way round is too long
+            field = self.agent.memGrid.getFlowField(self.target["x"], self.target["y"], math.ceil(self.agent.visionRange * FLOW_FIELD_REACH))
+            nextMove = field.getDirection(self.agent)
         else:
+            #Out of sight, the goal stays where the target was last seen - the agent's planner for it is repaired each step rather than redone
+            path = self.agent.planPath((self.target["x"], self.target["y"]))
+            nextMove = path[0] if path else None
+        if nextMove is None:
             self.complete = True
             return [0, 0]
         return nextMove
 
 
 class Explore(Option):
-    #Pick a random unknown tile and move towards it
+    #Head for the closest frontier tile - a known open tile next to unknown ones
     def __init__(self, agent):
         super().__init__(agent, 0, 0)
         self.plannedPath = []
         self.x = 0
         self.y = 0
-        self.label = "Explore An Unknown Spot"
+        self.label = "Explore the Frontier"
         self.fullyExplored = False
 
     def prepTask(self):
-        #Refer to memory grid and retrieve an unknown space at random
-        candidates = []
-
-        #Iterate through all spaces and add all unknown tiles to candidate list
-        for y in range(self.agent.memGrid.size["y"]):
-            for x in range(self.agent.memGrid.size["x"]):
-                if self.agent.memGrid.grid[y][x].unknownMarker:
-                    candidates.append([x, y])
-
-        #Pick random candidate. If no candidates exist, map is fully explored
-        if len(candidates) > 0:
-            chosenTile = random.choice(candidates)
-            self.x = chosenTile[0]
-            self.y = chosenTile[1]
-        else:
+        #Search outwards from the agent through known tiles for the closest frontier tile
+        #If none can be reached, there's nothing left that can be explored
+        nearest = self.agent.memGrid.nearestFrontier(self.agent.position["x"], self.agent.position["y"])
+        if nearest is None:
             self.fullyExplored = True
+        else:
+            (self.x, self.y), self.plannedPath = nearest
 
-        self.label = ("Explore the Unknown Spot at [%i, %i]" % (self.x, self.y))
+        self.label = ("Explore the Frontier at [%i, %i]" % (self.x, self.y))
 
     def startTask(self):
-        #Plan a path to the randomised spot
+        #The path only crosses known open tiles, so it can't be blocked by anything seen on the way
         if(self.fullyExplored):
             #Shouldn't reach this point, but here as a fallback
-            nextMove = [0,0]
-        else:
-            self.plannedPath = self.agent.aStar([self.x, self.y])
-            if (self.plannedPath == None):
-                self.complete = True
-                return [0,0]
-            self.inProgress = True
-            return(self.nextStep())
+            self.complete = True
+            return [0,0]
+        self.inProgress = True
+        return(self.nextStep())
 
     def nextStep(self):
         #Follow planned path
 
-        #If trying to navigate to a wall tile, or agent is currently in target tile, abort task
-        if(self.agent.memGrid.grid[self.y][self.x].isWall or [self.agent.position["x"], self.agent.position["y"]] == [self.x, self.y]):
-            self.complete = True
-            return [0,0]
+        #If the target has stopped being frontier (its surroundings have been seen), or agent is currently in target tile, head for the next closest one instead
+        #Same as Wander's fallback, the step is still taken this tick rather than standing still while the agenda is rebuilt
+        if((self.x, self.y) not in self.agent.memGrid.frontier or [self.agent.position["x"], self.agent.position["y"]] == [self.x, self.y]):
+            self.prepTask()
+            if(self.fullyExplored):
+                self.complete = True
+                return [0,0]
         
         if len(self.plannedPath) > 0:
             nextMove = self.plannedPath[0]
@@ -228,7 +1375,11 @@ class Wander(Option):
 
     def startTask(self):
         directions = self.agent.considerOptions(self.agent.position["x"], self.agent.position["y"], self.agent.memGrid)
-        nextMove = random.choice(directions)
+        if len(directions) == 0:
+            #Boxed in - stay put and try again next turn
+            self.complete = True
+            return [0, 0]
+        nextMove = self.agent.random.choice(directions)
         self.inProgress = True
         return nextMove
 
@@ -247,7 +1398,10 @@ class Hide(Option):
 
     def startTask(self):
         targetTile = self.agent.runAway(self.threat)
-        self.plannedPath = self.agent.aStar(targetTile)
+        if targetTile is None:
+            self.complete = True
+            return [0,0]
+        self.plannedPath = self.agent.planPath(targetTile)
         if (self.plannedPath == None):
                 self.complete = True
                 return [0,0]
@@ -264,13 +1418,57 @@ class Hide(Option):
     
 #Agents
 
+class Team:
+    #Knowledge shared by every agent of one type when teamKnowledge is on
+    #The team has one memory grid, so walls only need discovering once, and a table of where each entity was last seen and when
+    #Memory only ever takes tiles from the real grid, so members' views can't differ - sight, agendas and planners stay with each agent
+    def __init__(self, grid, sightingRange):
+        self.memGrid = grid.createMemory()
+        self.members = []
+        #(tick, x, y) of the last sighting, in the order entities were first seen - members use it as their entVisionMemory
+        self.sightings = {}
+        self.tick = 0
+        #Sightings further from a member than this aren't chased - the table covers the whole map, and the search to reach one
+        #grows with the square of the distance, for a target that's likely moved on by the time it's reached
+        self.sightingRange = sightingRange
+
+    def record(self, entity):
+        self.sightings[entity] = (self.tick, entity.position["x"], entity.position["y"])
+
+    def forgetMissing(self, visibleTiles, inVision):
+        #Anything last seen on a tile that's in sight again but isn't there any more has moved on
+        for entity, sighting in list(self.sightings.items()):
+            if (sighting[1], sighting[2]) in visibleTiles and entity not in inVision:
+                del self.sightings[entity]
+
+    def hasSightingNear(self, x, y, radius):
+        #Whether anything was last seen in the square reaching radius from (x, y)
+        reach = int(radius)
+        for tick, sightingX, sightingY in self.sightings.values():
+            if abs(sightingX - x) <= reach and abs(sightingY - y) <= reach:
+                return True
+        return False
+
+    def shareWalls(self, finder, newWalls):
+        #Walls one member finds are already in everyone's memory - the rest of the team's planners need telling
+        #Hiding is the only task that follows a path planned through unknown tiles, so anyone hiding looks again
+        for member in self.members:
+            if member is finder or member.killer is not None:
+                continue
+            for planner in member.planners.values():
+                planner.markWalls(newWalls)
+            if len(member.agenda) > 0 and isinstance(member.agenda[0], Hide):
+                member.reevaluateNextMove = True
+
+
 class AgentBase:
     def __init__(self, energy, visionRange):
         self.energy = energy
         self.visionRange = visionRange
         
-        self.entVisionCurrent = []
-        self.entVisionMemory = []
+        #Entities in sight and entities ever seen - dicts rather than sets so they keep the order they were seen in
+        self.entVisionCurrent = {}
+        self.entVisionMemory = {}
         self.points = 0
         self.lifeTime = 0
         self.target = None
@@ -279,21 +1477,66 @@ class AgentBase:
         self.reevaluateNextMove = False
         self.killer = None
 
+        #Tiles in sight as of the last checkVision, and where it was looked from - (x, y, wall version of the grid)
+        self.seenTiles = set()
+        self.lookedFrom = None
+        #(x, y, grid) of the last tick looking was skipped on since then - visibleTiles works its tiles out when asked for
+        self.skippedLook = None
+
+        #Set to a function of (agent, grid) returning a move to drive the agent from outside, e.g. by env.AgentEnv
+        self.policy = None
+
+        #Given a generator of its own by the Simulation - the random module for agents made outside one
+        self.random = random
+
+        #Only look around on ticks where something new could be seen, and only sort the agenda when it's changed
+        self.eventDriven = True
+
+        #Team whose memory this agent shares, if teamKnowledge is on
+        self.team = None
+        #Whether the agenda was last sorted in dire mode
+        self.agendaDire = False
+
+        #Incremental planners, keyed by goal tile - most recently used last
+        self.planners = {}
+        self.maxPlanners = 8
+
+    def __getstate__(self):
+        #Policies are usually bound to something outside the game, e.g. an env, so aren't saved - set them again after loading
+        state = dict(self.__dict__)
+        state["policy"] = None
+        state["seenTiles"] = self.visibleTiles
+        state["skippedLook"] = None
+        return state
+
     def placeMe(self, grid, x, y):
         #Places the agent in a defined spot
         self.position = {"x": x, "y": y}
-        grid.grid[y][x].addOccupant(self)
+        grid.addOccupant(x, y, self)
 
         self.genMemGrid(grid)
 
+    def joinTeam(self, team):
+        #Share the team's memory from now on - join before placeMe, so no memory of the agent's own is made
+        self.team = team
+        team.members.append(self)
+        self.entVisionMemory = team.sightings
+        if self.memGrid is not None:
+            self.memGrid = team.memGrid
+            self.planners = {}
+
     def genMemGrid(self, grid):
-        #Generate a new grid to represent the agent's memory of the environment
-        self.memGrid = MemGrid(grid.size["x"], grid.size["y"], 0)
-        self.memGrid.generate()
+        #Generate a new grid to represent the agent's memory of the environment - or use the team's
+        if self.team is not None:
+            self.memGrid = self.team.memGrid
+        else:
+            self.memGrid = grid.createMemory()
+        self.planners = {}
 
     def instantLearnGrid(self, grid):
         #Sets the memgrid to the grid, meaning the agent doesn't need to manually discover its surroundings
         self.memGrid = grid
+        self.planners = {}
 
     def getDistanceBetween(self, x1, y1, x2, y2):
         #Returns the distance between two sets of coords
@@ -309,19 +1552,13 @@ class AgentBase:
         targetX = curX + dirX
         targetY = curY + dirY
         
-        #Check that target tile is within grid boundaries
-        if(targetX > grid.size["x"] - 1 or targetY > grid.size["y"] - 1):
-            return False
-        elif (targetX < 0 or targetY < 0):
-            return False
-
-        #Check target tile for walls
-        if (grid.grid[targetY][targetX].isWall):
+        #Check that target tile is within grid boundaries, and for walls
+        if grid.isBlocked(targetX, targetY):
             return False
 
         #Check target tile for instances of same agent
         #E.g. Prevent two mice from overlapping, but not a cat from catching a mouse
-        for occupant in grid.grid[targetY][targetX].occupant:
+        for occupant in grid.getOccupants(targetX, targetY):
             if type(occupant) is type(self):
                 return False
 
@@ -351,139 +1588,113 @@ class AgentBase:
         #Adapted from https://www.youtube.com/watch?v=-L-WgKMFuhE&list=PLFt_AvWsXl0cq5Umv3pMC9SPnKjfp9eGW
         #Calculate path to a specified tile
 
-        openList = []
-        closedList = []
-
-        counter = 0
+        #Open set is a binary heap ordered by (fCost, hCost), so the cheapest node is always on top
+        #gCosts and parents are keyed by position, so lookups don't need to scan a list
+        timer = startTimer("aStar", self)
+        startTile = (self.position["x"], self.position["y"])
+        targetTile = (targetTile[0], targetTile[1])
 
-        openList.append({
-            "position": [self.position["x"], self.position["y"]],
-            "gCost": 0,
-            "hCost": self.getDistanceFromMe(targetTile[0], targetTile[1]),
-            "parent": None
-            })
-
-        while len(openList) > 0:
-            counter += 1
+        #Targets in another region, or inside a wall, would only be found out after searching everywhere else
+        if not self.memGrid.isReachable(startTile, targetTile):
+            if self.memGrid.isBlocked(targetTile[0], targetTile[1]):
+                countEvent("aStar.failed.targetBlocked", self)
+            else:
+                countEvent("aStar.failed.unreachable", self)
+            stopTimer(timer)
+            return None
+
+        startHCost = self.getDistanceBetween(startTile[0], startTile[1], targetTile[0], targetTile[1])
+        openHeap = [(startHCost, startHCost, startTile)]
+        gCosts = {startTile: 0}
+        parents = {startTile: None}
+        closedSet = set()
+
+        while len(openHeap) > 0:
+            #Pop node with lowest cost
+            currentNode = heapq.heappop(openHeap)[2]
+
+            #Nodes can be pushed more than once if a cheaper route is found - skip the stale copies
+            if currentNode in closedSet:
+                continue
+            closedSet.add(currentNode)
 
-            #Break out of the loop if the pathfinding gets stuck - ideally shouldn't happen, but this is not an ideal world
-            if (counter % 200 == 0):
-                print(self.niceName + " stuck pathfinding - breaking out")
-                return None
-            
-            #Find node in openList with lowest cost
-            currentNode = openList[0]
-            
-            for node in openList:
-                if ((node["gCost"] + node["hCost"]) < (currentNode["gCost"] + currentNode["hCost"])
-                    or ((node["gCost"] + node["hCost"]) == (currentNode["gCost"] + currentNode["hCost"]) and (node["hCost"] < currentNode["hCost"]))):
-                    currentNode = node
-
-            #When found, remove from openList and add to closedList    
-            openList.remove(currentNode)
-            closedList.append(currentNode)
-            
             #If currentNode is the target tile, path has been found
-            if(currentNode["position"] == targetTile):
-                #Retrace path
-                path = []
-                for item in closedList:
-                    if(item["position"] == targetTile):
-                        retraceNode = item
-                        break
-
-                while(retraceNode["parent"] is not None):
-                    path.append(retraceNode["position"])
-                    nextTile = retraceNode["parent"]
-                    for item in closedList:
-                        if(item["position"] == nextTile):
-                            retraceNode = item
-                            break
-                #Reverse path - current to target instead of other way around
-                path.reverse()
-
-                #Convert to directions
-                directions = []
-                currentStep = [self.position["x"], self.position["y"]]
-                for step in path:
-                    directions.append([step[0] - currentStep[0], step[1] - currentStep[1]])
-                    currentStep =  step
-                    
-                return directions
+            if currentNode == targetTile:
+                path = self.retracePath(parents, targetTile)
+                countEvent("aStar.nodesExpanded", self, len(closedSet))
+                countEvent("aStar.pathLength", self, len(path))
+                stopTimer(timer)
+                return path
 
             #Check each neighbouring tile
-            validMoves = self.considerOptions(currentNode["position"][0], currentNode["position"][1], self.memGrid)
-            for move in validMoves:
+            moveGCost = gCosts[currentNode] + 1
+            for move in self.considerOptions(currentNode[0], currentNode[1], self.memGrid):
                 #Get position of each adjacent tile
-                move[0] += currentNode["position"][0]
-                move[1] += currentNode["position"][1]
-
-                #If already in closedList, ignore
-                for node in closedList:
-                    if node["position"] == move:
-                        continue
-                    
-                #Get distance costs
-                moveGCost = currentNode["gCost"] + (abs(move[0] - currentNode["position"][0]) + abs(move[1] - currentNode["position"][1]))
-
-                moveInfo = {
-                    "position": move,
-                    "gCost": moveGCost,
-                    "hCost": abs(move[0] - targetTile[0]) + abs(move[1] - targetTile[1]),
-                    "parent": currentNode["position"]
-                    }
-                
-                newCost = currentNode["gCost"] + moveGCost
-
-                inList = False
-                oldGCost = 0
-                for item in openList:
-                    if (item["position"] == moveInfo["position"]):
-                        inList = True
-                        oldGCost = item["gCost"]
-
-                if (moveGCost < oldGCost) or not inList:
-                    openList.append(moveInfo)
-
-    def directMove(self, targetTile):
-        #If you can see a tile, there's already empty tiles between self and it - no need for astar
-        validMoves = considerOptions(self.position["x"], self.position["y"], self.memGrid)
-
-        smallestDist = 999
-        bestMove = None
-
-        for move in validMoves:
-            #Calculate distance from target
-            newPoint = [self.position["x"] + move[0], self.position["y"] + move[1]]
-            dist = getDistanceBetween(targetTile[0], targetTile[1], newPoint[0], newPoint[1])
-            #Get smallest distance
-            if dist < smallestDist:
-                smallestDist = dist
-                bestMove = move
-
-        return bestMove
-            
-
-    def whatsClosest(self):
-        #Gather list of known objects
-        knownObjs = self.entVisionCurrent
-        pos = self.position
-
-        #Find the object closest to the agent
-        closestDist = 999
-        closestObj = None
-
-        for obj in knownObjs:
-            #Ignore objects you don't want to target
-            if not(isinstance(obj, self.targetType)):
-                continue
-            dist = (obj.position["x"] - pos["x"])**2 + (obj.position["y"] - pos["y"])**2
-            if (closestDist > dist):
-                closestDist = dist
-                closestObj = obj
-
-        #Set current target to nearest object
-        self.target = closestObj
+                neighbour = (currentNode[0] + move[0], currentNode[1] + move[1])
+
+                #If already in closedSet, ignore
+                if neighbour in closedSet:
+                    continue
+
+                #Only keep the route if it's cheaper than any found so far
+                if moveGCost < gCosts.get(neighbour, math.inf):
+                    gCosts[neighbour] = moveGCost
+                    parents[neighbour] = currentNode
+                    hCost = self.getDistanceBetween(neighbour[0], neighbour[1], targetTile[0], targetTile[1])
+                    heapq.heappush(openHeap, (moveGCost + hCost, hCost, neighbour))
+
+        #Open set exhausted - target can't be reached from here
+        countEvent("aStar.nodesExpanded", self, len(closedSet))
+        if self.memGrid.isBlocked(targetTile[0], targetTile[1]):
+            countEvent("aStar.failed.targetBlocked", self)
+        else:
+            countEvent("aStar.failed.unreachable", self)
+        stopTimer(timer)
+        return None
+
+    def planPath(self, targetTile):
+        #Plan with the incremental planner for this goal, so replanning after discovering walls only repairs what changed
+        goal = (targetTile[0], targetTile[1])
+        if not self.memGrid.isReachable((self.position["x"], self.position["y"]), goal):
+            countEvent("planPath.failed", self)
+            return None
+        planner = self.planners.pop(goal, None)
+        if planner is None:
+            planner = DStarLite(self.memGrid, goal)
+        self.planners[goal] = planner
+
+        #Forget the least recently used planner if there are too many
+        if len(self.planners) > self.maxPlanners:
+            del self.planners[next(iter(self.planners))]
+
+        timer = startTimer("planPath", self)
+        path = planner.plan(self)
+        if path is None:
+            countEvent("planPath.failed", self)
+        else:
+            countEvent("planPath.pathLength", self, len(path))
+        stopTimer(timer)
+        return path
+
+    def retracePath(self, parents, targetTile):
+        #Walk back from the target through the parent map, then convert to directions
+        path = []
+        retraceNode = targetTile
+        while parents[retraceNode] is not None:
+            path.append(retraceNode)
+            retraceNode = parents[retraceNode]
+
+        #Reverse path - current to target instead of other way around
+        path.reverse()
+
+        #Convert to directions
+        directions = []
+        currentStep = [self.position["x"], self.position["y"]]
+        for step in path:
+            directions.append([step[0] - currentStep[0], step[1] - currentStep[1]])
+            currentStep = step
+
+        return directions
 
     def makeMove(self, grid, direction):
         #Remember old tile - set to empty once move is complete
@@ -500,33 +1711,19 @@ class AgentBase:
             self.position["y"] = (grid.size["y"] - 1)
         
         #If target space has a pickup, run pickup code
-        for occupant in grid.grid[self.position["y"]][self.position["x"]].occupant:
+        for occupant in grid.getOccupants(self.position["x"], self.position["y"]):
             if isinstance(occupant, self.targetType):
                 self.pickup(grid)
 
         #Set tile on grid to new position
-        grid.grid[oldPos[0]][oldPos[1]].removeOccupant(self)
-        grid.grid[self.position["y"]][self.position["x"]].addOccupant(self)
+        grid.removeOccupant(oldPos[1], oldPos[0], self)
+        grid.addOccupant(self.position["x"], self.position["y"], self)
 
     def runAway(self, danger):
         #Find closest point that's outside of the threat's vision and move to it
-        dangerZone = danger.getVisibleTiles(self.memGrid)
-
-        bestDist = 999
-        bestSafePoint = None
-        centre = [self.memGrid.size["x"] // 2, self.memGrid.size["y"] // 2]
-        bestDistFromCentre = 999
-        
-        for y in range(self.memGrid.size["y"]):
-            for x in range(self.memGrid.size["x"]):
-                if not self.memGrid.grid[y][x].unknownMarker and not self.memGrid.grid[y][x].isWall and not ([x, y] == [self.position["x"], self.position["y"]]):
-                    dist = self.getDistanceFromMe(x, y) - danger.getDistanceFromMe(x, y)
-                    #Get best distance, weighed towards whatever's closest to the centre
-                    if(dist < bestDist) or (dist == bestDist and bestDistFromCentre < self.getDistanceFromMe(centre[0], centre[1])):
-                        bestDist = dist
-                        bestSafePoint = [x, y]
-                        bestDistFromCentre = self.getDistanceFromMe(centre[0], centre[1])
-
+        timer = startTimer("runAway", self)
+        bestSafePoint = ThreatMap(self.memGrid, self, danger).findHidingTile()
+        stopTimer(timer)
         return bestSafePoint
 
     def checkVision(self, grid):
@@ -534,156 +1731,160 @@ class AgentBase:
 
         #Get list of visible tiles
         visibleTiles = self.getVisibleTiles(grid)
+        self.seenTiles = visibleTiles
+        self.skippedLook = None
+        self.lookedFrom = (self.position["x"], self.position["y"], grid.wallVersion)
 
-        inVision = []
-        newWalls = False
+        inVision = {}
+        newWalls = []
 
-        #Check each visible tile for objects
+        #Check each visible tile against memory
         for tile in visibleTiles:
             #If tile in memory doesn't match current situation, update it
-            if(self.memGrid.grid[tile[1]][tile[0]] != grid.grid[tile[1]][tile[0]]):
-                self.memGrid.grid[tile[1]][tile[0]] = grid.grid[tile[1]][tile[0]]
-                if (self.memGrid.grid[tile[1]][tile[0]].isWall):
-                    newWalls = True
-                
-            #Current tile is occupied - examine its contents
-            if len(grid.grid[tile[1]][tile[0]].occupant) > 0:
-                for occupant in grid.grid[tile[1]][tile[0]].occupant:
-                #If tile contains self, ignore it
-                    if occupant == self:
-                        continue
-                    else:   
-                        #If current object is already logged as in vision, ignore
-                        if occupant in inVision:
-                            continue
-                        #Tile occupant isn't in the current vision list - add it
-                        else:
-                            for occupant in grid.grid[tile[1]][tile[0]].occupant:
-                                if occupant not in self.entVisionMemory and occupant is not self:
-                                    self.entVisionMemory.append(occupant)
-                                inVision.append(occupant)
-
-        #Compare list contents w/o caring about order
-        if (set(self.entVisionCurrent) != set(inVision)):
-            #If lists don't match, a new object has been found - reevaluate current agenda
+            if(self.memGrid.isUnknown(tile[0], tile[1])):
+                self.memGrid.reveal(tile[0], tile[1], grid.isWall(tile[0], tile[1]))
+                if (self.memGrid.isWall(tile[0], tile[1])):
+                    newWalls.append((tile[0], tile[1]))
+
+        #Only look at objects close enough to be seen, then keep the ones on visible tiles
+        for occupant in grid.getEntitiesInRadius(self.position["x"], self.position["y"], self.visionRange):
+            #If tile contains self, ignore it
+            if occupant is self or (occupant.position["x"], occupant.position["y"]) not in visibleTiles:
+                continue
+            inVision[occupant] = None
+            if self.team is None:
+                self.entVisionMemory[occupant] = None
+            else:
+                self.team.record(occupant)
+
+        if self.team is not None:
+            self.team.forgetMissing(visibleTiles, inVision)
+
+        #Compare contents w/o caring about order
+        if (self.entVisionCurrent.keys() != inVision.keys()):
+            #If they don't match, a new object has been found - reevaluate current agenda
             self.reevaluateNextMove = True
 
         #While moving, agent has discovered new walls
         #Next move should be reconsidered, so it doesn't try to follow an old path through them
         if(newWalls):
             self.reevaluateNextMove = True
+            #Let the planners repair their searches around the new walls
+            for planner in self.planners.values():
+                planner.markWalls(newWalls)
+            if self.team is not None:
+                self.team.shareWalls(self, newWalls)
 
         return inVision
 
-    def getVisibleTiles(self, grid):
-        #Find outer bounds of vision range
-        inRange = (self.findMaxRange(grid))
-        visibleTiles = []
-
-        #Draw lines to find line of sight
-        cenX = self.position["x"]; cenY = self.position["y"]
-        
-        for item in inRange:
-            tarX = item[0]; tarY = item[1]
-            lineX, lineY = line(cenX, cenY, tarX, tarY)
-
-
-            #If line collides with wall, stop adding points to visible tile list
-            for point in range(len(lineX)):
-                #Remove edge case of points equaling the grid size, leading to out of range errors
-                if(lineX[point] >= grid.size["x"]):
-                    lineX[point] = grid.size["x"] - 1
-                if(lineY[point] >= grid.size["y"]):
-                    lineY[point] = grid.size["y"] - 1
-                #Append to list if space isn't a wall
-                if not grid.grid[lineY[point]][lineX[point]].isWall:
-                    visibleTiles.append([lineX[point],lineY[point]])
-                #If wall tile is encountered, stop following along the line
-                else:
-                    #Add wall tile to visible list, since you can see the walls themselves, just not through 'em
-                    visibleTiles.append([lineX[point],[lineY[point]][0]])
-                    #self.memGrid.grid[lineY[point]][lineX[point]].isWall = True
-                    break
-
-        #Remove duplicate tiles from list
-        temp = visibleTiles
-        visibleTiles = []
-
-        for item in temp:
-            if (item not in visibleTiles):
-                visibleTiles.append(item)
-
+    @property
+    def visibleTiles(self):
+        #Tiles in sight as of the last tick the agent decided on - only envs, renderers and tests read them,
+        #so on ticks looking was skipped they're worked out the first time they're asked for
+        if self.skippedLook is not None:
+            x, y, grid = self.skippedLook
+            self.seenTiles = self.getVisibleTiles(grid, x, y)
+            self.skippedLook = None
+        return self.seenTiles
+
+    def getVisibleTiles(self, grid, cenX=None, cenY=None):
+        #Symmetric shadowcasting, adapted from https://www.albertford.com/shadowcasting/
+        #Each quadrant is scanned outwards row by row, so every tile in range is visited once
+        #Walls are added to the visible set, since you can see the walls themselves, just not through 'em
+        #Looks from the agent's tile unless given another
+        timer = startTimer("getVisibleTiles", self)
+        if cenX is None:
+            cenX = self.position["x"]; cenY = self.position["y"]
+        radiusSquared = self.visionRange ** 2
+        maxDepth = math.floor(self.visionRange)
+        isBlocked = grid.isBlocked
+
+        visibleTiles = {(cenX, cenY)}
+
+        #Each quadrant maps (depth, column) to grid coords - N, S, E, W
+        for rowX, rowY, colX, colY in ((0, -1, 1, 0), (0, 1, 1, 0), (1, 0, 0, 1), (-1, 0, 0, 1)):
+            #Rows are (depth, start slope, end slope), with slopes kept as integer fractions to avoid rounding errors
+            rows = [(1, -1, 1, 1, 1)]
+            while len(rows) > 0:
+                depth, startNum, startDen, endNum, endDen = rows.pop()
+                if depth > maxDepth:
+                    continue
+
+                #First and last columns the row's slopes pass through - rounding ties up at the start and down at the end
+                minCol = (2 * depth * startNum + startDen) // (2 * startDen)
+                maxCol = -((endDen - 2 * depth * endNum) // (2 * endDen))
+
+                prevWall = None
+                for col in range(minCol, maxCol + 1):
+                    x = cenX + depth * rowX + col * colX
+                    y = cenY + depth * rowY + col * colY
+
+                    #Anything outside the grid blocks sight but isn't visible itself
+                    isWall = isBlocked(x, y)
+
+                    #Floor tiles are only visible if they're symmetric with the agent - walls are visible if touched at all
+                    if depth * depth + col * col <= radiusSquared and grid.inBounds(x, y):
+                        if isWall or (col * startDen >= depth * startNum and col * endDen <= depth * endNum):
+                            visibleTiles.add((x, y))
+
+                    if prevWall is True and not isWall:
+                        #Coming out of a wall - narrow the start of the row
+                        startNum = 2 * col - 1
+                        startDen = 2 * depth
+                    if prevWall is False and isWall:
+                        #Going into a wall - scan the next row up to the wall's edge
+                        rows.append((depth + 1, startNum, startDen, 2 * col - 1, 2 * depth))
+                    prevWall = isWall
+
+                if prevWall is False:
+                    rows.append((depth + 1, startNum, startDen, endNum, endDen))
+
+        stopTimer(timer)
         return visibleTiles
 
-    def findMaxRange(self, grid):
-        #Code adapted from https://www.redblobgames.com/grids/circle-drawing/
-        centre = self.position
-        radius = self.visionRange
-
-        inRange = []
-
-        #Find outer box around circle - don't check every tile in grid
-        top = math.ceil(centre["y"] - radius)
-        bottom = math.floor(centre["y"] + radius)
-
-        #Find outer edges of circle
-        for y in range(top, bottom + 1):
-            dy = y - centre["y"]
-            dx = math.sqrt(radius ** 2 - dy ** 2)
-            left = math.ceil(centre["x"] - dx)
-            right = math.floor(centre["x"] + dx)
-            inRange.append([left, y])
-            inRange.append([right, y])
-
-        #Fill in gaps at top and bottom
-        for r in range(math.floor(radius * math.sqrt(0.5))):
-            d = math.floor((math.sqrt(radius ** 2 - r ** 2)))
-            inRange.append([centre["x"] - d, centre["y"] + r])
-            inRange.append([centre["x"] + d, centre["y"] + r])
-            inRange.append([centre["x"] - d, centre["y"] - r])
-            inRange.append([centre["x"] + d, centre["y"] - r])
-            inRange.append([centre["x"] + r, centre["y"] - d])
-            inRange.append([centre["x"] + r, centre["y"] + d])
-            inRange.append([centre["x"] - r, centre["y"] - d])
-            inRange.append([centre["x"] - r, centre["y"] + d])
-
-        #Remove duplicates and out of range values
-        prunedList = []
-            
-        for item in inRange:
-            #If out of range, set to min/max value
-            if(item[0] < 0):
-                item[0] = 0
-            elif(item[0] >= grid.size["x"]):
-               item[0] = grid.size["x"] - 1
-            elif(item[1] < 0):
-               item[1] = 0
-            elif(item[1] >= grid.size["y"]):
-               item[1] = grid.size["y"] - 1
-               
-            if (item not in prunedList):
-                prunedList.append(item)
-
-        return prunedList
-
     def assessAgenda(self, grid):
-        #Check surroundings
-        self.entVisionCurrent = self.checkVision(grid)
+        nextMove = self.decideMove(grid)
+        timer = startTimer("makeMove", self)
+        self.makeMove(grid, nextMove)
+        stopTimer(timer)
 
-        #Check neighbouring tiles - if target is present, go for that above all else
+    def decideMove(self, grid):
+        #Look around and work through the agenda, returning the move to make without making it
+        #Only the agent's own state changes, so every agent can decide against the same grid at once
+
+        #Agents with a policy skip the agenda - the policy has already been shown what the agent can see
+        if self.policy is not None:
+            return self.policy(self, grid)
+
+        #Check surroundings - unless there's nothing new that could be seen, in which case nothing's next to the agent either
+        #Agendas are rebuilt when the agent gets hungry enough to change priorities, the same as when something new is seen
         skipEval = False
-        validMoves = self.considerOptions(self.position["x"], self.position["y"], grid)
-        for move in validMoves:
-            for occupant in grid.grid[self.position["y"] + move[1]][self.position["x"] + move[0]].occupant:
-                if(isinstance(occupant, self.targetType)):
-                    nextMove = move
-                    skipEval = True
+        if (self.energy < 20) != self.agendaDire:
+            self.reevaluateNextMove = True
+        if self.eventDriven and not self.canSeeAnythingNew(grid):
+            #Fast path - nothing's in range and every tile in it is already in memory, so the agenda carries on with its next step as it is
+            countEvent("vision.skipped", self)
+            self.skippedLook = (self.position["x"], self.position["y"], grid)
+        else:
+            timer = startTimer("vision", self)
+            self.entVisionCurrent = self.checkVision(grid)
+            stopTimer(timer)
+
+            #Check neighbouring tiles - if target is present, go for that above all else
+            validMoves = self.considerOptions(self.position["x"], self.position["y"], grid)
+            for move in validMoves:
+                for occupant in grid.getOccupants(self.position["x"] + move[0], self.position["y"] + move[1]):
+                    if(isinstance(occupant, self.targetType)):
+                        nextMove = move
+                        skipEval = True
                     
 
         if len(self.agenda) == 0:
             #If there's nothing in the agenda, well you should probably rethink your agenda, huh?
             self.reevaluateNextMove = True
 
+        timer = startTimer("agenda", self)
+        rebuilt = self.reevaluateNextMove
         if self.reevaluateNextMove:
             #Stop following current agenda and make a new one
             self.agenda = []
@@ -691,32 +1892,40 @@ class AgentBase:
             #Look for objects in vision
             distanceList = []
             threatList = []
-            
-            for obj in self.entVisionCurrent:
-                #Look for targets and calculate how far away they are
-                if self.fleeFrom is not None:
-                    if isinstance(obj, self.fleeFrom):
+
+            #Threats and targets in range come from the grid's entity index, nearest first - only the ones on tiles the agent can see count
+            x = self.position["x"]
+            y = self.position["y"]
+            if self.fleeFrom is not None:
+                for obj in grid.getNearestEntities(x, y, self.fleeFrom, None, self.visionRange):
+                    if obj in self.entVisionCurrent:
                         threatList.append([obj, self.getDistanceFromMe(obj.position["x"], obj.position["y"])])
-                    
-                if isinstance(obj, self.targetType):
-                    distanceList.append([obj, self.getDistanceFromMe(obj.position["x"], obj.position["y"])])
+
+            for obj in grid.getNearestEntities(x, y, self.targetType, None, self.visionRange):
+                #Look for targets and calculate how far away they are
+                if obj in self.entVisionCurrent:
+                    distanceList.append([obj, self.getDistanceFromMe(obj.position["x"], obj.position["y"]), obj.position])
 
             #Look for objects in memory
 
             for obj in self.entVisionMemory:
                 #Remember targets, do same as above
-                if isinstance(obj, self.targetType):
-                    #Don't add if already in list
-                    objDist = [obj, self.getDistanceFromMe(obj.position["x"], obj.position["y"])]
-                    if objDist not in distanceList:
-                        distanceList.append(objDist)
+                #Don't add if already in list
+                if isinstance(obj, self.targetType) and obj not in self.entVisionCurrent:
+                    lastSeen = self.getLastSeen(obj)
+                    distance = self.getDistanceFromMe(lastSeen["x"], lastSeen["y"])
+                    if self.team is None or distance <= self.team.sightingRange:
+                        distanceList.append([obj, distance, lastSeen])
 
             #Sort lists by distance, ascending
             threatList.sort(key=lambda threatList:threatList[1])
             distanceList.sort(key=lambda distanceList:distanceList[1])
 
+            #Targets walled off from the agent are left out, rather than searched for and given up on every tick
+            position = (self.position["x"], self.position["y"])
             for target in distanceList:
-                self.agenda.append(MoveToPos(self, target[0].position["x"], target[0].position["y"], target[0]))
+                if self.memGrid.isReachable(position, (target[2]["x"], target[2]["y"])):
+                    self.agenda.append(MoveToPos(self, target[2]["x"], target[2]["y"], target[0]))
 
             for threat in threatList:
                 self.agenda.append(Hide(self, threat[0]))
@@ -737,35 +1946,101 @@ class AgentBase:
         self.reevaluateNextMove = False
 
         #Sort agenda based on agent's priority
-        orderedAgenda = []
-        priorityList = self.priorityList
-        if (self.energy < 20):
-            priorityList = self.direPriorityList
-        for priority in priorityList:
-            for task in self.agenda:
-                if isinstance(task, priority):
-                    orderedAgenda.append(task)
-
-        self.agenda = orderedAgenda
+        #Tasks are only ever taken off the front, so a sorted agenda stays sorted until it's rebuilt
+        if rebuilt or not self.eventDriven:
+            orderedAgenda = []
+            priorityList = self.priorityList
+            self.agendaDire = self.energy < 20
+            if (self.agendaDire):
+                priorityList = self.direPriorityList
+            for priority in priorityList:
+                for task in self.agenda:
+                    if isinstance(task, priority):
+                        orderedAgenda.append(task)
+
+            self.agenda = orderedAgenda
+        stopTimer(timer)
 
         #Do current top-priority task
+        timer = startTimer("option", self)
         if not skipEval:
-            if not self.agenda[0].inProgress:
-                nextMove = self.agenda[0].startTask()
-            else:
-                nextMove = self.agenda[0].nextStep()
-                if self.agenda[0].complete:
-                    self.agenda.pop(0)
+            nextMove = self.doTopTask()
 
         else:
             self.reevaluateNextMove = True
 
+        #A task that finished this step has already been taken off, and may have been the last one
         if(nextMove == [0,0]):
             self.reevaluateNextMove = True
-            self.agenda[0].complete = True
-        
-        self.makeMove(grid, nextMove)
+            if len(self.agenda) > 0:
+                self.agenda[0].complete = True
+        stopTimer(timer)
+        return nextMove
+
+
+    def doTopTask(self):
+        if not self.agenda[0].inProgress:
+            return self.agenda[0].startTask()
+        nextMove = self.agenda[0].nextStep()
+        if self.agenda[0].complete:
+            self.agenda.pop(0)
+        return nextMove
 
+    def canSeeAnythingNew(self, grid):
+        #Whether looking around could turn up anything - something was in sight last tick (it may have left or moved), anything else
+        #is in range now (it may have come into sight), the walls have changed since it last looked, or it's moved within range of unknown tiles
+        #If not, only known tiles with nothing on them would be seen, so memory, entity vision and the agenda are already up to date
+        x = self.position["x"]
+        y = self.position["y"]
+        if self.lookedFrom is None or self.lookedFrom[2] != grid.wallVersion or len(self.entVisionCurrent) > 0:
+            return True
+        for entity in grid.getEntitiesInRadius(x, y, self.visionRange):
+            if entity is not self:
+                return True
+        #Team sightings in range may turn out to have moved on
+        if self.team is not None and self.team.hasSightingNear(x, y, self.visionRange):
+            return True
+        if self.lookedFrom[:2] == (x, y):
+            return False
+
+        #Moved - only tiles memory hasn't got yet could be new, and walls found there are the only thing that would change a planned path
+        reach = int(self.visionRange)
+        unknown, walls = self.memGrid.getMemoryWindow(max(x - reach, 0), max(y - reach, 0), min(x + reach + 1, grid.size["x"]), min(y + reach + 1, grid.size["y"]))
+        return bool(unknown.any())
+
+    def getLastSeen(self, entity):
+        #Where a remembered entity is - an agent on its own always knows where it is now, a team only where it was last seen
+        #Agents on their own keep the original game's rule, where memory only holds which entities have been seen, so games without
+        #teamKnowledge are unchanged - the team's table has to hold positions, since members share sightings they didn't make themselves
+        if self.team is None:
+            return entity.position
+        sighting = self.team.sightings[entity]
+        return {"x": sighting[1], "y": sighting[2]}
+
+    def getExploredPercentage(self, grid):
+        undiscovered = self.memGrid.countUnknown()
+        total = grid.size["x"] * grid.size["y"]
+        return ((total - undiscovered) / total) * 100
+
+    def getKillerName(self):
+        if self.killer is None:
+            return None
+        if isinstance(self.killer, str):
+            return self.killer
+        return self.killer.niceName
+
+    def getStats(self, grid):
+        #Same figures as reportStatsCurrent/postMortem, as a dict for collecting results
+        return {
+            "agent": self.niceName,
+            "type": type(self).__name__,
+            "alive": self.killer is None,
+            "lifetime": self.lifeTime,
+            "energy": self.energy,
+            "points": self.points,
+            "killer": self.getKillerName(),
+            "explored": self.getExploredPercentage(grid)
+            }
 
     def reportStatsCurrent(self, grid):
         #Print out current stats
@@ -774,14 +2049,7 @@ class AgentBase:
         print("\nCurrent Location: [%s, %s]" %(self.position["x"], self.position["y"]))
         print("Energy: %i" % self.energy)
         print("Lifetime: %i" % self.lifeTime)
-        undiscovered = 0
-        total = grid.size["x"] * grid.size["y"]
-        for y in self.memGrid.grid:
-            for x in y:
-                if x.unknownMarker:
-                    undiscovered += 1
-
-        print("Percentage of Grid Explored: %i%%" % (((total - undiscovered) / total) * 100))
+        print("Percentage of Grid Explored: %i%%" % self.getExploredPercentage(grid))
         print("\nIn Vision:")
         if (len(self.entVisionCurrent) == 0):
             print("\tNo Objects")
@@ -792,14 +2060,15 @@ class AgentBase:
                 print("\t- Location: [%i, %i]" % (item.position["x"], item.position["y"]))
 
         print("\nIn Memory:")
-        if (len(self.entVisionMemory) == 0 or set(self.entVisionMemory) == set(self.entVisionCurrent)):
+        if (len(self.entVisionMemory) == 0 or self.entVisionMemory.keys() == self.entVisionCurrent.keys()):
             print("\tNo Objects Outside of Vision")
         else:
             for item in self.entVisionMemory:
                 if item not in self.entVisionCurrent:
+                    lastSeen = self.getLastSeen(item)
                     print("\t", end="")
                     print(item.niceName)
-                    print("\t- Location: [%i, %i]" % (item.position["x"], item.position["y"]))
+                    print("\t- Location: [%i, %i]" % (lastSeen["x"], lastSeen["y"]))
 
 
         print("______________________________")
@@ -821,16 +2090,17 @@ class AgentBase:
         #Get the tiles the agent can currently see and print a map showcasing those
         visibleTiles = self.getVisibleTiles(grid)
 
-        for y in range(len(self.memGrid.grid)):
-            for x in range(len(self.memGrid.grid[0])):
-                if [x,y] not in visibleTiles:
+        for y in range(self.memGrid.size["y"]):
+            for x in range(self.memGrid.size["x"]):
+                occupants = self.memGrid.getOccupants(x, y)
+                if (x, y) not in visibleTiles:
                     print("?", end=" ")
-                elif len(self.memGrid.grid[y][x].occupant) > 0:
-                    if self.memGrid.grid[y][x].occupant[0] == self:
+                elif len(occupants) > 0:
+                    if occupants[0] == self:
                         print("A", end=" ")
                     else:
                         print("X", end=" ")
-                elif (self.memGrid.grid[y][x].isWall):
+                elif (self.memGrid.isWall(x, y)):
                     print("■", end=" ")
                 else:
                     print("□", end=" ")
@@ -839,10 +2109,12 @@ class AgentBase:
 
     def die(self, grid, killer):
         #Set the agent's killer depending on what killed it
-        if(killer == None):
-            self.killer = "Starvation"
-        else:
-            self.killer = killer
+        #Anything caught this tick has already died once, so only the first call counts
+        if self.killer is None:
+            self.killer = "Starvation" if killer is None else killer
+        #Dead agents leave the grid and its entity index, so nothing can find them afterwards
+        if self in grid.getOccupants(self.position["x"], self.position["y"]):
+            grid.removeOccupant(self.position["x"], self.position["y"], self)
 
     def postMortem(self, grid):
         #Print out last stats before death
@@ -851,19 +2123,9 @@ class AgentBase:
         print("\nLast Location: [%s, %s]" %(self.position["x"], self.position["y"]))
         print("Remaining Energy: %i" % self.energy)
         print("Lifetime: %i" % self.lifeTime)
-        if not isinstance(self.killer, str):
-            print("Killer: %s" % self.killer.niceName)
-        else:
-            print("Killer: %s" % self.killer)
-
-        undiscovered = 0
-        total = grid.size["x"] * grid.size["y"]
-        for y in self.memGrid.grid:
-            for x in y:
-                if x.unknownMarker:
-                    undiscovered += 1
+        print("Killer: %s" % self.getKillerName())
 
-        print("Percentage of Grid Explored: %i%%" % (((total - undiscovered) / total) * 100))
+        print("Percentage of Grid Explored: %i%%" % self.getExploredPercentage(grid))
 
         print("\nPrevious Agenda:")
         for task in self.agenda:
@@ -886,17 +2148,15 @@ class Mouse(AgentBase):
 
     def pickup(self, grid):
         #Run pickup
-        for item in grid.grid[self.position["y"]][self.position["x"]].occupant:
+        for item in list(grid.getOccupants(self.position["x"], self.position["y"])):
             if isinstance(item, Pickup):
                 item.runPickup(grid, self)
-                #Remove item from memgrid
-                self.memGrid.grid[self.position["y"]][self.position["x"]].removeOccupant(item)
         
 
     def runPickup(self, grid, actor):
         #Mouse has been caught by a cat - remove from environment and give benefits to cat
-        actor.entVisionCurrent.remove(self)
-        actor.entVisionMemory.remove(self)
+        actor.entVisionCurrent.pop(self, None)
+        actor.entVisionMemory.pop(self, None)
 
         actor.energy += self.energyFromPickup
         actor.points += 1
@@ -919,10 +2179,9 @@ class Cat(AgentBase):
         
     def pickup(self, grid):
         #Run pickup
-        for item in grid.grid[self.position["y"]][self.position["x"]].occupant:
+        for item in list(grid.getOccupants(self.position["x"], self.position["y"])):
             if isinstance(item, self.targetType):
                 item.runPickup(grid, self)
-                self.memGrid.grid[self.position["y"]][self.position["x"]].removeOccupant(item)
     
     
 class Pickup:
@@ -931,34 +2190,25 @@ class Pickup:
         self.pickupEnergy = pickupEnergy
 
     def placeMe(self, grid):
-        #Ensure target tile is within grid and isn't occupied
-        empty = False
-        while not (empty):
-            x = y = -1
-            #Make sure target tile is within grid bounds
-            while((x < 0 or x > grid.size["x"] - 1) or (y < 0 or y > grid.size["y"] - 1)):
-                x, y = self.pickRandomTile(grid)
-            #If chosen tile is empty, exit loop
-            if(len(grid.grid[y][x].occupant) == 0 and not grid.grid[y][x].isWall):
-                empty = True
+        #Move to a random tile that isn't a wall and has nothing on it
+        #Returns False, leaving the pickup where it was, if every tile is taken
+        tile = grid.getRandomFreeTile()
+        if tile is None:
+            return False
 
         #Set new position
-        self.position = {"x": x, "y": y}
-        grid.grid[y][x].addOccupant(self)
-
-    def pickRandomTile(self, grid):
-        #Picks a space in the grid entirely at random
-        x = random.randint(0, grid.size["x"] -1)
-        y = random.randint(0, grid.size["y"] -1)
-        return x, y
+        self.position = {"x": tile[0], "y": tile[1]}
+        grid.addOccupant(tile[0], tile[1], self)
+        return True
 
     def runPickup(self, grid, actor):
         #The item has been picked up by another actor
+        oldPosition = self.position
         if(isinstance(actor, Mouse)):
             #Find the next spot to spawn in
-            self.placeMe(grid)
-            actor.entVisionCurrent.remove(self)
-            actor.entVisionMemory.remove(self)
+            respawned = self.placeMe(grid)
+            actor.entVisionCurrent.pop(self, None)
+            actor.entVisionMemory.pop(self, None)
 
             #Pass values to actor
             actor.target = self.position
@@ -966,9 +2216,14 @@ class Pickup:
             actor.points += 1
         else:
             #Respawn, but don't provide benefits, in case a cat happens to walk onto the tile
-            self.placeMe(grid)
-            actor.entVisionCurrent.remove(self)
-            actor.entVisionMemory.remove(self)
+            respawned = self.placeMe(grid)
+            actor.entVisionCurrent.pop(self, None)
+            actor.entVisionMemory.pop(self, None)
+
+        #Only leave the old tile once the new one's picked, so it can't respawn in the same place
+        #If there was nowhere else to go, it stays put
+        if respawned:
+            grid.removeOccupant(oldPosition["x"], oldPosition["y"], self)
 
 
 #Colours
@@ -978,67 +2233,814 @@ RED = (255, 0, 0)
 BLUE = (0, 0, 255)
 GREEN = (0, 255, 0)
 GREY = (140, 140, 140)
-
-def runGame(properties):
-    #Generate a grid
-    grid = Grid(properties["gridX"], properties["gridY"], properties["wallPercentage"])
-    grid.generate()
-
-    #Scale window based on grid size
-    screenWidth = (grid.tileProperties["size"] * grid.size["x"]) + (grid.tileProperties["margin"] * (grid.size["x"] + 1))
-    screenHeight = (grid.tileProperties["size"] * grid.size["y"]) + (grid.tileProperties["margin"] * (grid.size["y"] + 1))
-    screen = pygame.display.set_mode((screenWidth, screenHeight))
-    clock = pygame.time.Clock()
-    running = True
-
-    #Init agents
-    activeAgents = []
-    environmentPickups = []
-    graveyard = []
-
-    #Add agents to the active agents list and give them names
-    for i in range(properties["noCats"]):
-        activeAgents.append(Cat(properties["catEnergy"], properties["catVis"]))
-        if properties["noCats"] > 1:
-            activeAgents[-1].niceName += " " + str(i + 1)
-
-    for i in range(properties["noMice"]):
-        activeAgents.append(Mouse(properties["mouseEnergy"], properties["mouseVis"], properties["energyFromMouse"]))
-        if properties["noMice"] > 1:
-            activeAgents[-1].niceName += " " + str(i + 1)
-
-    for i in range(properties["noPickups"]):
-        environmentPickups.append(Pickup(properties["energyFromPickup"]))
-        environmentPickups[-1].placeMe(grid)
-
-    #Place agents on the grid
-    for agent in activeAgents:
-        agent.placeMe(grid, random.randint(0, grid.size["x"] - 1), random.randint(0, grid.size["y"] - 1))        
-        
-    #Loop until program is quit
-    while running:
-        clock.tick(5) #FPS
-        
-        for event in pygame.event.get():
-            #Quit button is clicked (i.e. red X on window)
-            if event.type == pygame.QUIT:
-                running = False
-                pygame.quit()
-                sys.exit()
-
-            #Listen for keypresses
-            elif event.type == pygame.KEYDOWN:
-                #When P key is pressed, pause
-                if event.key == pygame.K_p:
-                    pause(clock, grid)
+OCCUPANT_COLOURS = {Pickup: GREEN, Mouse: BLUE, Cat: RED}
+
+def getOccupantColours(occupants):
+    #Colour of each occupied tile, going by whoever got there first - only occupied tiles are looked at
+    colours = {}
+    for tile, tileOccupants in occupants.items():
+        colour = OCCUPANT_COLOURS.get(type(tileOccupants[0]))
+        if colour is not None:
+            colours[tile] = colour
+    return colours
+
+#Profiling
+#Hot paths call startTimer/stopTimer and countEvent, which do nothing unless a profiler has been set
+activeProfiler = None
+
+def setProfiler(profiler):
+    global activeProfiler
+    activeProfiler = profiler
+
+def startTimer(section, owner=None):
+    if activeProfiler is None:
+        return None
+    return activeProfiler.start(section, owner)
+
+def stopTimer(timer):
+    if timer is not None:
+        activeProfiler.stop(timer)
+
+def countEvent(counter, owner=None, amount=1):
+    if activeProfiler is not None:
+        activeProfiler.count(counter, owner, amount)
+
+class Profiler:
+    #Timers and counters for each section, totalled per agent type and per tick
+    #Sections can nest - each keeps its own time apart from its children's, for flamegraphs
+    def __init__(self):
+        self.sections = {}
+        self.counters = {}
+        self.folded = {}
+        self.ticks = []
+        self.currentTick = {}
+
+        #Each thread nests its own sections - totals are shared, so they're only updated under the lock
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def getStack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def start(self, section, owner=None):
+        #Sections belonging to an agent are labelled by its type, e.g. Mouse.vision
+        label = section if owner is None else type(owner).__name__ + "." + section
+        frame = [label, time.perf_counter(), 0.0]
+        self.getStack().append(frame)
+        return frame
+
+    def stop(self, frame):
+        elapsed = time.perf_counter() - frame[1]
+        stack = self.getStack()
+        path = ";".join(entry[0] for entry in stack)
+        stack.pop()
+        if len(stack) > 0:
+            stack[-1][2] += elapsed
+
+        with self.lock:
+            self.addTime(frame, path, elapsed)
+
+    def addTime(self, frame, path, elapsed):
+        label = frame[0]
+        totals = self.sections.get(label)
+        if totals is None:
+            self.sections[label] = [1, elapsed]
+        else:
+            totals[0] += 1
+            totals[1] += elapsed
+        self.currentTick[label] = self.currentTick.get(label, 0.0) + elapsed
+        self.folded[path] = self.folded.get(path, 0.0) + elapsed - frame[2]
+
+    def count(self, counter, owner=None, amount=1):
+        label = counter if owner is None else type(owner).__name__ + "." + counter
+        with self.lock:
+            self.counters[label] = self.counters.get(label, 0) + amount
+
+    def endTick(self, tick):
+        self.ticks.append({"tick": tick, "sections": self.currentTick})
+        self.currentTick = {}
+
+    def getSummary(self):
+        return {
+            "sections": {label: {"calls": totals[0], "totalMs": totals[1] * 1000, "meanMs": totals[1] * 1000 / totals[0]}
+                         for label, totals in self.sections.items()},
+            "counters": dict(self.counters),
+            "ticks": [{"tick": entry["tick"], "sections": {label: seconds * 1000 for label, seconds in entry["sections"].items()}}
+                      for entry in self.ticks]
+            }
+
+    def writeJson(self, path):
+        with open(path, "w") as file:
+            json.dump(self.getSummary(), file, indent=2)
+
+    def writeFolded(self, path):
+        #One line per call stack with its own time in microseconds - the format flamegraph.pl and speedscope read
+        with open(path, "w") as file:
+            for stack, seconds in sorted(self.folded.items()):
+                file.write("%s %i\n" % (stack, round(seconds * 1000000)))
+
+    def report(self):
+        #Sections slowest first, then counters
+        print("\n%-32s %8s %12s %10s" % ("Section", "Calls", "Total ms", "Mean ms"))
+        for label, totals in sorted(self.sections.items(), key=lambda item: -item[1][1]):
+            print("%-32s %8i %12.1f %10.3f" % (label, totals[0], totals[1] * 1000, totals[1] * 1000 / totals[0]))
+        print("\n%-32s %8s" % ("Counter", "Value"))
+        for label, value in sorted(self.counters.items()):
+            print("%-32s %8i" % (label, value))
+
+#Columns of the per tick metrics, in file order
+METRIC_COLUMNS = ["tick", "agent", "type", "x", "y", "energy", "points", "explored", "agenda", "alive", "events"]
+
+class MetricsSink:
+    #Per tick, per agent rows, written out in batches so memory stays bounded however long the run
+    #The format comes from the file extension - .jsonl, .csv, or .parquet (needs pyarrow)
+    #Events are joined into one string, e.g. "capture:Mouse 2;death:Starvation", so every format has the same columns
+    def __init__(self, path, bufferRows=10000):
+        self.path = path
+        self.bufferRows = bufferRows
+        self.rows = []
+        self.format = os.path.splitext(path)[1].lower()
+        self.file = None
+        self.writer = None
+
+        if self.format == ".jsonl":
+            self.file = open(path, "w")
+        elif self.format == ".csv":
+            self.file = open(path, "w", newline="")
+            self.writer = csv.DictWriter(self.file, fieldnames=METRIC_COLUMNS)
+            self.writer.writeheader()
+        elif self.format == ".parquet":
+            import pyarrow
+            import pyarrow.parquet
+            self.schema = pyarrow.schema([
+                ("tick", pyarrow.int64()), ("agent", pyarrow.string()), ("type", pyarrow.string()),
+                ("x", pyarrow.int64()), ("y", pyarrow.int64()), ("energy", pyarrow.int64()), ("points", pyarrow.int64()),
+                ("explored", pyarrow.float64()), ("agenda", pyarrow.string()), ("alive", pyarrow.bool_()), ("events", pyarrow.string())
+                ])
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            raise ValueError("unknown metrics format %s - use .jsonl, .csv or .parquet" % self.format)
+
+    def write(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.bufferRows:
+            self.flush()
+
+    def flush(self):
+        if len(self.rows) == 0:
+            return
+        if self.format == ".jsonl":
+            self.file.write("".join(json.dumps(row) + "\n" for row in self.rows))
+        elif self.format == ".csv":
+            self.writer.writerows(self.rows)
+        else:
+            #Each flush is one row group
+            import pyarrow
+            columns = {column: [row[column] for row in self.rows] for column in METRIC_COLUMNS}
+            self.writer.write_table(pyarrow.Table.from_pydict(columns, schema=self.schema))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+        elif self.writer is not None:
+            self.writer.close()
+        self.file = None
+        self.writer = None
+
+#Checkpoints are a pickle of the simulation followed by its big arrays, stored raw so they can be memory-mapped when loaded
+#Layout: magic, table length, state length, table of arrays, state pickle, then each array starting on a multiple of CHECKPOINT_ALIGNMENT
+CHECKPOINT_MAGIC = b"HPCKPT01"
+CHECKPOINT_ALIGNMENT = 64
+#Arrays smaller than this stay in the pickle
+CHECKPOINT_ARRAY_BYTES = 1024
+
+class CheckpointPickler(pickle.Pickler):
+    #Pulls big arrays out of the pickle into a list, and saves the shared random module by name
+    def __init__(self, file):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.arrays = []
+        self.arrayIndices = {}
+
+    def persistent_id(self, obj):
+        #Grids and agents made outside a Simulation use the random module, which is left as it is when loading
+        if obj is random:
+            return "random"
+        if isinstance(obj, np.ndarray) and obj.nbytes >= CHECKPOINT_ARRAY_BYTES and not obj.dtype.hasobject:
+            #Arrays held in more than one place are only saved once, and come back shared
+            index = self.arrayIndices.get(id(obj))
+            if index is None:
+                index = len(self.arrays)
+                self.arrayIndices[id(obj)] = index
+                self.arrays.append(obj)
+            return ("array", index)
+        return None
+
+class CheckpointUnpickler(pickle.Unpickler):
+    def __init__(self, file, arrays):
+        super().__init__(file)
+        self.arrays = arrays
+
+    def persistent_load(self, pid):
+        if pid == "random":
+            return random
+        return self.arrays[pid[1]]
+
+def alignCheckpoint(offset):
+    return -(-offset // CHECKPOINT_ALIGNMENT) * CHECKPOINT_ALIGNMENT
+
+def writeCheckpoint(simulation, file):
+    #Everything needed to carry on the game - the grid, agents and their memories and agendas, and the game's random generators
+    state = io.BytesIO()
+    pickler = CheckpointPickler(state)
+    pickler.dump({"simulation": simulation})
+    state = state.getvalue()
+
+    table = []
+    offset = 0
+    for array in pickler.arrays:
+        table.append((array.dtype.str, array.shape, offset))
+        offset = alignCheckpoint(offset + array.nbytes)
+    table = pickle.dumps(table, pickle.HIGHEST_PROTOCOL)
+
+    header = len(CHECKPOINT_MAGIC) + 16 + len(table) + len(state)
+    file.write(CHECKPOINT_MAGIC)
+    file.write(struct.pack("<QQ", len(table), len(state)))
+    file.write(table)
+    file.write(state)
+    file.write(bytes(alignCheckpoint(header) - header))
+    for array in pickler.arrays:
+        file.write(array.tobytes())
+        file.write(bytes(alignCheckpoint(array.nbytes) - array.nbytes))
+
+def readCheckpoint(file, mmap=True):
+    #Arrays are mapped copy on write, so the game can carry on without touching the file, and loads of one file share unchanged pages
+    if file.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+        raise ValueError("not a checkpoint file")
+    tableLength, stateLength = struct.unpack("<QQ", file.read(16))
+    table = pickle.loads(file.read(tableLength))
+    state = file.read(stateLength)
+    dataStart = alignCheckpoint(len(CHECKPOINT_MAGIC) + 16 + tableLength + stateLength)
+
+    sizes = [int(np.prod(shape)) * np.dtype(dtype).itemsize for dtype, shape, offset in table]
+    dataLength = table[-1][2] + sizes[-1] if table else 0
+    if dataLength == 0:
+        data = np.zeros(0, dtype=np.uint8)
+    elif mmap:
+        data = np.memmap(file, dtype=np.uint8, mode="c", offset=dataStart, shape=(dataLength,))
+    else:
+        file.seek(dataStart)
+        data = np.frombuffer(bytearray(file.read(dataLength)), dtype=np.uint8)
+    arrays = [data[offset:offset + size].view(dtype).reshape(shape) for (dtype, shape, offset), size in zip(table, sizes)]
+
+    return CheckpointUnpickler(io.BytesIO(state), arrays).load()["simulation"]
+
+def saveCheckpoint(simulation, path):
+    with open(path, "wb") as file:
+        writeCheckpoint(simulation, file)
+
+def loadCheckpoint(path, mmap=True):
+    #The game's generators come back as they were when saved, so a loaded game carries on exactly as the original would have
+    with open(path, "rb") as file:
+        return readCheckpoint(file, mmap)
+
+#Two phase decisions on a pool
+#Agents stay in the pool's worker processes while it's attached to a game - each is handed to one worker, which keeps its memory,
+#planners and generator from then on. Workers keep a copy of the grid, sent again only when its walls change, with every entity they
+#don't decide for as a stand-in holding only what other agents read - its type, name, position and vision range
+#Each tick only where everything is and what the game changed in each agent is sent to the workers, and only each agent's move,
+#the tiles it revealed, its sight and its agenda come back - anything else a worker keeps is only taken back when the game needs it all
+#Pools can't change the game, so a decision only differs from deciding in this process in what it had to build again, e.g. flow fields
+STAND_IN_ATTRIBUTES = ("niceName", "position", "visionRange")
+#What the game changes in an agent between decisions, sent to its worker with each one
+DECISION_COUNTERS = ("energy", "lifeTime", "points", "reevaluateNextMove", "eventDriven")
+#What the game keeps up to date itself while an agent is in a pool, so is never taken back from a worker
+GAME_ATTRIBUTES = DECISION_COUNTERS + ("position", "killer", "target", "policy", "memGrid", "agenda", "entVisionCurrent", "entVisionMemory")
+#Nothing of these types is ever sent as a reference, so they're passed straight through - most of what's pickled is one of them
+PLAIN_TYPES = frozenset((int, float, str, bool, tuple, list, set, type(None), np.ndarray))
+
+class DecisionPickler(pickle.Pickler):
+    #Entities in the table, and anything in shared ({id: name}), are saved as references to what the other side already has
+    def __init__(self, file, entities, shared):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.entityIndices = {id(entity): i for i, entity in enumerate(entities)}
+        self.shared = shared
+
+    def persistent_id(self, obj):
+        if type(obj) in PLAIN_TYPES:
+            return None
+        if obj is random:
+            return "random"
+        index = self.entityIndices.get(id(obj))
+        if index is not None:
+            return ("entity", index)
+        return self.shared.get(id(obj))
+
+class DecisionUnpickler(pickle.Unpickler):
+    def __init__(self, file, entities, shared):
+        super().__init__(file)
+        self.entities = entities
+        self.shared = shared
+
+    def persistent_load(self, pid):
+        if pid == "random":
+            return random
+        if isinstance(pid, tuple):
+            return self.entities[pid[1]]
+        return self.shared[pid]
+
+def dumpDecision(obj, entities, shared):
+    file = io.BytesIO()
+    DecisionPickler(file, entities, shared).dump(obj)
+    return file.getvalue()
+
+def loadDecision(data, entities, shared):
+    return DecisionUnpickler(io.BytesIO(data), entities, shared).load()
+
+def getSharedIds(grid, memGrid=None):
+    #What an agent's state points at on the grid, which each side has its own of - and its memory, once both sides have that too
+    shared = {id(grid): "grid", id(grid.occupants): "occupants", id(grid.entities): "entities"}
+    if memGrid is not None:
+        shared[id(memGrid)] = "memGrid"
+    return shared
+
+def getSharedObjects(grid, memGrid=None):
+    return {"grid": grid, "occupants": grid.occupants, "entities": grid.entities, "memGrid": memGrid}
+
+def dumpDecisionGrid(grid, entities, shared=None):
+    #Copy of the grid's walls for the workers - cached flow fields and the free tile index aren't needed to decide
+    left = {id(grid.flowFields): "flowFields", id(grid.memoryFlowFields): "memoryFlowFields"}
+    for name in ("freeTileArray", "freeSlotArray"):
+        if getattr(grid, name, None) is not None:
+            left[id(getattr(grid, name))] = "none"
+    left.update(shared or {})
+    return dumpDecision(grid, entities, left)
+
+class DecisionWorker:
+    #What each DecisionPool process keeps between ticks - the agents it decides for, stand-ins for every other entity, and its copy of the grid
+    def __init__(self):
+        self.entities = []
+        self.indices = {}
+        self.grid = None
+
+    def attach(self, table, gridState, agents):
+        #Start on a new game - agents are (entity index, pickled state) for the ones this worker decides for
+        self.entities = []
+        for entityType, attributes in pickle.loads(table):
+            entity = entityType.__new__(entityType)
+            entity.__dict__.update(attributes)
+            self.entities.append(entity)
+        self.indices = {id(entity): i for i, entity in enumerate(self.entities)}
+        self.grid = loadDecision(gridState, self.entities, {"flowFields": {}, "memoryFlowFields": {}, "none": None})
+        self.setAgents(agents)
+
+    def setAgents(self, agents):
+        for index, state in agents:
+            self.entities[index].__dict__.update(loadDecision(state, self.entities, getSharedObjects(self.grid)))
+
+    def setGrid(self, gridState):
+        #The walls have changed - they're taken into the same grid object, since every memory here points at it
+        shared = getSharedObjects(self.grid)
+        shared.update({"flowFields": {}, "memoryFlowFields": {}, "none": None})
+        newGrid = loadDecision(gridState, self.entities, shared)
+        newGrid.grid = self.grid.grid
+        self.grid.__dict__.update(newGrid.__dict__)
+
+    def decide(self, world, tasks):
+        #world is every entity's position and what's on each tile, pickled - tasks are (entity index, counters, full state or None)
+        #Returns (move, revealed tiles, reevaluateNextMove, sight, memory, pickled agenda) for each task
+        positions, occupants, entities = loadDecision(world, self.entities, {})
+        for entity, (x, y) in zip(self.entities, positions):
+            entity.position = {"x": x, "y": y}
+        #Memories share these dicts, so they're refilled rather than replaced
+        self.grid.occupants.clear()
+        self.grid.occupants.update(occupants)
+        self.grid.entities.clear()
+        self.grid.entities.update(entities)
+
+        results = []
+        for index, counters, state in tasks:
+            agent = self.entities[index]
+            if state is not None:
+                self.setAgents([(index, state)])
+            for name, value in zip(DECISION_COUNTERS, counters):
+                setattr(agent, name, value)
+            current, memory = counters[len(DECISION_COUNTERS):]
+            agent.entVisionCurrent = {self.entities[i]: None for i in current}
+            agent.entVisionMemory = {self.entities[i]: None for i in memory}
+
+            #Agents given the whole grid never reveal anything
+            revealed = []
+            if agent.memGrid is not self.grid:
+                agent.memGrid.revealed = revealed
+            nextMove = agent.decideMove(self.grid)
+            if agent.memGrid is not self.grid:
+                agent.memGrid.revealed = None
+
+            agenda = dumpDecision(agent.agenda, self.entities, getSharedIds(self.grid, agent.memGrid))
+            results.append((nextMove, revealed, agent.reevaluateNextMove, [self.indices[id(entity)] for entity in agent.entVisionCurrent],
+                            [self.indices[id(entity)] for entity in agent.entVisionMemory], agenda))
+        return results
+
+    def fetch(self, indices):
+        #Everything kept here of these agents that the game doesn't keep up to date itself, e.g. planners and generators
+        states = []
+        for index in indices:
+            agent = self.entities[index]
+            state = {name: value for name, value in agent.__dict__.items() if name not in GAME_ATTRIBUTES}
+            states.append(dumpDecision(state, self.entities, getSharedIds(self.grid, agent.memGrid)))
+        return states
+
+def runDecisionWorker(connection):
+    #Worker process for DecisionPool - answers each message in turn with ("done", result), or ("error", traceback) if it failed
+    worker = DecisionWorker()
+    while True:
+        command, data = connection.recv()
+        if command == "close":
+            connection.close()
+            return
+        try:
+            connection.send(("done", getattr(worker, command)(*data)))
+        except Exception:
+            connection.send(("error", traceback.format_exc()))
+
+class DecisionPool:
+    #Worker processes for two phase ticks, which the agents of one game at a time stay in - see Simulation.setTwoPhase
+    #e.g. with DecisionPool(8) as pool: simulation.setTwoPhase(True, pool)
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.simulation = None
+        self.connections = []
+        self.processes = []
+        for i in range(self.workers):
+            connection, workerConnection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=runDecisionWorker, args=(workerConnection,), daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        #Anything still attached is taken back out first, so the game can carry on without the pool
+        if self.simulation is not None:
+            self.detach()
+        for connection, process in zip(self.connections, self.processes):
+            connection.send(("close", None))
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def call(self, messages):
+        #Sends each worker its (command, arguments), or nothing for None, then waits for every answer - returned in worker order
+        for connection, message in zip(self.connections, messages):
+            if message is not None:
+                connection.send(message)
+        results = []
+        failures = []
+        for connection, message in zip(self.connections, messages):
+            if message is None:
+                results.append(None)
+                continue
+            status, result = connection.recv()
+            if status == "error":
+                failures.append(result)
+            results.append(result)
+        if failures:
+            raise RuntimeError("decision worker failed:\n" + failures[0])
+        return results
+
+    def attach(self, simulation):
+        #Hand every agent of the game to a worker - a pool serves one game at a time, so any other is taken back out first
+        if self.simulation is not None:
+            self.detach()
+        grid = simulation.grid
+        self.simulation = simulation
+        #Entities never join or leave a game, so their order is fixed from here on, however agents move to the graveyard
+        self.entities = simulation.activeAgents + simulation.graveyard + simulation.environmentPickups
+        self.indices = {id(entity): i for i, entity in enumerate(self.entities)}
+        self.wallVersion = grid.wallVersion
+        agents = [i for i, entity in enumerate(self.entities) if isinstance(entity, AgentBase)]
+        self.owners = {index: i % self.workers for i, index in enumerate(agents)}
+        #Agents last decided in this process, e.g. by a policy - their workers' copies are out of date until they're sent again
+        self.local = set()
+
+        table = pickle.dumps([(type(entity), {name: getattr(entity, name) for name in STAND_IN_ATTRIBUTES if hasattr(entity, name)})
+                              for entity in self.entities], pickle.HIGHEST_PROTOCOL)
+        gridState = dumpDecisionGrid(grid, self.entities)
+        messages = [("attach", (table, gridState, [])) for i in range(self.workers)]
+        for index in agents:
+            messages[self.owners[index]][1][2].append((index, self.dumpAgent(index)))
+        self.call(messages)
+
+    def dumpAgent(self, index):
+        return dumpDecision(self.entities[index].__getstate__(), self.entities, getSharedIds(self.simulation.grid))
+
+    def detach(self):
+        #Take everything the workers kept back into the game, which carries on deciding in this process
+        self.fetch([index for index in self.owners if index not in self.local])
+        self.simulation.decisionPool = None
+        self.simulation = None
+
+    def sync(self):
+        #Bring every agent in the game up to date with its worker, e.g. before it's saved - the workers carry on as they were
+        self.fetch([index for index in self.owners if index not in self.local])
+
+    def fetch(self, indices):
+        grid = self.simulation.grid
+        groups = [[] for i in range(self.workers)]
+        for index in indices:
+            groups[self.owners[index]].append(index)
+        results = self.call([("fetch", (group,)) if group else None for group in groups])
+        for group, states in zip(groups, results):
+            for index, state in zip(group, states or []):
+                agent = self.entities[index]
+                agent.__dict__.update(loadDecision(state, self.entities, getSharedObjects(grid, agent.memGrid)))
+
+    def decideHere(self, agent):
+        #The agent's about to decide in this process - take it back from its worker first, unless it's already here
+        index = self.indices[id(agent)]
+        if index not in self.local:
+            self.fetch([index])
+            self.local.add(index)
+
+    def decide(self, agents):
+        #Phase one for agents without a policy, on their workers - returns {id(agent): move}
+        grid = self.simulation.grid
+        if grid.wallVersion != self.wallVersion:
+            self.wallVersion = grid.wallVersion
+            gridState = dumpDecisionGrid(grid, self.entities, {id(grid.occupants): "occupants", id(grid.entities): "entities"})
+            self.call([("setGrid", (gridState,))] * self.workers)
+
+        timer = startTimer("sendDecisions")
+        world = dumpDecision(([(entity.position["x"], entity.position["y"]) for entity in self.entities], grid.occupants, grid.entities), self.entities, {})
+        groups = [[] for i in range(self.workers)]
+        for agent in agents:
+            index = self.indices[id(agent)]
+            state = None
+            if index in self.local:
+                state = self.dumpAgent(index)
+                self.local.discard(index)
+            counters = tuple(getattr(agent, name) for name in DECISION_COUNTERS)
+            counters += ([self.indices[id(entity)] for entity in agent.entVisionCurrent], [self.indices[id(entity)] for entity in agent.entVisionMemory])
+            groups[self.owners[index]].append((index, counters, state))
+        stopTimer(timer)
+
+        results = self.call([("decide", (world, group)) if group else None for group in groups])
+
+        timer = startTimer("receiveDecisions")
+        moves = {}
+        for group, groupResults in zip(groups, results):
+            for (index, counters, state), (nextMove, revealed, reevaluate, current, memory, agenda) in zip(group, groupResults or []):
+                agent = self.entities[index]
+                for tile in revealed:
+                    agent.memGrid.reveal(*tile)
+                agent.reevaluateNextMove = reevaluate
+                agent.entVisionCurrent = {self.entities[i]: None for i in current}
+                agent.entVisionMemory = {self.entities[i]: None for i in memory}
+                agent.agenda = loadDecision(agenda, self.entities, getSharedObjects(grid, agent.memGrid))
+                moves[id(agent)] = nextMove
+        stopTimer(timer)
+        return moves
+
+class Simulation:
+    #Headless simulation core - owns the grid and agents and advances the game a tick at a time
+    #Nothing here touches pygame, so runs can go as fast as the agents can think
+    def __init__(self, properties, seed=None):
+        self.properties = properties
+        #The game's own generator, shared by its grid and agents - games never touch the random module, so any number can run side by side
+        self.random = random.Random(seed)
+
+        #Generate a grid - chunked grids only generate walls where something looks
+        if properties.get("chunkSize"):
+            self.grid = ChunkedGrid(properties["gridX"], properties["gridY"], properties["wallPercentage"],
+                                    self.random.getrandbits(32), properties["chunkSize"])
+        else:
+            self.grid = Grid(properties["gridX"], properties["gridY"], properties["wallPercentage"])
+        self.grid.random = self.random
+        self.grid.generate()
+        if properties.get("singleRegion"):
+            self.grid.fillPockets()
+
+        #Init agents
+        self.activeAgents = []
+        self.environmentPickups = []
+        self.graveyard = []
+        self.tick = 0
+        self.running = True
+        self.renderer = None
+        self.metrics = None
+
+        #Two phase ticks - see setTwoPhase
+        self.twoPhase = False
+        self.decisionPool = None
+
+        #Add agents to the active agents list and give them names
+        for i in range(properties["noCats"]):
+            self.activeAgents.append(Cat(properties["catEnergy"], properties["catVis"]))
+            if properties["noCats"] > 1:
+                self.activeAgents[-1].niceName += " " + str(i + 1)
+
+        for i in range(properties["noMice"]):
+            self.activeAgents.append(Mouse(properties["mouseEnergy"], properties["mouseVis"], properties["energyFromMouse"]))
+            if properties["noMice"] > 1:
+                self.activeAgents[-1].niceName += " " + str(i + 1)
+
+        #Every agent draws from a generator of its own, so it doesn't matter what order they decide in
+        for agent in self.activeAgents:
+            agent.random = random.Random(self.random.getrandbits(64))
+
+        for i in range(properties["noPickups"]):
+            self.environmentPickups.append(Pickup(properties["energyFromPickup"]))
+            if not self.environmentPickups[-1].placeMe(self.grid):
+                raise ValueError("no free tile left to place pickup %i" % (i + 1))
+
+        #Agents of the same type share one memory and what they've seen, if teamKnowledge is on
+        self.teams = {}
+        if properties.get("teamKnowledge"):
+            for agent in self.activeAgents:
+                if type(agent) not in self.teams:
+                    self.teams[type(agent)] = Team(self.grid, properties["teamSightingRange"])
+                agent.joinTeam(self.teams[type(agent)])
+
+        #Place agents on the grid, each on a tile that isn't a wall and has nothing on it
+        for agent in self.activeAgents:
+            tile = self.grid.getRandomFreeTile()
+            if tile is None:
+                raise ValueError("no free tile left to place %s" % agent.niceName)
+            agent.placeMe(self.grid, tile[0], tile[1])
+
+    def __getstate__(self):
+        #The pool, renderer and metrics sink belong to this process, so aren't saved - attach new ones after loading
+        #Agents in a pool are brought up to date with it first, so nothing kept there is lost
+        if self.decisionPool is not None:
+            self.decisionPool.sync()
+        state = dict(self.__dict__)
+        state["decisionPool"] = None
+        state["renderer"] = None
+        state["metrics"] = None
+        return state
+
+    def save(self, path):
+        saveCheckpoint(self, path)
+
+    def fork(self, count=None):
+        #Copies of the game that carry on independently from this tick, e.g. to try changes to the agents or properties
+        #The checkpoint is written once and mapped by every copy, so big arrays are only copied where a copy changes them
+        #Copy i is reseeded with "base:i", base being drawn from a copy of this game's generator - so forking the same game twice
+        #gives the same copies, and this game carries on as if it hadn't been forked - returns one copy, or a list of count copies
+        base = random.Random()
+        base.setstate(self.random.getstate())
+        base = base.getrandbits(64)
+
+        forks = []
+        with tempfile.TemporaryFile() as file:
+            writeCheckpoint(self, file)
+            for i in range(1 if count is None else count):
+                file.seek(0)
+                forks.append(readCheckpoint(file))
+                forks[-1].reseed("%i:%i" % (base, i))
+        return forks[0] if count is None else forks
+
+    def reseed(self, seed):
+        #Start the game's random numbers again from a new seed, as of this tick
+        #Agents with generators of their own are reseeded from the game's, in order
+        self.random.seed(seed)
+        for agent in self.activeAgents + self.graveyard:
+            if agent.random is not self.random and agent.random is not random:
+                agent.random.seed(self.random.getrandbits(64))
+
+    def attachProfiler(self, profiler):
+        #Profiling is off unless a Profiler is attached - only one can be active at a time
+        setProfiler(profiler)
+
+    def attachMetrics(self, metrics):
+        #Rows for every agent are written to the MetricsSink after every tick
+        self.metrics = metrics
+
+    def recordMetrics(self, starting, died):
+        #One row for each agent that started the tick, with what happened to it
+        #Events are worked out from what changed since the start of the tick, given as {agent: (points, killer)}, and who died
+        caught = [agent for agent, (points, killer) in starting.items() if killer is None and isinstance(agent.killer, AgentBase)]
+        rows = []
+        for agent, (points, killer) in starting.items():
+            events = []
+            if isinstance(agent, Cat):
+                events.extend("capture:" + victim.niceName for victim in caught if victim.killer is agent)
+            else:
+                events.extend(["pickup"] * (agent.points - points))
+            if agent in died:
+                events.append("death:" + agent.getKillerName())
+
+            rows.append({
+                "tick": self.tick,
+                "agent": agent.niceName,
+                "type": type(agent).__name__,
+                "x": agent.position["x"],
+                "y": agent.position["y"],
+                "energy": agent.energy,
+                "points": agent.points,
+                "explored": agent.getExploredPercentage(self.grid),
+                "agenda": agent.agenda[0].label if len(agent.agenda) > 0 else None,
+                "alive": agent.killer is None,
+                "events": ";".join(events)
+                })
+        self.metrics.write(rows)
+
+    def attachRenderer(self, renderer):
+        #Renderer is drawn after every tick - leave it unattached to run headless
+        self.renderer = renderer
+
+    def setEventDriven(self, enabled=True):
+        #On by default - agents only look around when something new could be seen, and only sort their agenda when it's changed
+        #Agendas are still rebuilt on the same events as before, so games come out exactly the same either way
+        for agent in self.activeAgents:
+            agent.eventDriven = enabled
+
+    def setTwoPhase(self, enabled=True, pool=None):
+        #Two phase ticks have every agent decide against the grid as it was at the start of the tick, then apply the moves in turn
+        #Nothing on the grid changes while deciding, so decisions can be handed to a DecisionPool, which the agents then stay in
+        #Agents decide on the workers' copy of the start of tick grid, so a run comes out the same with or without one
+        #Teammates change the memory they share while deciding, so can't decide at the same time
+        if enabled and pool is not None and len(self.teams) > 0:
+            raise ValueError("agents with team knowledge can't decide on a pool")
+        if self.decisionPool is not None and (pool is not self.decisionPool or not enabled):
+            self.decisionPool.detach()
+        self.twoPhase = enabled
+        if enabled and pool is not None and pool.simulation is not self:
+            pool.attach(self)
+        self.decisionPool = pool if enabled else None
+
+    def decideMoves(self, agents):
+        #Phase one - every agent's intended move, in the same order as the agents
+        def decide(agent):
+            timer = startTimer("decideMove", agent)
+            nextMove = agent.decideMove(self.grid)
+            stopTimer(timer)
+            return nextMove
+
+        if self.decisionPool is None:
+            return [decide(agent) for agent in agents]
+
+        #Agents driven by a policy decide here, since the policy stays in this process
+        moves = self.decisionPool.decide([agent for agent in agents if agent.policy is None])
+        for agent in agents:
+            if agent.policy is not None:
+                self.decisionPool.decideHere(agent)
+                moves[id(agent)] = decide(agent)
+        return [moves[id(agent)] for agent in agents]
+
+    def applyMoves(self, agents, moves):
+        #Phase two - moves are made in agent order, so earlier agents win any conflicts
+        #Each is checked again against the grid as it is now, so agents of a type still can't share a tile
+        #Anything caught by an earlier move this tick doesn't get to make its own
+        for agent, move in zip(agents, moves):
+            if agent.killer is not None:
+                continue
+            if move != [0, 0] and not agent.checkMove(self.grid, agent.position["x"], agent.position["y"], move[0], move[1]):
+                agent.reevaluateNextMove = True
+                move = [0, 0]
+            timer = startTimer("makeMove", agent)
+            agent.makeMove(self.grid, move)
+            stopTimer(timer)
+
+    def step(self):
+        #Advance the game by one tick - returns False once the game is over
+        if not self.running:
+            return False
 
         markedForDeath = []
+        tickTimer = startTimer("tick")
+        for team in self.teams.values():
+            team.tick = self.tick
+        if self.metrics is not None:
+            starting = {agent: (agent.points, agent.killer) for agent in self.activeAgents}
+
+        if self.twoPhase:
+            agents = [agent for agent in self.activeAgents if agent.killer is None]
+            timer = startTimer("decide")
+            moves = self.decideMoves(agents)
+            stopTimer(timer)
+            timer = startTimer("apply")
+            self.applyMoves(agents, moves)
+            stopTimer(timer)
 
         #Make decisions and move forward a turn (increase lifetime stat, decrease energy)
-        for agent in activeAgents:
+        for agent in self.activeAgents:
             #Make sure agent is still alive to act
             if agent.killer is None:
-                agent.assessAgenda(grid)
+                if not self.twoPhase:
+                    timer = startTimer("assessAgenda", agent)
+                    agent.assessAgenda(self.grid)
+                    stopTimer(timer)
                 agent.energy -= 1
                 agent.lifeTime += 1
             #If they ARE dead, mark them as such
@@ -1047,41 +3049,423 @@ def runGame(properties):
 
         #Remove marked agents from environment
         for agent in markedForDeath:
-            agent[0].die(grid, agent[1])
-            activeAgents.remove(agent[0])
-            graveyard.append(agent[0])
+            agent[0].die(self.grid, agent[1])
+            self.activeAgents.remove(agent[0])
+            self.graveyard.append(agent[0])
 
-        #Draw grid
-        screen.fill(GREY)
-        grid.draw(screen)
+        self.tick += 1
 
-        #Update display
-        pygame.display.flip()
-        pygame.display.update()
+        if self.metrics is not None:
+            timer = startTimer("metrics")
+            self.recordMetrics(starting, set(agent[0] for agent in markedForDeath))
+            stopTimer(timer)
+
+        if self.renderer is not None:
+            timer = startTimer("render")
+            self.renderer.draw(self)
+            stopTimer(timer)
+
+        stopTimer(tickTimer)
+        if activeProfiler is not None:
+            activeProfiler.endTick(self.tick)
 
         #Check for end of game - all cats dead or all mice dead means time to stop
+        if self.isOver():
+            self.running = False
+
+        return self.running
+
+    def isOver(self):
         mouseCount = 0
         catCount = 0
-        for agent in activeAgents:
+        for agent in self.activeAgents:
             if isinstance(agent, Mouse):
                 mouseCount += 1
             elif isinstance(agent, Cat):
                 catCount += 1
-            
-        if((mouseCount == 0 and properties["noMice"] > 0) or (catCount == 0 and properties["noCats"] > 0)):
-            running = False
 
-    #End of game report
-    print("\n\nAlive:")
-    for agent in activeAgents:
-        agent.reportStatsCurrent(grid)
-    print("\nDead:")
-    for grave in graveyard:
-        grave.postMortem(grid)
+        return (mouseCount == 0 and self.properties["noMice"] > 0) or (catCount == 0 and self.properties["noCats"] > 0)
+
+    def run(self, maxTicks=None):
+        #Step until the game ends, or until maxTicks have passed if given
+        while self.running and (maxTicks is None or self.tick < maxTicks):
+            self.step()
+        return self.tick
+
+    def getStats(self):
+        #One row per agent, alive or dead
+        return [agent.getStats(self.grid) for agent in self.activeAgents + self.graveyard]
+
+    def report(self):
+        #End of game report
+        print("\n\nAlive:")
+        for agent in self.activeAgents:
+            agent.reportStatsCurrent(self.grid)
+        print("\nDead:")
+        for grave in self.graveyard:
+            grave.postMortem(self.grid)
+
+
+class PygameRenderer:
+    #Draws a simulation into a pygame window - pygame is only imported once one of these is made
+    #Walls and floors are drawn once into a cached background, then each frame only redraws tiles whose occupants changed
+    def __init__(self, grid):
+        import pygame
+
+        #Scale window based on grid size
+        self.screen = pygame.display.set_mode(PygameRenderer.getWindowSize(grid))
+        self.tileProperties = grid.tileProperties
+        self.background = None
+        self.backgroundVersion = None
+        self.lastColours = {}
+        self.lastView = grid
+        self.lastTick = None
+
+    @staticmethod
+    def getWindowSize(grid):
+        screenWidth = (grid.tileProperties["size"] * grid.size["x"]) + (grid.tileProperties["margin"] * (grid.size["x"] + 1))
+        screenHeight = (grid.tileProperties["size"] * grid.size["y"]) + (grid.tileProperties["margin"] * (grid.size["y"] + 1))
+        return (screenWidth, screenHeight)
+
+    def screenToTile(self, pos):
+        #Find the ID of the tile at a point in the window
+        return (pos[0] // (self.tileProperties["size"] + self.tileProperties["margin"]),
+                pos[1] // (self.tileProperties["size"] + self.tileProperties["margin"]))
+
+    def handleEvent(self, event):
+        #Nothing to pan or zoom - returns whether the view changed
+        return False
+
+    def buildBackground(self, grid):
+        import pygame
+
+        self.background = pygame.Surface(self.screen.get_size())
+        self.background.fill(GREY)
+        for y in range(grid.size["y"]):
+            for x in range(grid.size["x"]):
+                pygame.draw.rect(self.background, BLACK if grid.isWall(x, y) else WHITE, grid.getTileRect(x, y))
+        self.backgroundVersion = grid.wallVersion
+
+    def draw(self, simulation):
+        self.drawGrid(simulation.grid)
+
+    def drawGrid(self, grid):
+        #Works from either a live grid or a Snapshot of one
+        import pygame
+
+        colours = grid.getOccupantColours()
+
+        if self.background is None or self.backgroundVersion != grid.wallVersion:
+            #First frame, or the walls have changed - redraw everything
+            self.buildBackground(grid)
+            self.screen.blit(self.background, (0, 0))
+            for tile, colour in colours.items():
+                pygame.draw.rect(self.screen, colour, grid.getTileRect(tile[0], tile[1]))
+            pygame.display.flip()
+        else:
+            #Tiles that were occupied last frame or are occupied now, and look different
+            dirtyRects = []
+            for tile in set(self.lastColours) | set(colours):
+                colour = colours.get(tile)
+                if colour == self.lastColours.get(tile):
+                    continue
+                rect = grid.getTileRect(tile[0], tile[1])
+                self.screen.blit(self.background, rect, rect)
+                if colour is not None:
+                    pygame.draw.rect(self.screen, colour, rect)
+                dirtyRects.append(rect)
+            pygame.display.update(dirtyRects)
+
+        self.lastColours = colours
+        self.lastView = grid
+        self.lastTick = getattr(grid, "tick", None)
+
+
+class ArrayRenderer:
+    #Renderer for grids too big to draw a tile at a time
+    #Each frame colours the tiles in view as one array of palette indices, then scales it onto the window in a single blit
+    #Arrow keys pan and +/- or the mouse wheel zoom
+    def __init__(self, grid, windowSize=None):
+        import pygame
+
+        if windowSize is None:
+            windowSize = ArrayRenderer.getDefaultWindowSize(grid)
+        self.screen = pygame.display.set_mode(windowSize)
+        self.gridSize = grid.size
+        self.palette = np.array([WHITE, BLACK] + list(OCCUPANT_COLOURS.values()), dtype=np.uint8)
+        self.occupantIndices = {kind: i + 2 for i, kind in enumerate(OCCUPANT_COLOURS)}
+
+        #Viewport - top left tile and pixels per tile, starting zoomed to fit the whole grid
+        self.viewX = 0
+        self.viewY = 0
+        self.tilePixels = max(1, min(windowSize[0] // grid.size["x"], windowSize[1] // grid.size["y"]))
+        self.lastView = grid
+        self.lastTick = None
+
+    @staticmethod
+    def getDefaultWindowSize(grid):
+        #Most of the display, or a fixed size if the display can't say how big it is
+        import pygame
+
+        info = pygame.display.Info()
+        if info.current_w > 0 and info.current_h > 0:
+            maxSize = (int(info.current_w * 0.9), int(info.current_h * 0.9))
+        else:
+            maxSize = (1024, 768)
+        return (min(maxSize[0], max(grid.size["x"], 200)), min(maxSize[1], max(grid.size["y"], 200)))
+
+    def getViewSize(self):
+        #Number of tiles across and down the window at the current zoom
+        width, height = self.screen.get_size()
+        return (-(-width // self.tilePixels), -(-height // self.tilePixels))
+
+    def clampView(self):
+        viewWidth, viewHeight = self.getViewSize()
+        self.viewX = max(0, min(self.viewX, self.gridSize["x"] - viewWidth))
+        self.viewY = max(0, min(self.viewY, self.gridSize["y"] - viewHeight))
+
+    def zoom(self, factor):
+        #Zoom about the middle of the window
+        viewWidth, viewHeight = self.getViewSize()
+        centreX = self.viewX + viewWidth // 2
+        centreY = self.viewY + viewHeight // 2
+        self.tilePixels = max(1, min(32, int(self.tilePixels * factor)))
+        viewWidth, viewHeight = self.getViewSize()
+        self.viewX = centreX - viewWidth // 2
+        self.viewY = centreY - viewHeight // 2
+        self.clampView()
+
+    def handleEvent(self, event):
+        #Pan and zoom controls - returns whether the view changed
+        import pygame
+
+        viewWidth, viewHeight = self.getViewSize()
+        if event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN):
+                stepX = max(1, viewWidth // 4)
+                stepY = max(1, viewHeight // 4)
+                if event.key == pygame.K_LEFT:
+                    self.viewX -= stepX
+                elif event.key == pygame.K_RIGHT:
+                    self.viewX += stepX
+                elif event.key == pygame.K_UP:
+                    self.viewY -= stepY
+                else:
+                    self.viewY += stepY
+                self.clampView()
+                return True
+            if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom(2)
+                return True
+            if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom(0.5)
+                return True
+        elif event.type == pygame.MOUSEWHEEL:
+            self.zoom(2 if event.y > 0 else 0.5)
+            return True
+        return False
+
+    def screenToTile(self, pos):
+        #Find the ID of the tile at a point in the window, through the viewport
+        return (self.viewX + pos[0] // self.tilePixels, self.viewY + pos[1] // self.tilePixels)
+
+    def draw(self, simulation):
+        self.drawGrid(simulation.grid)
+
+    def drawGrid(self, grid):
+        #Works from either a live grid or a Snapshot of one
+        import pygame
+
+        #Only tiles inside the window are coloured - walls first, then occupants on top
+        viewWidth, viewHeight = self.getViewSize()
+        left = self.viewX
+        top = self.viewY
+        right = min(grid.size["x"], left + viewWidth)
+        bottom = min(grid.size["y"], top + viewHeight)
+        indices = grid.getWallWindow(left, top, right, bottom).astype(np.uint8)
+
+        xs = []
+        ys = []
+        kinds = []
+        for tile, occupants in grid.occupants.items():
+            if left <= tile[0] < right and top <= tile[1] < bottom:
+                index = self.occupantIndices.get(type(occupants[0]))
+                if index is not None:
+                    xs.append(tile[0] - left)
+                    ys.append(tile[1] - top)
+                    kinds.append(index)
+        if len(kinds) > 0:
+            indices[ys, xs] = kinds
+
+        #surfarray is indexed [x, y], so swap the axes of the [y, x] grid arrays
+        colours = pygame.surfarray.make_surface(self.palette[indices].swapaxes(0, 1))
+        self.screen.fill(GREY)
+        self.screen.blit(pygame.transform.scale(colours, ((right - left) * self.tilePixels, (bottom - top) * self.tilePixels)), (0, 0))
+        pygame.display.flip()
 
-    
+        self.lastView = grid
+        self.lastTick = getattr(grid, "tick", None)
+
+
+class Snapshot:
+    #Copy of what the window needs from the grid at one tick, so it can be drawn while the simulation carries on
+    #The wall array is only copied when the walls have changed since the previous snapshot
+    def __init__(self, simulation, previous=None):
+        grid = simulation.grid
+        self.tick = simulation.tick
+        self.size = grid.size
+        self.getTileRect = grid.getTileRect
+        #Chunked walls are too big to copy, and don't change once generated, so are read from the grid itself
+        self.chunkedGrid = grid if isinstance(grid, ChunkedGrid) else None
+        if self.chunkedGrid is not None:
+            self.walls = None
+        elif previous is not None and previous.wallVersion == grid.wallVersion:
+            self.walls = previous.walls
+        else:
+            self.walls = grid.walls.copy()
+        self.wallVersion = grid.wallVersion
+        self.occupants = {tile: tuple(occupants) for tile, occupants in grid.occupants.items()}
+
+    def isWall(self, x, y):
+        if self.chunkedGrid is not None:
+            return self.chunkedGrid.isWall(x, y)
+        return bool(self.walls[y, x])
+
+    def getWallWindow(self, left, top, right, bottom):
+        if self.chunkedGrid is not None:
+            return self.chunkedGrid.getWallWindow(left, top, right, bottom)
+        return self.walls[top:bottom, left:right]
+
+    def getOccupants(self, x, y):
+        return self.occupants.get((x, y), ())
+
+    def getOccupantColours(self):
+        return getOccupantColours(self.occupants)
+
+
+class SimulationThread(threading.Thread):
+    #Steps a simulation as fast as it can in the background, publishing a snapshot after every tick
+    def __init__(self, simulation):
+        super().__init__(daemon=True)
+        self.simulation = simulation
+        self.snapshot = Snapshot(simulation)
+        self.unpaused = threading.Event()
+        self.unpaused.set()
+        self.parked = threading.Event()
+
+    def run(self):
+        while self.simulation.running:
+            if not self.unpaused.is_set():
+                #Wait between ticks, so the agents can be inspected while nothing is moving
+                self.parked.set()
+                self.unpaused.wait()
+                self.parked.clear()
+                continue
+            self.simulation.step()
+            self.snapshot = Snapshot(self.simulation, self.snapshot)
+        self.parked.set()
+
+    def pause(self):
+        #Returns once the current tick has finished
+        self.unpaused.clear()
+        self.parked.wait()
+
+    def resume(self):
+        self.unpaused.set()
+
+
+def runGame(properties, ticksPerFrame=1, fps=5, threaded=False, arrayRenderer=None, metrics=None):
+    #Each frame advances the simulation ticksPerFrame ticks, then draws - fps of 0 means no frame limit
+    #If threaded, the simulation runs flat out in the background instead, and each frame draws its latest snapshot
+    #Grids whose tiles wouldn't fit on the display are drawn with the ArrayRenderer unless told otherwise
+    import pygame
+
+    simulation = Simulation(properties)
+    simulation.attachMetrics(metrics)
+    if arrayRenderer is None:
+        info = pygame.display.Info()
+        windowSize = PygameRenderer.getWindowSize(simulation.grid)
+        arrayRenderer = info.current_w > 0 and (windowSize[0] > info.current_w or windowSize[1] > info.current_h)
+    if arrayRenderer:
+        renderer = ArrayRenderer(simulation.grid)
+    else:
+        renderer = PygameRenderer(simulation.grid)
+    clock = pygame.time.Clock()
+
+    runner = None
+    if threaded:
+        runner = SimulationThread(simulation)
+        runner.start()
+        
+    #Loop until program is quit
+    while simulation.running or (runner is not None and runner.snapshot.tick != renderer.lastTick):
+        clock.tick(fps) #FPS
+        
+        for event in pygame.event.get():
+            #Quit button is clicked (i.e. red X on window)
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+
+            #When P key is pressed, pause
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                if runner is None:
+                    pause(clock, simulation.grid, renderer=renderer)
+                else:
+                    #Inspect what's on screen, with the simulation held still
+                    runner.pause()
+                    pause(clock, simulation.grid, renderer.lastView, renderer)
+                    runner.resume()
+
+            #Anything else might be panning or zooming
+            else:
+                renderer.handleEvent(event)
+
+        if runner is None:
+            for i in range(ticksPerFrame):
+                if not simulation.step():
+                    break
+            timer = startTimer("render")
+            renderer.draw(simulation)
+            stopTimer(timer)
+        else:
+            #The profiler belongs to the simulation thread, so drawing isn't timed here
+            renderer.drawGrid(runner.snapshot)
+
+    if runner is not None:
+        runner.join()
+    simulation.report()
+
+
+def runHeadless(properties, maxTicks=None, seed=None, twoPhase=False, decisionWorkers=0, metrics=None, resume=None, checkpoint=None):
+    #Run without a window or frame limiter - returns the finished simulation
+    #Agents decide on a pool of decisionWorkers processes if given, which needs two phase ticks
+    #Carries on from the checkpoint file resume if given, and writes one to checkpoint at the end if given
+    if resume is not None:
+        simulation = loadCheckpoint(resume)
+    else:
+        simulation = Simulation(properties, seed)
+    simulation.attachMetrics(metrics)
+    if decisionWorkers > 0:
+        with DecisionPool(decisionWorkers) as pool:
+            simulation.setTwoPhase(True, pool)
+            simulation.run(maxTicks)
+    else:
+        simulation.setTwoPhase(twoPhase or simulation.twoPhase)
+        simulation.run(maxTicks)
+    if checkpoint is not None:
+        simulation.save(checkpoint)
+    return simulation
+
+def pause(clock, grid, view=None, renderer=None):
+    #Clicked tiles are looked up in the view - the grid itself, or the snapshot on screen
+    #Agent stats are still reported against the live grid
+    #Clicks go through the renderer's viewport if there is one, and it can still be panned and zoomed while paused
+    import pygame
+
+    if view is None:
+        view = grid
 
-def pause(clock, grid):
     paused = True
     lastClick = [-1, -1]
 
@@ -1089,7 +3473,6 @@ def pause(clock, grid):
         for event in pygame.event.get():
         #Quit button is clicked (i.e. red X on window)
             if event.type == pygame.QUIT:
-                running = False
                 pygame.quit()
                 sys.exit()
                 
@@ -1097,35 +3480,46 @@ def pause(clock, grid):
                 #P key pressed again - unpause
                 if event.key == pygame.K_p:
                     paused = False
+                elif renderer is not None and renderer.handleEvent(event):
+                    renderer.drawGrid(view)
+
+            elif event.type == pygame.MOUSEWHEEL:
+                if renderer is not None and renderer.handleEvent(event):
+                    renderer.drawGrid(view)
                     
             #Look for mouse clicks - any will work (LMB, RMB, MMB)
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 #Find the ID of the tile being clicked
-                gridX = event.pos[0] // (grid.tileProperties["size"] + grid.tileProperties["margin"])
-                gridY = event.pos[1] // (grid.tileProperties["size"] + grid.tileProperties["margin"])
+                if renderer is not None:
+                    gridX, gridY = renderer.screenToTile(event.pos)
+                else:
+                    gridX = event.pos[0] // (grid.tileProperties["size"] + grid.tileProperties["margin"])
+                    gridY = event.pos[1] // (grid.tileProperties["size"] + grid.tileProperties["margin"])
+                if not grid.inBounds(gridX, gridY):
+                    continue
                 print("Tile: [%i, %i]" % (gridX, gridY))
 
                 #Print information about the tile
-                tile = grid.grid[gridY][gridX]
+                occupants = view.getOccupants(gridX, gridY)
                 #Simple tiles - walls or empty spaces
-                if len(tile.occupant) == 0:
-                    if(tile.isWall):
+                if len(occupants) == 0:
+                    if(view.isWall(gridX, gridY)):
                         print("Wall")
                     else:
                         print("Empty")
                 #Tiles containing agents
                 else:
                     #Pickups don't have much relevant information beyond their name
-                    if(isinstance(tile.occupant[0], Pickup)):
-                        print(tile.occupant[0].niceName)
+                    if(isinstance(occupants[0], Pickup)):
+                        print(occupants[0].niceName)
                     #If agent isn't a pickup, it's a mouse or cat - report relevant stats
                     else:
                         #If clicked once, report regular stats
                         if lastClick != [gridX, gridY]:
-                            tile.occupant[0].reportStatsCurrent(grid)
+                            occupants[0].reportStatsCurrent(grid)
                         #If clicked more than once, print the agent's maps
                         else:
-                            tile.occupant[0].printMaps(grid)
+                            occupants[0].printMaps(grid)
                             #Provide key for user's benefit
                             print("Key:")
                             print("? - Unknown")
@@ -1137,27 +3531,80 @@ def pause(clock, grid):
         pygame.display.update()
         clock.tick(5)
 
+#Default environment - these values can be changed to alter the environment
+DEFAULT_PROPERTIES = {
+    "gridX": 20,
+    "gridY": 20,
+    "wallPercentage": 10,
+    "noCats": 1,
+    "noMice": 3,
+    "noPickups": 3,
+    "catVis": 7.5,
+    "mouseVis": 7.5,
+    "catEnergy": 200,
+    "mouseEnergy": 100,
+    "energyFromPickup": 20,
+    "energyFromMouse": 50,
+    "singleRegion": False,
+    "chunkSize": 0,
+    "teamKnowledge": False,
+    "teamSightingRange": 128
+    }
+
+def getArgValue(name, default, cast):
+    #Value following a command line flag, or the default if the flag isn't given
+    if name in sys.argv:
+        return cast(sys.argv[sys.argv.index(name) + 1])
+    return default
+
 def main():
-    #Initialise pygame
-    pygame.init()
-
-    #Run the game - these values can be changed to alter the environment
-    properties = {
-        "gridX": 20,
-        "gridY": 20,
-        "wallPercentage": 10,
-        "noCats": 1,
-        "noMice": 3,
-        "noPickups": 3,
-        "catVis": 7.5,
-        "mouseVis": 7.5,
-        "catEnergy": 200,
-        "mouseEnergy": 100,
-        "energyFromPickup": 20,
-        "energyFromMouse": 50
-        }
-    runGame(properties)
-    pygame.quit()
-    input("")
-        
-main()
+    #Run the game - change DEFAULT_PROPERTIES to alter the environment
+    properties = dict(DEFAULT_PROPERTIES)
+
+    #Pass --profile followed by a file name to time each part of the tick
+    #Writes name.json with totals per section and per tick, and name.folded for flamegraphs
+    profiler = None
+    if "--profile" in sys.argv:
+        profileName = sys.argv[sys.argv.index("--profile") + 1]
+        profiler = Profiler()
+        setProfiler(profiler)
+
+    #Pass --metrics followed by a .jsonl, .csv or .parquet file to record every agent's state and events each tick
+    metrics = None
+    if "--metrics" in sys.argv:
+        metrics = MetricsSink(sys.argv[sys.argv.index("--metrics") + 1])
+
+    #Pass --headless to run without a window, optionally followed by a tick limit
+    #The profile and metrics are still written if the window is closed mid-game
+    try:
+        if "--headless" in sys.argv:
+            argIndex = sys.argv.index("--headless") + 1
+            maxTicks = int(sys.argv[argIndex]) if argIndex < len(sys.argv) and sys.argv[argIndex].isdigit() else None
+            #--two-phase has agents decide together then move in turn, --decision-workers N also decides on N processes
+            #--checkpoint FILE saves the game when the run stops, --resume FILE carries on from a saved game
+            runHeadless(properties, maxTicks, twoPhase="--two-phase" in sys.argv,
+                        decisionWorkers=getArgValue("--decision-workers", 0, int), metrics=metrics,
+                        resume=getArgValue("--resume", None, str), checkpoint=getArgValue("--checkpoint", None, str)).report()
+        else:
+            #--ticks-per-frame N runs N ticks between frames, --fps sets the frame rate (0 for no limit)
+            #--threaded runs the simulation flat out in the background, with the window drawing snapshots
+            #--array-renderer draws with the pan and zoom renderer even if the grid would fit on screen
+            import pygame
+            pygame.init()
+
+            runGame(properties, getArgValue("--ticks-per-frame", 1, int), getArgValue("--fps", 5, int), "--threaded" in sys.argv,
+                    True if "--array-renderer" in sys.argv else None, metrics)
+            pygame.quit()
+    finally:
+        if metrics is not None:
+            metrics.close()
+        if profiler is not None:
+            profiler.report()
+            profiler.writeJson(profileName + ".json")
+            profiler.writeFolded(profileName + ".folded")
+
+    if "--headless" not in sys.argv:
+        input("")
+
+if __name__ == "__main__":
+    main()
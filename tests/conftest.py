@@ -0,0 +1,5 @@
+#Tests import the modules from the repository root, the same way the scripts there do
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,76 @@
+#Shared set up for the tests
+import random
+from collections import deque
+
+import final
+
+def makeGrid(size, wallPercentage, seed):
+    random.seed(seed)
+    grid = final.Grid(size, size, wallPercentage)
+    grid.generate()
+    return grid
+
+def openTiles(grid):
+    return [(x, y) for y in range(grid.size["y"]) for x in range(grid.size["x"]) if not grid.isWall(x, y)]
+
+def bfsDistances(grid, start):
+    #Plain breadth first search through open tiles - the reference the faster searches are checked against
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        tile = queue.popleft()
+        for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+            neighbour = (tile[0] + dx, tile[1] + dy)
+            if neighbour not in distances and not grid.isBlocked(neighbour[0], neighbour[1]):
+                distances[neighbour] = distances[tile] + 1
+                queue.append(neighbour)
+    return distances
+
+def followPath(grid, start, path):
+    #Walks a list of directions, checking every step is a single move onto an open tile
+    x, y = start
+    for move in path:
+        assert abs(move[0]) + abs(move[1]) == 1
+        x += move[0]
+        y += move[1]
+        assert not grid.isBlocked(x, y)
+    return (x, y)
+
+def placeMouse(grid, tile):
+    #Mouse given the whole grid, so its searches see every wall
+    mouse = final.Mouse(10 ** 9, 7.5, 20)
+    mouse.placeMe(grid, tile[0], tile[1])
+    mouse.instantLearnGrid(grid)
+    return mouse
+
+def pursuer(grid, x, y, visionRange=10, team=None):
+    cat = final.Cat(10 ** 9, visionRange)
+    if team is not None:
+        cat.joinTeam(team)
+    cat.placeMe(grid, x, y)
+    return cat
+
+def moveTo(grid, agent, tile):
+    grid.removeOccupant(agent.position["x"], agent.position["y"], agent)
+    agent.position = {"x": tile[0], "y": tile[1]}
+    grid.addOccupant(tile[0], tile[1], agent)
+
+def properties(**changes):
+    settings = dict(final.DEFAULT_PROPERTIES)
+    settings.update(changes)
+    return settings
+
+def gameState(simulation):
+    #Everything that says how a game went, for comparing runs
+    return [(agent.niceName, agent.position["x"], agent.position["y"], agent.energy, agent.points, agent.lifeTime,
+             agent.getKillerName(), agent.memGrid.countUnknown(), [task.label for task in agent.agenda])
+            for agent in simulation.activeAgents + simulation.graveyard] + [simulation.tick]
+
+def playTicks(simulation, ticks, record=gameState):
+    #What record makes of the game after every tick, until it ends or the ticks run out
+    states = []
+    for i in range(ticks):
+        if not simulation.step():
+            break
+        states.append(record(simulation))
+    return states
@@ -0,0 +1,21 @@
+import random
+
+import pytest
+
+import benchmark
+
+@pytest.mark.parametrize("name", list(benchmark.CASES))
+@pytest.mark.parametrize("size, walls", [(20, 0), (20, 30), (100, 10)])
+def test_cases_run(name, size, walls):
+    op = benchmark.CASES[name](size, walls, random.Random(size + walls))
+    for i in range(5):
+        op()
+
+@pytest.mark.parametrize("size", [20, 100, 250])
+@pytest.mark.parametrize("walls", benchmark.WALL_PERCENTAGES)
+def test_explore_always_has_a_frontier(size, walls):
+    random.seed(size + walls)
+    op = benchmark.caseExplore(size, walls, random.Random(size + walls))
+    #Explore's op asserts that it found a target
+    for i in range(benchmark.POSITION_COUNT):
+        op()
@@ -0,0 +1,70 @@
+import pytest
+
+import env
+import final
+from helpers import properties, gameState, playTicks
+
+SETTINGS = properties(gridX=30, gridY=30, noMice=4, noCats=2, noPickups=5)
+
+@pytest.mark.parametrize("settings", [SETTINGS, properties(gridX=300, gridY=300, chunkSize=16, noPickups=20),
+                                      properties(gridX=30, gridY=30, teamKnowledge=True)])
+def test_loaded_game_carries_on_the_same(tmp_path, settings):
+    simulation = final.Simulation(settings, 6)
+    simulation.run(20)
+    path = str(tmp_path / "game.bin")
+    simulation.save(path)
+    loaded = final.loadCheckpoint(path)
+    assert loaded.tick == 20
+    #Stepped side by side, so nothing outside each game's own generator can line them up
+    for i in range(150):
+        simulation.step()
+        loaded.step()
+        assert gameState(loaded) == gameState(simulation)
+
+def test_loading_twice_gives_the_same_game(tmp_path):
+    simulation = final.Simulation(SETTINGS, 7)
+    simulation.setTwoPhase(True)
+    simulation.run(10)
+    path = str(tmp_path / "game.bin")
+    simulation.save(path)
+    assert playTicks(final.loadCheckpoint(path), 100) == playTicks(final.loadCheckpoint(path, mmap=False), 100)
+
+def test_forks_are_independent_and_repeatable():
+    simulation = final.Simulation(SETTINGS, 8)
+    simulation.run(15)
+    forks = simulation.fork(3)
+    again = simulation.fork(3)
+    runs = [playTicks(fork, 120) for fork in forks]
+    assert runs == [playTicks(fork, 120) for fork in again]
+    assert runs[0] != runs[1] and runs[1] != runs[2]
+
+def test_forking_leaves_the_game_alone():
+    forked = final.Simulation(SETTINGS, 9)
+    forked.run(15)
+    forked.fork(2)
+    plain = final.Simulation(SETTINGS, 9)
+    plain.run(15)
+    assert playTicks(forked, 120) == playTicks(plain, 120)
+
+def test_games_dont_share_random_numbers():
+    first = final.Simulation(SETTINGS, 3)
+    second = final.Simulation(SETTINGS, 3)
+    #One game running on its own mustn't change the other
+    first.run(50)
+    assert playTicks(first, 100) == playTicks(second, 150)[50:]
+
+def test_policies_are_left_out(tmp_path):
+    agentEnv = env.AgentEnv(properties(gridX=20, gridY=20), seed=0)
+    agentEnv.reset()
+    path = str(tmp_path / "env.bin")
+    agentEnv.simulation.save(path)
+    loaded = final.loadCheckpoint(path)
+    agent = [agent for agent in loaded.activeAgents if agent.niceName == agentEnv.agent.niceName][0]
+    assert agent.policy is None
+    assert agentEnv.agent.policy is not None
+
+def test_checkpoint_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a checkpoint at all")
+    with pytest.raises(ValueError):
+        final.loadCheckpoint(str(path))
@@ -0,0 +1,50 @@
+import final
+from helpers import properties, gameState
+
+def test_chunks_come_from_the_seed_alone():
+    first = final.ChunkedGrid(500, 500, 20, seed=7, chunkSize=16)
+    second = final.ChunkedGrid(500, 500, 20, seed=7, chunkSize=16)
+    #Read in different orders
+    a = first.getWallWindow(100, 100, 180, 140)
+    second.isWall(499, 499)
+    b = second.getWallWindow(100, 100, 180, 140)
+    assert (a == b).all()
+    other = final.ChunkedGrid(500, 500, 20, seed=8, chunkSize=16)
+    assert not (other.getWallWindow(100, 100, 180, 140) == a).all()
+
+def test_window_matches_single_tiles():
+    grid = final.ChunkedGrid(100, 100, 30, seed=1, chunkSize=8)
+    window = grid.getWallWindow(3, 5, 41, 30)
+    for y in range(5, 30):
+        for x in range(3, 41):
+            assert window[y - 5, x - 3] == grid.isWall(x, y)
+    assert grid.isBlocked(-1, 0) and grid.isBlocked(0, 100)
+
+def test_only_touched_chunks_are_made():
+    grid = final.ChunkedGrid(10 ** 6, 10 ** 6, 10, seed=0, chunkSize=32)
+    grid.isWall(500000, 500000)
+    grid.getWallWindow(0, 0, 40, 10)
+    assert len(grid.chunks) == 3
+
+def test_memory_only_stores_seen_chunks():
+    grid = final.ChunkedGrid(1000, 1000, 20, seed=3, chunkSize=16)
+    memory = grid.createMemory()
+    assert memory.isUnknown(500, 500)
+    memory.reveal(500, 500, grid.isWall(500, 500))
+    assert not memory.isUnknown(500, 500)
+    assert memory.isWall(500, 500) == grid.isWall(500, 500)
+    assert len(memory.chunks) == 1
+    assert memory.countUnknown() == 1000 * 1000 - 1
+    unknown, walls = memory.getMemoryWindow(490, 490, 510, 510)
+    assert unknown.sum() == 20 * 20 - 1
+    assert len(memory.chunks) == 1
+
+def test_chunked_games_repeat():
+    settings = properties(gridX=2000, gridY=2000, chunkSize=32, noPickups=200)
+    runs = []
+    for i in range(2):
+        simulation = final.Simulation(settings, 5)
+        simulation.run(60)
+        runs.append(gameState(simulation))
+        assert len(simulation.grid.chunks) < (2000 // 32) ** 2
+    assert runs[0] == runs[1]
@@ -0,0 +1,109 @@
+#Incremental region labels in memory, checked against labelling the whole grid again from scratch
+import random
+
+import numpy as np
+
+import final
+
+def canonical(labels):
+    #Relabel each region by its first tile, so two labellings of the same regions compare equal
+    flat = labels.ravel()
+    first = {}
+    for index, label in enumerate(flat.tolist()):
+        if label >= 0 and label not in first:
+            first[label] = index
+    return np.array([first[label] if label >= 0 else -1 for label in flat.tolist()]).reshape(labels.shape)
+
+def frontierCounts(memGrid, labels):
+    #Frontier tiles per region, keyed by the region's first tile
+    counts = {}
+    for x, y in memGrid.frontier:
+        key = int(labels[y, x])
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def checkAgainstRelabel(memGrid):
+    incremental = canonical(memGrid.getComponents())
+    incrementalFrontier = {}
+    for label, count in memGrid.componentFrontier.items():
+        if count:
+            tiles = np.argwhere(memGrid.componentLabels == label)
+            incrementalFrontier[int(incremental[tiles[0][0], tiles[0][1]])] = count
+
+    memGrid.componentLabels = None
+    relabelled = canonical(memGrid.getComponents())
+    assert (incremental == relabelled).all()
+    assert incrementalFrontier == frontierCounts(memGrid, relabelled)
+
+def blankMemory(size):
+    memGrid = final.MemGrid(size, size, 0)
+    memGrid.generate(final.Grid(size, size, 0))
+    memGrid.getComponents()
+    return memGrid
+
+def test_random_walls_match_a_relabel():
+    for seed in range(20):
+        rng = random.Random(seed)
+        size = rng.randint(3, 14)
+        memGrid = blankMemory(size)
+        for i in range(size * size // 2):
+            x = rng.randrange(size)
+            y = rng.randrange(size)
+            memGrid.reveal(x, y, rng.random() < 0.45)
+            if i % 5 == 0:
+                checkAgainstRelabel(memGrid)
+        checkAgainstRelabel(memGrid)
+
+def test_wall_that_splits_a_region_in_two():
+    memGrid = blankMemory(9)
+    for y in range(9):
+        if y != 4:
+            memGrid.reveal(4, y, True)
+    assert memGrid.getComponents().max() == 0
+    checkAgainstRelabel(memGrid)
+    memGrid.reveal(4, 4, True)
+    labels = memGrid.getComponents()
+    assert labels[0, 0] != labels[0, 8]
+    checkAgainstRelabel(memGrid)
+
+def test_wall_that_splits_a_region_in_four():
+    memGrid = blankMemory(9)
+    for i in range(9):
+        if i != 4:
+            memGrid.reveal(4, i, True)
+            memGrid.reveal(i, 4, True)
+    memGrid.reveal(4, 4, True)
+    labels = memGrid.getComponents()
+    assert len({labels[0, 0], labels[0, 8], labels[8, 0], labels[8, 8]}) == 4
+    checkAgainstRelabel(memGrid)
+
+def test_walls_on_the_edge_of_a_region():
+    memGrid = blankMemory(8)
+    #Walls along the border and around the corner never cut anything off
+    for x in range(8):
+        memGrid.reveal(x, 0, True)
+        checkAgainstRelabel(memGrid)
+    for y in range(1, 8):
+        memGrid.reveal(7, y, True)
+        checkAgainstRelabel(memGrid)
+    assert memGrid.getComponents().max() == 0
+    #Cutting off the corner tile leaves it a region of its own
+    memGrid.reveal(0, 6, True)
+    memGrid.reveal(1, 7, True)
+    labels = memGrid.getComponents()
+    assert labels[7, 0] != labels[3, 3]
+    checkAgainstRelabel(memGrid)
+
+def test_walls_seen_during_games_match_a_relabel():
+    settings = dict(final.DEFAULT_PROPERTIES)
+    settings.update(gridX=25, gridY=25, wallPercentage=35)
+    simulation = final.Simulation(settings, 2)
+    for agent in simulation.activeAgents:
+        agent.memGrid.getComponents()
+    for i in range(40):
+        simulation.step()
+        for agent in simulation.activeAgents:
+            if agent.memGrid.componentLabels is not None:
+                labels = agent.memGrid.componentLabels.copy()
+                checkAgainstRelabel(agent.memGrid)
+                agent.memGrid.setComponentLabels(labels, agent.memGrid.componentCount)
@@ -0,0 +1,50 @@
+import numpy as np
+
+import env
+import final
+from helpers import properties
+
+def test_observation_matches_memory():
+    agentEnv = env.AgentEnv(properties(gridX=20, gridY=20), agentType=final.Mouse, seed=0)
+    observation = agentEnv.reset()
+    assert observation.shape == agentEnv.observationShape
+    agent = agentEnv.agent
+    radius = agentEnv.viewRadius
+    known = observation[env.CHANNELS.index("known")]
+    walls = observation[env.CHANNELS.index("wall")]
+    for row in range(2 * radius + 1):
+        for column in range(2 * radius + 1):
+            x = agent.position["x"] + column - radius
+            y = agent.position["y"] + row - radius
+            if agent.memGrid.isBlocked(x, y) and not (0 <= x < 20 and 0 <= y < 20):
+                assert known[row, column] and walls[row, column]
+            elif 0 <= x < 20 and 0 <= y < 20:
+                assert known[row, column] == (not agent.memGrid.isUnknown(x, y))
+                assert walls[row, column] == agent.memGrid.isWall(x, y)
+
+def test_agent_that_knows_the_grid_can_observe():
+    agentEnv = env.AgentEnv(properties(gridX=20, gridY=20), agentType=final.Cat, seed=1)
+    agentEnv.reset()
+    agentEnv.agent.instantLearnGrid(agentEnv.simulation.grid)
+    observation = agentEnv.observe()
+    radius = agentEnv.viewRadius
+    x = agentEnv.agent.position["x"]
+    y = agentEnv.agent.position["y"]
+    assert observation[env.CHANNELS.index("known")].all()
+    window = agentEnv.simulation.grid.walls[max(y - radius, 0):y + radius + 1, max(x - radius, 0):x + radius + 1]
+    assert observation[env.CHANNELS.index("wall")].sum() >= window.sum()
+    observation, reward, done, info = agentEnv.step(0)
+    assert observation[env.CHANNELS.index("known")].all()
+
+def test_episodes_repeat_for_a_seed():
+    def play(seed):
+        agentEnv = env.AgentEnv(properties(gridX=20, gridY=20), seed=seed, maxTicks=60)
+        observations = [agentEnv.reset().copy()]
+        done = False
+        action = 0
+        while not done:
+            observation, reward, done, info = agentEnv.step(action % 4)
+            observations.append(observation.copy())
+            action += 1
+        return np.array(observations)
+    assert (play(3) == play(3)).all()
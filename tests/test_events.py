@@ -0,0 +1,71 @@
+#Event driven agents only look around and sort their agenda when something could have changed - games must come out the same
+import final
+from helpers import properties, gameState, playTicks
+
+def withSight(simulation):
+    return gameState(simulation), [sorted(agent.visibleTiles) for agent in simulation.activeAgents]
+
+def eventDrivenGame(settings, seed, eventDriven):
+    simulation = final.Simulation(settings, seed)
+    simulation.setEventDriven(eventDriven)
+    return simulation
+
+def checkSame(settings, seeds):
+    for seed in seeds:
+        assert playTicks(eventDrivenGame(settings, seed, True), 250, withSight) == playTicks(eventDrivenGame(settings, seed, False), 250, withSight)
+
+def test_event_driven_games_match():
+    checkSame(properties(gridX=30, gridY=30, noMice=5, noCats=2, noPickups=5), range(3))
+
+def test_event_driven_games_match_when_agents_go_hungry():
+    #Little energy and few pickups, so agents cross into dire mode and back
+    checkSame(properties(gridX=25, gridY=25, mouseEnergy=30, catEnergy=30, noPickups=2), range(3))
+
+def test_event_driven_team_games_match():
+    checkSame(properties(gridX=30, gridY=30, noMice=5, noCats=2, teamKnowledge=True), range(2))
+
+def test_agents_idle_without_looking():
+    #A mouse walled in on its own can't move or see anything new, so it stops looking once it's seen its cell
+    grid = final.Grid(9, 9, 0)
+    for x, y in ((1, 0), (0, 1), (2, 1), (1, 2)):
+        grid.setWall(x, y, True)
+    mouse = final.Mouse(10 ** 9, 7.5, 20)
+    mouse.placeMe(grid, 1, 1)
+    profiler = final.Profiler()
+    final.setProfiler(profiler)
+    try:
+        for i in range(20):
+            mouse.assessAgenda(grid)
+    finally:
+        final.setProfiler(None)
+    assert profiler.counters["Mouse.vision.skipped"] == 19
+    assert (1, 1) in mouse.visibleTiles
+
+    #Something coming into range has it look again
+    final.Cat(10 ** 9, 10).placeMe(grid, 5, 5)
+    final.setProfiler(profiler)
+    try:
+        mouse.assessAgenda(grid)
+    finally:
+        final.setProfiler(None)
+    assert profiler.counters["Mouse.vision.skipped"] == 19
+
+def test_agents_walk_known_ground_without_looking():
+    #A mouse that already knows the whole grid, with nothing else on it, has nothing new to see wherever it wanders
+    grid = final.Grid(15, 15, 0)
+    mouse = final.Mouse(10 ** 9, 5, 20)
+    mouse.placeMe(grid, 7, 7)
+    mouse.instantLearnGrid(grid)
+    profiler = final.Profiler()
+    final.setProfiler(profiler)
+    try:
+        for i in range(20):
+            mouse.assessAgenda(grid)
+    finally:
+        final.setProfiler(None)
+    assert profiler.counters["Mouse.vision.skipped"] == 19
+    assert mouse.lookedFrom[:2] != (mouse.position["x"], mouse.position["y"])
+
+    #Tiles in sight are still those of the last tick decided on
+    mouse.decideMove(grid)
+    assert mouse.visibleTiles == mouse.getVisibleTiles(grid)
@@ -0,0 +1,115 @@
+import final
+from helpers import makeGrid, openTiles, bfsDistances, followPath, pursuer, moveTo
+
+def walk(grid, cat, target):
+    #Follows the field from the cat's tile to the target, counting the steps
+    steps = 0
+    field = cat.memGrid.getFlowField(target[0], target[1])
+    while (cat.position["x"], cat.position["y"]) != target:
+        move = field.getDirection(cat)
+        moveTo(grid, cat, followPath(grid, (cat.position["x"], cat.position["y"]), [move]))
+        steps += 1
+    return steps
+
+def countBuilds(memories, target, reach=None):
+    profiler = final.Profiler()
+    final.setProfiler(profiler)
+    try:
+        fields = [memory.getFlowField(target[0], target[1], reach) for memory in memories]
+    finally:
+        final.setProfiler(None)
+    return profiler.counters.get("flowField.built", 0), fields
+
+def test_pursuers_sharing_a_memory_share_a_search():
+    grid = makeGrid(30, 20, 0)
+    tiles = openTiles(grid)
+    target = tiles[len(tiles) // 2]
+    team = final.Team(grid, 128)
+    first = pursuer(grid, *tiles[0], team=team)
+    second = pursuer(grid, *tiles[-1], team=team)
+    built, fields = countBuilds([first.memGrid, second.memGrid, first.memGrid], target)
+    assert built == 1
+    assert fields[0] is fields[1] is fields[2]
+
+    #Without a reach, a field searches the whole memory, so memories of their own can't share one
+    loner = pursuer(grid, *tiles[1])
+    built, fields = countBuilds([loner.memGrid, first.memGrid], target)
+    assert built == 1
+    assert fields[0] is not fields[1]
+
+def test_separate_memories_share_fields_within_reach():
+    grid = makeGrid(30, 20, 0)
+    tiles = openTiles(grid)
+    target = tiles[len(tiles) // 2]
+    around = [(target[0] + dx, target[1] + dy) for dx in range(-4, 5) for dy in range(-4, 5)]
+    assert any(grid.isWall(x, y) for x, y in around)
+    cats = [pursuer(grid, *tile) for tile in tiles[:3]]
+    #Two cats have seen the same tiles round the target, and the third hasn't seen any of the walls there
+    for cat in cats[:2]:
+        for x, y in around:
+            cat.memGrid.reveal(x, y, grid.isWall(x, y))
+    built, fields = countBuilds([cat.memGrid for cat in cats], target, 6)
+    assert built == 2
+    assert fields[0] is fields[1]
+    assert fields[2] is not fields[0]
+
+    #The field keeps its own copy of the walls, so what the cat that built it learns afterwards doesn't change it
+    distances = {tile: fields[0].getDistance(*tile) for tile in tiles}
+    for y in range(grid.size["y"]):
+        for x in range(grid.size["x"]):
+            cats[0].memGrid.reveal(x, y, grid.isWall(x, y))
+    assert cats[1].memGrid.getFlowField(target[0], target[1], 6) is fields[0]
+    assert {tile: fields[0].getDistance(*tile) for tile in tiles} == distances
+    assert cats[0].memGrid.getFlowField(target[0], target[1], 6) is not fields[0]
+
+def test_fields_give_shortest_routes():
+    grid = makeGrid(25, 25, 3)
+    tiles = openTiles(grid)
+    target = tiles[7]
+    distances = bfsDistances(grid, target)
+    for start in tiles[-40::5]:
+        if start in distances and start != target:
+            cat = pursuer(grid, *start, visionRange=100)
+            cat.instantLearnGrid(grid)
+            assert walk(grid, cat, target) == distances[start]
+            grid.removeOccupant(target[0], target[1], cat)
+
+def test_fields_only_avoid_walls_in_memory():
+    grid = makeGrid(12, 0, 0)
+    grid.setWall(5, 0, True)
+    cat = pursuer(grid, 0, 0)
+    #The wall hasn't been seen, so the field goes straight through it
+    field = cat.memGrid.getFlowField(11, 0)
+    assert field.getDistance(0, 0) == 11
+
+    #Open tiles were already open in memory, so seeing them keeps the field
+    cat.memGrid.reveal(4, 0, False)
+    assert cat.memGrid.getFlowField(11, 0) is field
+
+    cat.memGrid.reveal(5, 0, True)
+    newField = cat.memGrid.getFlowField(11, 0)
+    assert newField is not field
+    assert newField.getDistance(0, 0) == 13
+    assert len(cat.memGrid.flowFields) == 1
+    assert len(grid.flowFields) == 0
+
+def test_walled_in_pursuer_gives_up():
+    #Shut in on every side with a pickup on the diagonal - memory can't rule the pickup out, but the field mustn't search the world for it
+    grid = final.ChunkedGrid(10 ** 5, 10 ** 5, 0, seed=0, chunkSize=64)
+    x, y = 50000, 50000
+    for move in ([0, 1], [1, 0], [0, -1], [-1, 0]):
+        grid.setWall(x + move[0], y + move[1], True)
+    mouse = final.Mouse(100, 5, 10)
+    mouse.placeMe(grid, x, y)
+    pickup = final.Pickup(10)
+    pickup.position = {"x": x + 1, "y": y + 1}
+    grid.addOccupant(x + 1, y + 1, pickup)
+
+    mouse.assessAgenda(grid)
+    assert mouse.position == {"x": x, "y": y}
+    reach = 5 * final.FLOW_FIELD_REACH
+    assert len(grid.memoryFlowFields) == 1
+    field = mouse.memGrid.getFlowField(x + 1, y + 1, reach)
+    assert field in grid.memoryFlowFields.values()
+    assert 0 < len(field.distances) <= (2 * reach + 1) ** 2
+    assert len(mouse.memGrid.chunks) < 10
@@ -0,0 +1,140 @@
+import random
+
+import numpy as np
+import pytest
+
+import final
+from helpers import makeGrid, openTiles, bfsDistances, properties
+
+def freeTilesOf(grid):
+    return {(index % grid.size["x"], index // grid.size["x"]) for index in grid.freeTiles[:grid.freeCount]}
+
+def test_free_index_follows_walls_and_occupants():
+    grid = makeGrid(20, 20, 0)
+    grid.getRandomFreeTile()
+    pickups = []
+    rng = random.Random(1)
+    for step in range(300):
+        x = rng.randrange(20)
+        y = rng.randrange(20)
+        action = rng.random()
+        if action < 0.3:
+            grid.setWall(x, y, not grid.isWall(x, y))
+        elif action < 0.7:
+            pickup = final.Pickup(20)
+            if pickup.placeMe(grid):
+                pickups.append(pickup)
+        elif pickups:
+            pickup = pickups.pop(rng.randrange(len(pickups)))
+            grid.removeOccupant(pickup.position["x"], pickup.position["y"], pickup)
+
+        expected = {tile for tile in openTiles(grid) if tile not in grid.occupants}
+        assert freeTilesOf(grid) == expected
+
+def test_full_grid_has_no_free_tile():
+    grid = final.Grid(3, 3, 0)
+    for i in range(9):
+        assert final.Pickup(20).placeMe(grid)
+    assert grid.getRandomFreeTile() is None
+    assert not final.Pickup(20).placeMe(grid)
+
+def test_entity_radius_queries_match_a_full_scan():
+    grid = makeGrid(40, 10, 0)
+    pickups = [final.Pickup(20) for i in range(60)]
+    for pickup in pickups:
+        pickup.placeMe(grid)
+    for x, y, radius in ((0, 0, 5), (20, 20, 7.5), (39, 10, 12), (5, 35, 0)):
+        found = grid.getEntitiesInRadius(x, y, radius)
+        expected = [p for p in pickups if (p.position["x"] - x) ** 2 + (p.position["y"] - y) ** 2 <= radius ** 2]
+        assert sorted(map(id, found)) == sorted(map(id, expected))
+
+def placedPickups(count):
+    grid = makeGrid(40, 10, 1)
+    pickups = [final.Pickup(20) for i in range(count)]
+    for pickup in pickups:
+        pickup.placeMe(grid)
+    return grid, pickups
+
+def distanceOrder(pickups, x, y):
+    return sorted((p.position["x"] - x) ** 2 + (p.position["y"] - y) ** 2 for p in pickups)
+
+def distancesOf(found, x, y):
+    return [(p.position["x"] - x) ** 2 + (p.position["y"] - y) ** 2 for p in found]
+
+def test_nearest_entities_with_no_count():
+    grid, pickups = placedPickups(10)
+    assert grid.getNearestEntities(3, 3, count=0) == []
+    assert grid.getNearestEntities(3, 3, count=-2) == []
+
+def test_nearest_entities_with_more_asked_than_exist():
+    grid, pickups = placedPickups(7)
+    found = grid.getNearestEntities(20, 20, count=50)
+    assert sorted(map(id, found)) == sorted(map(id, pickups))
+    assert distancesOf(found, 20, 20) == distanceOrder(pickups, 20, 20)
+
+def test_nearest_entities_nearest_first():
+    grid, pickups = placedPickups(40)
+    for x, y in ((0, 0), (39, 39), (17, 4)):
+        found = grid.getNearestEntities(x, y, count=5)
+        assert distancesOf(found, x, y) == distanceOrder(pickups, x, y)[:5]
+
+def test_nearest_entities_within_max_radius():
+    grid, pickups = placedPickups(40)
+    for radius in (0, 3, 6.5, 30):
+        found = grid.getNearestEntities(20, 20, count=100, maxRadius=radius)
+        expected = [d for d in distanceOrder(pickups, 20, 20) if d <= radius * radius]
+        assert distancesOf(found, 20, 20) == expected
+        everything = grid.getNearestEntities(20, 20, count=None, maxRadius=radius)
+        assert distancesOf(everything, 20, 20) == expected
+
+def test_dead_agents_leave_the_entity_index():
+    simulation = final.Simulation(properties(gridX=20, gridY=20, noMice=4, noCats=2, mouseEnergy=15, catEnergy=15), 0)
+    simulation.run(None)
+    assert simulation.graveyard
+    for agent in simulation.graveyard:
+        assert agent not in simulation.grid.getOccupants(agent.position["x"], agent.position["y"])
+        assert agent not in simulation.grid.getNearestEntities(agent.position["x"], agent.position["y"], type(agent), 100)
+    starved = [agent for agent in simulation.graveyard if agent.killer == "Starvation"]
+    assert starved
+
+def test_components_match_a_flood_fill():
+    for seed in range(4):
+        grid = makeGrid(30, 40, seed)
+        labels = grid.getComponents()
+        tiles = openTiles(grid)
+        start = tiles[0]
+        reached = bfsDistances(grid, start)
+        for tile in tiles:
+            assert (labels[tile[1], tile[0]] == labels[start[1], start[0]]) == (tile in reached)
+            assert grid.isReachable(start, tile) == (tile in reached)
+        assert (labels[grid.walls] == -1).all()
+
+def test_fill_pockets_leaves_one_region():
+    grid = makeGrid(30, 35, 0)
+    openBefore = len(openTiles(grid))
+    grid.fillPockets()
+    assert grid.getComponents().max() == 0
+    assert 0 < len(openTiles(grid)) <= openBefore
+
+def test_wall_generation_matches_the_seeded_odds():
+    grid = makeGrid(100, 30, 0)
+    assert grid.walls.dtype == np.bool_
+    assert 0.27 < grid.walls.mean() < 0.33
+
+def test_tile_view_is_read_only():
+    grid = makeGrid(10, 0, 0)
+    mouse = object()
+    assert grid.grid[2][3].occupant == ()
+    with pytest.raises(AttributeError):
+        grid.grid[2][3].occupant.append(mouse)
+    grid.grid[2][3].addOccupant(mouse)
+    assert grid.grid[2][3].occupant == (mouse,)
+    assert grid.getOccupants(3, 2) == [mouse]
+    grid.grid[2][3].removeOccupant(mouse)
+    assert grid.grid[2][3].occupant == ()
+
+def test_generate_matches_one_draw_per_tile():
+    grid = makeGrid(17, 30, 9)
+    random.seed(9)
+    expected = [[random.randint(1, 100) <= 30 for x in range(17)] for y in range(17)]
+    assert grid.walls.tolist() == expected
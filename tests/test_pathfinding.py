@@ -0,0 +1,42 @@
+import final
+from helpers import makeGrid, openTiles, bfsDistances, followPath, placeMouse
+
+def test_aStar_finds_shortest_paths():
+    for seed in range(5):
+        grid = makeGrid(30, 25, seed)
+        tiles = openTiles(grid)
+        start = tiles[0]
+        mouse = placeMouse(grid, start)
+        distances = bfsDistances(grid, start)
+        for target in tiles[::17]:
+            path = mouse.aStar(list(target))
+            if target not in distances:
+                assert path is None
+            else:
+                assert len(path) == distances[target]
+                assert followPath(grid, start, path) == target
+
+def test_aStar_rejects_walls_and_cut_off_targets():
+    grid = final.Grid(7, 7, 0)
+    for y in range(7):
+        grid.setWall(3, y, True)
+    mouse = placeMouse(grid, (0, 0))
+    assert mouse.aStar([3, 3]) is None
+    assert mouse.aStar([5, 5]) is None
+    assert len(mouse.aStar([2, 6])) == 8
+
+def test_explore_moves_on_when_its_target_is_reached():
+    grid = final.Grid(9, 9, 0)
+    mouse = final.Mouse(100, 7.5, 20)
+    mouse.placeMe(grid, 4, 4)
+    for x in range(2, 7):
+        mouse.memGrid.reveal(x, 4, False)
+    explore = final.Explore(mouse)
+    explore.prepTask()
+    explore.startTask()
+    #Standing on the target - the next closest frontier tile is taken straight away rather than idling for a tick
+    explore.x, explore.y = 4, 4
+    move = explore.nextStep()
+    assert abs(move[0]) + abs(move[1]) == 1
+    assert not explore.complete
+    assert (explore.x, explore.y) in mouse.memGrid.frontier
@@ -0,0 +1,163 @@
+#The incremental planner, checked against A* as walls appear and the agent moves along its path
+import random
+
+import final
+from helpers import makeGrid, openTiles, bfsDistances, followPath, placeMouse, moveTo, properties
+
+def checkPlan(grid, mouse, planner, goal):
+    start = (mouse.position["x"], mouse.position["y"])
+    path = planner.plan(mouse)
+    aStarPath = mouse.aStar(list(goal))
+    if goal not in bfsDistances(grid, start):
+        assert path is None and aStarPath is None
+        return None
+    assert path is not None and aStarPath is not None
+    assert (len(path), len(aStarPath)) == (bfsDistances(grid, start)[goal],) * 2
+    assert followPath(grid, start, path) == goal
+    return path
+
+def test_first_plan_is_shortest():
+    for seed in range(5):
+        grid = makeGrid(30, 25, seed)
+        rng = random.Random(seed)
+        tiles = openTiles(grid)
+        for i in range(10):
+            start, goal = rng.sample(tiles, 2)
+            mouse = placeMouse(grid, start)
+            checkPlan(grid, mouse, final.DStarLite(grid, goal), goal)
+            grid.removeOccupant(start[0], start[1], mouse)
+
+def test_repaired_plans_match_a_star():
+    for seed in range(8):
+        grid = makeGrid(25, 15, seed)
+        rng = random.Random(seed)
+        tiles = openTiles(grid)
+        start, goal = rng.sample(tiles, 2)
+        mouse = placeMouse(grid, start)
+        planner = final.DStarLite(grid, goal)
+        path = checkPlan(grid, mouse, planner, goal)
+        for step in range(30):
+            #Wall off a few open tiles, some on the current route, then take a couple of steps along the new plan
+            newWalls = []
+            if path:
+                x, y = followPath(grid, (mouse.position["x"], mouse.position["y"]), path[:rng.randint(1, len(path))])
+                if (x, y) != goal:
+                    newWalls.append((x, y))
+            for i in range(2):
+                tile = rng.choice(tiles)
+                if tile != goal and tile != (mouse.position["x"], mouse.position["y"]):
+                    newWalls.append(tile)
+            for x, y in newWalls:
+                grid.setWall(x, y, True)
+            planner.markWalls(newWalls)
+            path = checkPlan(grid, mouse, planner, goal)
+            if path is None:
+                break
+            moveTo(grid, mouse, followPath(grid, (mouse.position["x"], mouse.position["y"]), path[:2]))
+            path = path[2:]
+
+def test_walled_off_goal_has_no_plan():
+    grid = makeGrid(10, 0, 0)
+    mouse = placeMouse(grid, (0, 0))
+    planner = final.DStarLite(grid, (5, 5))
+    assert len(planner.plan(mouse)) == 10
+    walls = [(4, 5), (6, 5), (5, 4), (5, 6)]
+    for x, y in walls:
+        grid.setWall(x, y, True)
+    planner.markWalls(walls)
+    assert planner.plan(mouse) is None
+    grid.setWall(5, 5, True)
+    planner.markWalls([(5, 5)])
+    assert planner.plan(mouse) is None
+
+def test_planners_are_kept_per_goal():
+    grid = makeGrid(20, 10, 3)
+    tiles = openTiles(grid)
+    mouse = placeMouse(grid, tiles[0])
+    goal = tiles[-1]
+    first = mouse.planPath(goal)
+    planner = mouse.planners[goal]
+    moveTo(grid, mouse, followPath(grid, tiles[0], first[:1]))
+    assert mouse.planPath(goal) == first[1:]
+    assert mouse.planners[goal] is planner
+
+def test_out_of_sight_chases_use_the_planner():
+    settings = dict(final.DEFAULT_PROPERTIES)
+    settings.update(gridX=40, gridY=40, wallPercentage=20, noMice=6, noCats=3)
+    simulation = final.Simulation(settings, 1)
+    planned = 0
+    for i in range(150):
+        if not simulation.step():
+            break
+        for agent in simulation.activeAgents:
+            planned += len(agent.planners)
+            for goal, planner in agent.planners.items():
+                assert planner.goal == goal
+    assert planned > 0
+
+def test_plans_stay_shortest_as_the_agent_moves():
+    #No walls change, so only the key modifier keeps the queued keys right for the new start
+    for seed in range(12):
+        grid = makeGrid(25, 20, seed)
+        rng = random.Random(seed)
+        start, goal = rng.sample(openTiles(grid), 2)
+        mouse = placeMouse(grid, start)
+        planner = final.DStarLite(grid, goal)
+        for step in range(40):
+            path = checkPlan(grid, mouse, planner, goal)
+            if not path:
+                break
+            #Wander off the route more often than not
+            options = [(dx, dy) for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)) if not grid.isBlocked(mouse.position["x"] + dx, mouse.position["y"] + dy)]
+            move = path[0] if rng.random() < 0.3 else rng.choice(options)
+            moveTo(grid, mouse, followPath(grid, (mouse.position["x"], mouse.position["y"]), [move]))
+
+def test_blocked_first_steps_detour_or_wait():
+    grid = makeGrid(10, 0, 0)
+    mouse = placeMouse(grid, (0, 5))
+    planner = final.DStarLite(grid, (9, 5))
+    assert planner.plan(mouse)[0] == [1, 0]
+    #Another mouse in the way - the route has to go round it, and can't come back through the start
+    blocker = final.Mouse(10 ** 9, 7.5, 20)
+    blocker.placeMe(grid, 1, 5)
+    path = planner.plan(mouse)
+    assert path[0] in ([0, 1], [0, -1])
+    assert followPath(grid, (0, 5), path) == (9, 5)
+    assert len(path) == 11
+    #Boxed in by mice - wait for them to move
+    for x, y in ((0, 4), (0, 6)):
+        final.Mouse(10 ** 9, 7.5, 20).placeMe(grid, x, y)
+    assert planner.plan(mouse) == [[0, 0]]
+
+def test_plans_in_games_match_bfs_on_memory():
+    #The planner each agent used last is checked against a breadth first search of what that agent knows
+    checked = 0
+    for seed in range(3):
+        settings = properties(gridX=30, gridY=30, wallPercentage=25, noMice=8, noCats=3)
+        simulation = final.Simulation(settings, seed)
+        for i in range(100):
+            if not simulation.step():
+                break
+            for agent in simulation.activeAgents:
+                start = (agent.position["x"], agent.position["y"])
+                if len(agent.planners) == 0:
+                    continue
+                goal = next(reversed(agent.planners))
+                path = agent.planners[goal].plan(agent)
+                distances = bfsDistances(agent.memGrid, start)
+                if goal not in distances or agent.memGrid.isBlocked(goal[0], goal[1]):
+                    assert path is None
+                    continue
+                assert path is not None
+                checked += 1
+                if path == [[0, 0]]:
+                    continue
+                assert followPath(agent.memGrid, start, path) == goal
+                #Only a detour round another agent can make it longer
+                toGoal = bfsDistances(agent.memGrid, goal)
+                firstSteps = [tile for tile in agent.planners[goal].getNeighbours(start) if toGoal.get(tile) == distances[goal] - 1]
+                if any(agent.checkMove(agent.memGrid, start[0], start[1], x - start[0], y - start[1]) for x, y in firstSteps):
+                    assert len(path) == distances[goal]
+                else:
+                    assert len(path) >= distances[goal]
+    assert checked > 0
@@ -0,0 +1,84 @@
+import final
+from helpers import makeGrid, properties, gameState
+
+def playGame(settings, seed, maxTicks=300):
+    simulation = final.Simulation(settings, seed)
+    simulation.run(maxTicks)
+    return simulation
+
+def test_seeded_games_repeat():
+    settings = properties(gridX=30, gridY=30, noMice=4, noCats=2, noPickups=5)
+    for seed in range(3):
+        assert gameState(playGame(settings, seed)) == gameState(playGame(settings, seed))
+    assert gameState(playGame(settings, 0)) != gameState(playGame(settings, 1))
+
+def test_game_ends_when_one_side_is_gone():
+    simulation = playGame(properties(), 0, None)
+    assert not simulation.running
+    assert simulation.isOver()
+    mice = [agent for agent in simulation.activeAgents if isinstance(agent, final.Mouse)]
+    cats = [agent for agent in simulation.activeAgents if isinstance(agent, final.Cat)]
+    assert len(mice) == 0 or len(cats) == 0
+    assert all(agent.killer is not None for agent in simulation.graveyard)
+
+def test_stats_cover_every_agent():
+    simulation = playGame(properties(), 2)
+    stats = simulation.getStats()
+    assert sorted(row["agent"] for row in stats) == sorted(agent.niceName for agent in simulation.activeAgents + simulation.graveyard)
+    for row in stats:
+        assert 0 <= row["explored"] <= 100
+        assert row["alive"] == (row["killer"] is None)
+
+def test_agents_of_a_type_never_share_a_tile():
+    simulation = final.Simulation(properties(gridX=15, gridY=15, noMice=8, noCats=3), 4)
+    while simulation.step():
+        tiles = [(type(agent), agent.position["x"], agent.position["y"]) for agent in simulation.activeAgents]
+        assert len(tiles) == len(set(tiles))
+
+def test_single_region_reaches_everything():
+    simulation = final.Simulation(properties(gridX=30, gridY=30, wallPercentage=35, singleRegion=True), 0)
+    labels = simulation.grid.getComponents()
+    assert labels.max() == 0
+
+def test_batch_rows_match_single_runs():
+    import batch
+    settings = properties(gridX=15, gridY=15)
+    rows = batch.runBatch(settings, {"wallPercentage": [0, 20]}, seeds=range(2), maxTicks=100, workers=1)
+    assert len(rows) == 2 * 2 * 4
+    single = playGame(properties(gridX=15, gridY=15, wallPercentage=20), 1, 100)
+    expected = {row["agent"]: row for row in single.getStats()}
+    for row in rows:
+        if row["wallPercentage"] == 20 and row["seed"] == 1:
+            assert {key: row[key] for key in expected[row["agent"]]} == expected[row["agent"]]
+
+def test_wandering_into_a_dead_end():
+    #A mouse partway through wandering gets boxed in by another mouse, so its last task stands still as it finishes
+    simulation = final.Simulation(properties(gridX=30, gridY=25, wallPercentage=30), 13)
+    mouse = [agent for agent in simulation.activeAgents if agent.niceName == "Mouse 1"][0]
+    while simulation.tick < 58:
+        simulation.step()
+    assert [type(task) for task in mouse.agenda] == [final.Wander]
+    simulation.step()
+    assert mouse.agenda == [] and mouse.reevaluateNextMove
+    simulation.step()
+    assert len(mouse.agenda) > 0
+
+def test_finished_agenda_is_rebuilt_without_looking():
+    #Walled in with nothing new to see, so every decision skips looking - the last task finishing still brings a new agenda
+    grid = makeGrid(7, 0, 0)
+    for x, y in ((3, 4), (4, 3), (3, 2), (2, 3)):
+        grid.setWall(x, y, True)
+    mouse = final.Mouse(10 ** 9, 7.5, 20)
+    mouse.placeMe(grid, 3, 3)
+    mouse.decideMove(grid)
+    wander = final.Wander(mouse)
+    wander.inProgress = True
+    mouse.agenda = [wander]
+    mouse.reevaluateNextMove = False
+
+    assert mouse.decideMove(grid) == [0, 0]
+    assert mouse.skippedLook is not None
+    assert mouse.agenda == [] and mouse.reevaluateNextMove
+    assert mouse.decideMove(grid) == [0, 0]
+    assert mouse.skippedLook is not None
+    assert [type(task) for task in mouse.agenda] == [final.Wander]
@@ -0,0 +1,79 @@
+import pytest
+
+import final
+from helpers import makeGrid, pursuer, properties, gameState
+
+def teamGame(seed, **changes):
+    return final.Simulation(properties(gridX=40, gridY=40, noMice=5, noCats=2, noPickups=6, teamKnowledge=True, **changes), seed)
+
+def test_teams_share_one_memory():
+    simulation = teamGame(0)
+    simulation.run(50)
+    agents = simulation.activeAgents + simulation.graveyard
+    mice = [agent for agent in agents if isinstance(agent, final.Mouse)]
+    cats = [agent for agent in agents if isinstance(agent, final.Cat)]
+    assert len({id(mouse.memGrid) for mouse in mice}) == 1
+    assert len({id(cat.memGrid) for cat in cats}) == 1
+    assert mice[0].memGrid is not cats[0].memGrid
+    assert len({mouse.getExploredPercentage(simulation.grid) for mouse in mice}) == 1
+
+def test_sightings_record_where_and_when():
+    simulation = teamGame(1)
+    simulation.run(30)
+    for team in simulation.teams.values():
+        assert team.sightings is team.members[0].entVisionMemory
+        for entity, (tick, x, y) in team.sightings.items():
+            assert 0 <= tick < simulation.tick
+            assert not simulation.grid.isWall(x, y)
+
+def test_team_memory_matches_the_real_grid():
+    simulation = teamGame(2)
+    simulation.run(80)
+    for team in simulation.teams.values():
+        memory = team.memGrid
+        known = ~memory.unknown
+        assert (memory.walls[known] == simulation.grid.walls[known]).all()
+        assert not memory.walls[~known].any()
+
+def test_team_explores_faster_than_alone():
+    solo = final.Simulation(properties(gridX=60, gridY=60, noMice=6, noCats=1, mouseEnergy=10 ** 6, catEnergy=10 ** 6), 3)
+    team = final.Simulation(properties(gridX=60, gridY=60, noMice=6, noCats=1, mouseEnergy=10 ** 6, catEnergy=10 ** 6, teamKnowledge=True), 3)
+    solo.run(60)
+    team.run(60)
+    def bestMouse(simulation):
+        return max(agent.getExploredPercentage(simulation.grid) for agent in simulation.activeAgents + simulation.graveyard
+                   if isinstance(agent, final.Mouse))
+    assert bestMouse(team) > bestMouse(solo)
+
+def test_team_games_repeat():
+    first = teamGame(4)
+    second = teamGame(4)
+    first.run(150)
+    second.run(150)
+    assert gameState(first) == gameState(second)
+
+def chasesOfAFarMouse(sightingRange=None):
+    #A cat that knows of a mouse 60 tiles away but can't see it - on a team with the given sighting range, or on its own
+    grid = makeGrid(40, 0, 0)
+    mouse = final.Mouse(10 ** 9, 5, 20)
+    mouse.placeMe(grid, 30, 30)
+    team = None if sightingRange is None else final.Team(grid, sightingRange)
+    cat = pursuer(grid, 0, 0, 5, team)
+    if team is not None:
+        team.record(mouse)
+    else:
+        cat.entVisionMemory[mouse] = None
+    cat.decideMove(grid)
+    return [task for task in cat.agenda if isinstance(task, final.MoveToPos)]
+
+def test_teams_only_chase_sightings_in_range():
+    assert len(chasesOfAFarMouse(128)) == 1
+    assert len(chasesOfAFarMouse(59)) == 0
+    #On its own, the cat always knows where the mouse is now, however far away
+    assert len(chasesOfAFarMouse()) == 1
+    assert teamGame(0, teamSightingRange=12).teams[final.Cat].sightingRange == 12
+
+def test_teams_cant_decide_on_a_pool():
+    with final.DecisionPool(1) as pool:
+        with pytest.raises(ValueError):
+            teamGame(0).setTwoPhase(True, pool)
@@ -0,0 +1,82 @@
+#Two phase ticks - every agent decides against the start of tick grid, then the moves are applied in turn
+import pytest
+
+import env
+import final
+from helpers import properties, gameState, playTicks
+
+def twoPhaseGame(settings, seed, twoPhase, pool=None):
+    simulation = final.Simulation(settings, seed)
+    simulation.setTwoPhase(twoPhase, pool)
+    return simulation
+
+@pytest.fixture(scope="module")
+def pool():
+    with final.DecisionPool(2) as pool:
+        yield pool
+
+def test_one_agent_moves_the_same_either_way():
+    #With one agent there's nothing for the two phases to reorder, so a two phase tick must be exactly a sequential one
+    for seed in range(4):
+        settings = properties(gridX=30, gridY=30, wallPercentage=20, noCats=0, noMice=1, noPickups=6)
+        assert playTicks(twoPhaseGame(settings, seed, True), 120) == playTicks(twoPhaseGame(settings, seed, False), 120)
+
+def test_pool_decides_the_same_as_this_process(pool):
+    settings = properties(gridX=30, gridY=30, noMice=6, noCats=2, noPickups=6)
+    for seed in range(2):
+        assert playTicks(twoPhaseGame(settings, seed, True, pool), 120) == playTicks(twoPhaseGame(settings, seed, True), 120)
+
+def test_pool_decides_the_same_on_chunked_grids(pool):
+    settings = properties(gridX=500, gridY=500, chunkSize=32, noMice=5, noCats=2, noPickups=40)
+    assert playTicks(twoPhaseGame(settings, 3, True, pool), 40) == playTicks(twoPhaseGame(settings, 3, True), 40)
+
+def test_agents_stay_in_the_pool(pool):
+    simulation = final.Simulation(properties(gridX=20, gridY=20), 0)
+    simulation.setTwoPhase(True, pool)
+    simulation.run(5)
+    grid = simulation.grid
+    entities = simulation.activeAgents + simulation.graveyard + simulation.environmentPickups
+    for agent in simulation.activeAgents:
+        #What comes back each tick points at this process's grid and entities
+        assert agent.memGrid.source is grid
+        assert agent.memGrid.occupants is grid.occupants
+        assert agent in grid.getOccupants(agent.position["x"], agent.position["y"])
+        for task in agent.agenda:
+            assert task.agent is agent
+        for entity in agent.entVisionMemory:
+            assert any(entity is other for other in entities)
+
+    #The rest is only taken back when the game leaves the pool
+    simulation.setTwoPhase(True)
+    assert pool.simulation is None and simulation.decisionPool is None
+    for agent in simulation.activeAgents:
+        for planner in agent.planners.values():
+            assert planner.grid is agent.memGrid
+
+def test_games_leave_the_pool_as_they_were(pool, tmp_path):
+    #Saving a game on a pool, or taking it off part way, carries on the same as if it had never been on one
+    settings = properties(gridX=30, gridY=30, noMice=6, noCats=2, noPickups=6)
+    expected = final.Simulation(settings, 1)
+    expected.setTwoPhase(True)
+    expected.run(80)
+
+    simulation = final.Simulation(settings, 1)
+    simulation.setTwoPhase(True, pool)
+    simulation.run(40)
+    simulation.save(tmp_path / "game.bin")
+    saved = final.loadCheckpoint(tmp_path / "game.bin")
+    saved.setTwoPhase(True, pool)
+    assert simulation.decisionPool is None
+    simulation.run(80)
+    saved.run(80)
+    assert gameState(simulation) == gameState(saved) == gameState(expected)
+
+def test_policies_decide_in_this_process(pool):
+    agentEnv = env.AgentEnv(properties(gridX=20, gridY=20), seed=2)
+    agentEnv.reset()
+    agentEnv.simulation.setTwoPhase(True, pool)
+    for i in range(10):
+        observation, reward, done, info = agentEnv.step(i % 4)
+        if done:
+            break
+    assert agentEnv.agent.policy is not None
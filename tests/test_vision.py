@@ -0,0 +1,36 @@
+import final
+from helpers import makeGrid, openTiles
+
+def visibleFrom(grid, tile, visionRange=7.5):
+    agent = final.Mouse(100, visionRange, 20)
+    agent.position = {"x": tile[0], "y": tile[1]}
+    return agent.getVisibleTiles(grid)
+
+def test_open_grid_sees_the_whole_circle():
+    grid = final.Grid(31, 31, 0)
+    visible = visibleFrom(grid, (15, 15))
+    expected = {(x, y) for y in range(31) for x in range(31) if (x - 15) ** 2 + (y - 15) ** 2 <= 7.5 ** 2}
+    assert visible == expected
+
+def test_vision_is_symmetric_between_floor_tiles():
+    for seed in range(3):
+        grid = makeGrid(25, 30, seed)
+        tiles = openTiles(grid)[::7]
+        sight = {tile: visibleFrom(grid, tile) for tile in tiles}
+        for a in tiles:
+            for b in tiles:
+                assert (b in sight[a]) == (a in sight[b])
+
+def test_walls_are_seen_but_not_seen_through():
+    grid = final.Grid(15, 15, 0)
+    grid.setWall(7, 5, True)
+    visible = visibleFrom(grid, (7, 7))
+    assert (7, 5) in visible
+    assert (7, 4) not in visible
+    assert (7, 3) not in visible
+
+def test_vision_stays_inside_the_grid():
+    grid = final.Grid(10, 10, 0)
+    visible = visibleFrom(grid, (0, 0))
+    assert all(grid.inBounds(x, y) for x, y in visible)
+    assert (7, 0) in visible
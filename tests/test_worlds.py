@@ -0,0 +1,42 @@
+import pytest
+
+import batch
+import final
+import worlds
+from helpers import properties
+
+SEEDS = [0, 1, 2, 3, 4]
+
+def playAlone(settings, seed):
+    #Winner, end tick, and each agent's death tick and killer, from a game run on its own
+    simulation = final.Simulation(settings, seed)
+    deaths = {}
+    while simulation.running:
+        simulation.step()
+        for agent in simulation.graveyard:
+            deaths.setdefault(agent.niceName, (simulation.tick, agent.getKillerName()))
+    types = set(type(agent).__name__ for agent in simulation.activeAgents)
+    winner = types.pop() if len(types) == 1 else None
+    return winner, simulation.tick, deaths
+
+@pytest.mark.parametrize("settings", [properties(), properties(gridX=15, gridY=15, wallPercentage=25, noMice=4, noCats=2)])
+def test_worlds_match_games_run_alone(settings):
+    worldBatch = worlds.WorldBatch(settings, SEEDS)
+    worldBatch.run()
+    for world, seed in enumerate(SEEDS):
+        winner, tick, deaths = playAlone(settings, seed)
+        assert worldBatch.getWinner(world) == winner
+        assert worldBatch.ticks[world] == tick
+        for agent, name in enumerate(worldBatch.names):
+            if name in deaths:
+                killer = worldBatch.killer[world, agent]
+                assert worldBatch.deathTick[world, agent] == deaths[name][0]
+                assert ("Starvation" if killer == worlds.STARVATION else worldBatch.names[killer]) == deaths[name][1]
+            else:
+                assert worldBatch.alive[world, agent]
+                assert worldBatch.deathTick[world, agent] == -1
+
+def test_world_rows_match_the_batch():
+    settings = properties(gridX=12, gridY=12, wallPercentage=20)
+    expected = batch.runBatch(settings, {}, SEEDS, 150, workers=1)
+    assert worlds.runWorlds(settings, SEEDS, 150) == expected
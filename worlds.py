@@ -0,0 +1,112 @@
+#Many-worlds batch environment
+#Steps lots of small independent games together, with every world's results stacked into arrays
+#
+#WorldBatch runs the real game - one final.Simulation per seed, each with its own generator, stepped a tick at a time together
+#Every world comes out exactly as runHeadless would for its seed, so it can stand in for separate runs
+#It's a convenience for reading many games' state side by side, not a speed up - each world still steps its own agents in Python,
+#so separate runs spread across processes (batch.runBatch) are faster
+import numpy as np
+
+import final
+
+#Killer codes - anything 0 or above is the index of the agent that did it
+NO_KILLER = -1
+STARVATION = -2
+
+class WorldBatch:
+    def __init__(self, properties, seeds):
+        self.properties = properties
+        self.seeds = list(seeds)
+        self.simulations = [final.Simulation(properties, seed) for seed in self.seeds]
+        #Agents in Simulation's order, which stays fixed as they die and move to the graveyard
+        self.agents = [list(simulation.activeAgents) for simulation in self.simulations]
+        self.indices = [{id(agent): i for i, agent in enumerate(agents)} for agents in self.agents]
+        first = self.agents[0]
+
+        self.worldCount = len(self.simulations)
+        self.size = (properties["gridX"], properties["gridY"])
+        self.names = [agent.niceName for agent in first]
+        self.isCat = np.array([isinstance(agent, final.Cat) for agent in first])
+        agentCount = len(self.names)
+
+        width, height = self.size
+        self.walls = np.array([simulation.grid.getWallWindow(0, 0, width, height) for simulation in self.simulations])
+        self.positions = np.zeros((self.worldCount, agentCount, 2), dtype=np.int64)
+        self.energy = np.zeros((self.worldCount, agentCount), dtype=np.int64)
+        self.alive = np.ones((self.worldCount, agentCount), dtype=bool)
+        self.lifetime = np.zeros((self.worldCount, agentCount), dtype=np.int64)
+        self.points = np.zeros((self.worldCount, agentCount), dtype=np.int64)
+        self.killer = np.full((self.worldCount, agentCount), NO_KILLER, dtype=np.int64)
+        #Tick each agent died on, -1 while it's alive
+        self.deathTick = np.full((self.worldCount, agentCount), -1, dtype=np.int64)
+        self.ticks = np.zeros(self.worldCount, dtype=np.int64)
+        self.running = np.ones(self.worldCount, dtype=bool)
+        self.gather(range(self.worldCount))
+
+    def getKillerCode(self, world, agent):
+        if agent.killer is None:
+            return NO_KILLER
+        if isinstance(agent.killer, str):
+            return STARVATION
+        return self.indices[world][id(agent.killer)]
+
+    def gather(self, worlds):
+        #Copy the agents of these worlds into the stacked arrays
+        for world in worlds:
+            simulation = self.simulations[world]
+            agents = self.agents[world]
+            self.positions[world] = [[agent.position["x"], agent.position["y"]] for agent in agents]
+            self.energy[world] = [agent.energy for agent in agents]
+            self.lifetime[world] = [agent.lifeTime for agent in agents]
+            self.points[world] = [agent.points for agent in agents]
+            self.killer[world] = [self.getKillerCode(world, agent) for agent in agents]
+            alive = self.killer[world] == NO_KILLER
+            self.deathTick[world, self.alive[world] & ~alive] = simulation.tick
+            self.alive[world] = alive
+            self.ticks[world] = simulation.tick
+            self.running[world] = simulation.running
+
+    def step(self):
+        #Advance every running world by one tick - returns whether any are still running
+        worlds = np.nonzero(self.running)[0]
+        for world in worlds:
+            self.simulations[world].step()
+        self.gather(worlds)
+        return bool(self.running.any())
+
+    def run(self, maxTicks=None):
+        #Step until every world has ended, or until maxTicks have passed if given
+        ticks = 0
+        while self.running.any() and (maxTicks is None or ticks < maxTicks):
+            self.step()
+            ticks += 1
+        return ticks
+
+    def getWinner(self, world):
+        #"Cat" or "Mouse" once only that type is left, otherwise None
+        if self.running[world]:
+            return None
+        cats = (self.alive[world] & self.isCat).any()
+        mice = (self.alive[world] & ~self.isCat).any()
+        if cats != mice:
+            return "Cat" if cats else "Mouse"
+        return None
+
+    def getStats(self, world):
+        #Same rows as Simulation.getStats, for one world
+        return self.simulations[world].getStats()
+
+
+def runWorlds(properties, seeds, maxTicks=None, sweepKeys=()):
+    #Rows shaped like batch.runOne's, one per agent per seed - the same rows as runOne gives
+    batch = WorldBatch(properties, seeds)
+    batch.run(maxTicks)
+    rows = []
+    for world, seed in enumerate(batch.seeds):
+        for stats in batch.getStats(world):
+            row = {key: properties[key] for key in sweepKeys}
+            row["seed"] = seed
+            row["ticks"] = int(batch.ticks[world])
+            row.update(stats)
+            rows.append(row)
+    return rows